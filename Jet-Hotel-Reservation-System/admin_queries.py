@@ -0,0 +1,100 @@
+"""Read queries behind the admin dashboard.
+
+Every function eager-loads what dashboard.html touches and pushes limits and
+aggregation into SQL, so the page renders in a constant number of queries no
+matter how many reservations exist. The booking total and the payment approval
+queue come from the journal projections (see projections.py), brought up to
+date with one bounded query per page; while the projections are still catching
+up after a restart they come from the reservation tables instead.
+"""
+from sqlalchemy import func
+from sqlalchemy.orm import contains_eager, joinedload
+
+from models import db, Room, Reservation, Transaction, Notification
+import analytics
+from projections import projections
+
+
+def recent_reservations(limit=10):
+    """Latest reservations with their user and room loaded in the same query"""
+    return (Reservation.query
+            .options(joinedload(Reservation.user), joinedload(Reservation.room))
+            .order_by(Reservation.created_at.desc(), Reservation.id.desc())
+            .limit(limit)
+            .all())
+
+
+def rooms_with_booking_status():
+    """All rooms annotated with status and booked_until (latest check-out of a reservation
+    still holding its nights) via one GROUP BY"""
+    booked = (db.session.query(Reservation.room_id, func.max(Reservation.check_out).label('booked_until'))
+              .filter(Reservation.is_holding())
+              .group_by(Reservation.room_id)
+              .subquery())
+    rows = (db.session.query(Room, booked.c.booked_until)
+            .outerjoin(booked, booked.c.room_id == Room.id)
+            .order_by(Room.id)
+            .all())
+
+    rooms = []
+    for room, booked_until in rows:
+        if booked_until is not None:
+            room.status = 'booked'
+        else:
+            room.status = 'available' if room.available else 'unavailable'
+        room.booked_until = booked_until
+        rooms.append(room)
+    return rooms
+
+
+def pending_payment_transactions(current=True):
+    """Transactions awaiting admin approval with reservation, user and room loaded;
+    looked up by primary key from the pending approvals projection when it is current"""
+    query = Transaction.query.filter(Transaction.status == "Payment Confirmed")
+    if current:
+        ids = projections.pending_approvals.ids()
+        if not ids:
+            return []
+        query = query.filter(Transaction.id.in_(ids))
+    return (query
+            .join(Transaction.reservation)
+            .options(contains_eager(Transaction.reservation).joinedload(Reservation.user),
+                     contains_eager(Transaction.reservation).joinedload(Reservation.room))
+            .order_by(Transaction.id)
+            .all())
+
+
+def recent_admin_notifications(limit=5):
+    return (Notification.query
+            .filter_by(user_id=None)
+            .order_by(Notification.created_at.desc())
+            .limit(limit)
+            .all())
+
+
+def total_bookings(current=True):
+    if current:
+        return projections.dashboard_totals.total_bookings
+    return (db.session.query(func.count(Reservation.id))
+            .filter(Reservation.status.not_in(Reservation.INACTIVE_STATUSES))
+            .scalar())
+
+
+def dashboard_context():
+    """Everything dashboard.html needs"""
+    current = projections.refresh()
+    all_rooms = rooms_with_booking_status()
+    pending_transactions = pending_payment_transactions(current)
+    return {
+        'reservations': recent_reservations(),
+        'all_rooms': all_rooms,
+        'total_bookings': total_bookings(current),
+        # Summed from the daily rollups rather than every paid transaction
+        'total_revenue': analytics.total_revenue(),
+        'total_available_rooms': len([room for room in all_rooms if room.status == 'available']),
+        'notifications': recent_admin_notifications(),
+        'rooms': all_rooms,
+        'pending_transactions': pending_transactions,
+        # Payment approvals tab opens first when something is waiting
+        'active_tab': 'payment-approvals' if pending_transactions else 'overview',
+    }
@@ -0,0 +1,184 @@
+"""Daily revenue and occupancy rollups.
+
+DailyRoomStats keeps one row per room per night. A stay counts as sold on each
+of its nights from the moment it is booked. Its revenue is added to those same
+nights, spread evenly, once the payment is approved. Write paths call
+record_stay()/record_stays() in the same transaction as the change; these
+upsert only the affected rows, so reports read O(days) rollup rows instead of
+scanning reservations and transactions. MonthlyRevenue carries the same
+revenue per calendar month, so the dashboard's all-time total reads one row
+per month. rebuild() recomputes everything from the source tables, archived
+history included, for backfills.
+"""
+from datetime import timedelta
+
+from sqlalchemy import func, insert, literal, select
+
+from models import (db, Room, Reservation, RoomNight, Transaction, ReservationHistory, TransactionHistory,
+                    DailyRoomStats, MonthlyRevenue, stay_nights)
+
+
+def _upsert_statement(session, model=DailyRoomStats, keys=('day', 'room_id'), sums=('nights_sold', 'revenue')):
+    """INSERT that adds sums to an existing row with the same keys instead of failing"""
+    table = model.__table__
+    dialect = session.get_bind(model).dialect.name
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        statement = mysql_insert(table)
+        return statement.on_duplicate_key_update(
+            **{column: table.c[column] + statement.inserted[column] for column in sums})
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    statement = dialect_insert(table)
+    return statement.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={column: table.c[column] + statement.excluded[column] for column in sums},
+    )
+
+
+def record_stays(session, stays):
+    """Apply (room_id, check_in, check_out, nights, revenue) changes to the rollups.
+
+    nights is added to every night of the stay (1 when booked, -1 when
+    released); revenue is the stay total and is split evenly across its nights.
+    """
+    deltas = {}
+    months = {}
+    for room_id, check_in, check_out, nights, revenue in stays:
+        days = stay_nights(check_in, check_out)
+        if not days or (not nights and not revenue):
+            continue
+        per_night = revenue / len(days)
+        for day in days:
+            current = deltas.get((day, room_id), (0, 0.0))
+            deltas[(day, room_id)] = (current[0] + nights, current[1] + per_night)
+            if revenue:
+                months[day.replace(day=1)] = months.get(day.replace(day=1), 0.0) + per_night
+    if deltas:
+        session.execute(_upsert_statement(session), [
+            {'day': day, 'room_id': room_id, 'nights_sold': nights, 'revenue': revenue}
+            for (day, room_id), (nights, revenue) in sorted(deltas.items())
+        ])
+    if months:
+        session.execute(_upsert_statement(session, MonthlyRevenue, keys=('month',), sums=('revenue',)), [
+            {'month': month, 'revenue': revenue} for month, revenue in sorted(months.items())
+        ])
+
+
+def record_stay(session, room_id, check_in, check_out, nights=1, revenue=0.0):
+    record_stays(session, [(room_id, check_in, check_out, nights, revenue)])
+
+
+def rebuild(batch_size=1000):
+    """Recompute every rollup row from RoomNight, archived stays and paid transactions; returns the row count"""
+    db.session.query(DailyRoomStats).delete()
+    db.session.query(MonthlyRevenue).delete()
+
+    # Nights sold come straight from the room-night inventory
+    nights = db.session.execute(
+        select(RoomNight.night, RoomNight.room_id, func.count())
+        .group_by(RoomNight.night, RoomNight.room_id)
+    ).all()
+    rows = [{'day': day, 'room_id': room_id, 'nights_sold': count, 'revenue': 0.0} for day, room_id, count in nights]
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(insert(DailyRoomStats), rows[start:start + batch_size])
+
+    # Archived stays have no room nights left; count theirs from the history table
+    _replay(select(ReservationHistory.id, ReservationHistory.room_id, ReservationHistory.check_in,
+                   ReservationHistory.check_out, literal(0.0))
+            .where(ReservationHistory.status.not_in(Reservation.INACTIVE_STATUSES)),
+            ReservationHistory.id, nights=1, batch_size=batch_size)
+
+    # Revenue from paid transactions, live and archived
+    for transaction, reservation in ((Transaction, Reservation), (TransactionHistory, ReservationHistory)):
+        _replay(select(transaction.id, reservation.room_id, reservation.check_in, reservation.check_out,
+                       transaction.amount)
+                .join(reservation, transaction.reservation_id == reservation.id)
+                .where(transaction.status == "Paid"),
+                transaction.id, nights=0, batch_size=batch_size)
+    db.session.commit()
+    return db.session.query(func.count()).select_from(DailyRoomStats).scalar()
+
+
+def _replay(query, id_column, nights, batch_size):
+    """record_stays() for (id, room_id, check_in, check_out, revenue) rows, walked in id order"""
+    last_id = 0
+    while True:
+        batch = db.session.execute(query.where(id_column > last_id).order_by(id_column).limit(batch_size)).all()
+        if not batch:
+            break
+        record_stays(db.session, [(room_id, check_in, check_out, nights, revenue)
+                                  for _, room_id, check_in, check_out, revenue in batch])
+        last_id = batch[-1][0]
+
+
+# -----------------
+# Reports
+# -----------------
+def total_revenue():
+    """All-time revenue from the monthly rollup: one row per month, however many rooms and days"""
+    return db.session.query(func.sum(MonthlyRevenue.revenue)).scalar() or 0
+
+
+def _room_count():
+    return db.session.query(func.count(Room.id)).scalar()
+
+
+def _occupancy(nights_sold, room_nights):
+    return round(nights_sold / room_nights, 4) if room_nights else 0.0
+
+
+def daily_report(start, end):
+    """Revenue, nights sold and occupancy for each day from start to end inclusive"""
+    totals = {day: (revenue, nights) for day, revenue, nights in db.session.execute(
+        select(DailyRoomStats.day, func.sum(DailyRoomStats.revenue), func.sum(DailyRoomStats.nights_sold))
+        .where(DailyRoomStats.day >= start, DailyRoomStats.day <= end)
+        .group_by(DailyRoomStats.day)
+    )}
+    room_count = _room_count()
+    report = []
+    day = start
+    while day <= end:
+        revenue, nights = totals.get(day, (0.0, 0))
+        report.append({'period': day.isoformat(), 'revenue': round(revenue or 0.0, 2), 'nights_sold': int(nights or 0),
+                       'occupancy': _occupancy(nights or 0, room_count)})
+        day += timedelta(days=1)
+    return report
+
+
+def monthly_report(start, end):
+    """daily_report folded into calendar months (clipped to the range)"""
+    room_count = _room_count()
+    months = {}
+    for row in daily_report(start, end):
+        month = months.setdefault(row['period'][:7], {'period': row['period'][:7], 'revenue': 0.0,
+                                                      'nights_sold': 0, 'days': 0})
+        month['revenue'] += row['revenue']
+        month['nights_sold'] += row['nights_sold']
+        month['days'] += 1
+    report = []
+    for month in months.values():
+        days = month.pop('days')
+        month['revenue'] = round(month['revenue'], 2)
+        month['occupancy'] = _occupancy(month['nights_sold'], room_count * days)
+        report.append(month)
+    return report
+
+
+def room_report(start, end):
+    """Per-room revenue, nights sold and occupancy from start to end inclusive"""
+    days = (end - start).days + 1
+    stats = {room_id: (revenue, nights) for room_id, revenue, nights in db.session.execute(
+        select(DailyRoomStats.room_id, func.sum(DailyRoomStats.revenue), func.sum(DailyRoomStats.nights_sold))
+        .where(DailyRoomStats.day >= start, DailyRoomStats.day <= end)
+        .group_by(DailyRoomStats.room_id)
+    )}
+    report = []
+    for room_id, name in db.session.execute(select(Room.id, Room.name).order_by(Room.id)):
+        revenue, nights = stats.get(room_id, (0.0, 0))
+        report.append({'room_id': room_id, 'room': name, 'revenue': round(revenue or 0.0, 2),
+                       'nights_sold': int(nights or 0), 'occupancy': _occupancy(nights or 0, days)})
+    return report
+
@@ -1,118 +1,96 @@
-from flask import Flask, render_template, redirect, url_for, request, flash, session
-from flask_mail import Mail, Message
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
+from flask import Flask, Blueprint, current_app, render_template, redirect, url_for, request, flash, session, jsonify, Response, stream_with_context, make_response, send_file, abort
+from datetime import datetime, timedelta
 from sqlalchemy import exists, func
-from models import db, User, Room, Reservation, Transaction, Notification
-from forms import RegistrationForm, LoginForm, RoomForm, ReservationForm, ContactForm
-import os
-
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'dev-secret-key'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'mysql+pymysql://root@localhost/hotel_db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-app.config['MAIL_SERVER'] = 'smtp.gmail.com'
-app.config['MAIL_PORT'] = 587
-app.config['MAIL_USE_TLS'] = True
-app.config['MAIL_USERNAME'] = 'jethoteldemo@gmail.com'  # Replace
-app.config['MAIL_PASSWORD'] = 'smmi bdpq rgxr afns'     # Replace
-app.config['MAIL_DEFAULT_SENDER'] = "Hotel Reservation System <jethoteldemo@gmail.com>"
-
-mail = Mail(app)
-db.init_app(app)
-
-# Make request available in templates
-app.jinja_env.globals.update(request=request)
-
-with app.app_context():
-    db.create_all()
-
-    # Default admin
-    if not User.query.filter_by(email="admin@hotel.com").first():
-        admin = User(
-            full_name="Admin",
-            email="admin@hotel.com",
-            contact_info="N/A",
-            password=generate_password_hash("admin123"),
-            is_admin=True
-        )
-        db.session.add(admin)
-        db.session.commit()
+from sqlalchemy.orm import contains_eager, joinedload
+import click
+import io
+from models import db, User, Room, Reservation, Transaction, Notification, RoomNight
+from config import Config
+from availability_index import availability_index, ensure_version_row
+from outbox import enqueue_email, deliver_pending, outbox_workers, mail_for
+import admin_queries
+from pagination import keyset_page
+from booking import book_room, book_rooms, RoomUnavailable
+import notification_feed
+from catalog import catalog_cache, bump_catalog_version, ensure_catalog_version_row
+import images
+import database
+from database import read_only
+import instrumentation
+import analytics
+import exports
+import imports
+import holds
+import archive
+import bulk_admin
+import journal
+from journal import InvalidTransition
+from projections import projections
+from passwords import hash_password, verify_password, needs_rehash, HashingBusy
+
+# Routes and CLI commands live on this blueprint; create_app() registers it
+bp = Blueprint('hotel', __name__, cli_group=None)
+
+def create_app(config=None):
+    """Build the app from Config, the environment's database settings and an optional
+    config object or mapping. Nothing here touches the database or loads mail/forms.
+    """
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    # Primary/replica URLs and pool sizing come from the environment (see database.py)
+    app.config.update(database.engine_config())
+    if isinstance(config, dict):
+        app.config.update(config)
+    elif config is not None:
+        app.config.from_object(config)
 
-    # Sample rooms - only create if no rooms exist
-    if Room.query.count() == 0:
-        rooms = [
-            Room(name="Deluxe Room", price=150.0, description="A comfortable deluxe room with modern amenities.", image="deluxe.jpg"),
-            Room(name="Suite", price=250.0, description="A luxurious suite with spacious living area.", image="suite.jpg"),
-            Room(name="Standard Room", price=100.0, description="Affordable standard room perfect for budget travelers.", image="standard.jpg"),
-            Room(name="Executive Room", price=200.0, description="Executive room with business amenities and city view.", image="executive.jpg"),
-            Room(name="Family Room", price=180.0, description="Spacious family room with extra beds and play area.", image="family.jpg"),
-            Room(name="Penthouse Suite", price=350.0, description="Exclusive penthouse suite with panoramic views.", image="penthouse.jpg"),
-            Room(name="Ocean View Room", price=220.0, description="Beautiful ocean view room with balcony.", image="oceanview.jpg"),
-            Room(name="Garden View Room", price=160.0, description="Peaceful garden view room with natural surroundings.", image="gardenview.jpg"),
-            Room(name="Presidential Suite", price=400.0, description="The ultimate luxury experience with premium services.", image="presidential.jpg")
-        ]
-        db.session.add_all(rooms)
-        db.session.commit()
+    db.init_app(app)
+    database.remember_writes(app)
+    instrumentation.init_app(app)
 
-    # Sample reservations and notifications if none exist
-    if not Reservation.query.first():
-        # Get sample rooms
-        sample_rooms = Room.query.limit(5).all()
-        if sample_rooms:
-            from datetime import timedelta
-            today = datetime.now().date()
-            reservations = []
-            notifications = []
+    # Make request and the responsive image helpers available in templates
+    app.jinja_env.globals.update(request=request, image_url=images.image_url, image_srcset=images.image_srcset)
 
-            for i, room in enumerate(sample_rooms):
-                # Create current bookings for all 5 rooms
-                check_in = today - timedelta(days=1)
-                check_out = today + timedelta(days=1)
-                reservation = Reservation(
-                    user_id=1,  # admin user
-                    room_id=room.id,
-                    check_in=check_in,
-                    check_out=check_out,
-                    status="Confirmed"
-                )
-                reservations.append(reservation)
+    app.register_blueprint(bp)
+    return app
 
-                # Admin notification
-                admin_notif = Notification(
-                    user_id=None,
-                    message=f"Sample reservation #{i+1} created for {room.name}"
-                )
-                notifications.append(admin_notif)
+@bp.before_app_request
+def start_outbox_workers():
+    outbox_workers.ensure_started(current_app._get_current_object())
 
-                # User notification
-                user_notif = Notification(
-                    user_id=1,
-                    message=f"Your sample reservation for {room.name} is confirmed. Check-in: {check_in}, Check-out: {check_out}"
-                )
-                notifications.append(user_notif)
+@bp.before_app_request
+def start_hold_sweeper():
+    holds.hold_sweeper.ensure_started(current_app._get_current_object())
 
-            db.session.add_all(reservations)
-            db.session.add_all(notifications)
-            db.session.commit()
 # -----------------
-@app.route('/', methods=['GET', 'POST'])
-@app.route('/index.html', methods=['GET', 'POST'])
+@bp.route('/', methods=['GET', 'POST'])
+@bp.route('/index.html', methods=['GET', 'POST'])
+@read_only
 def home():
     # Prevent admin from accessing user home page
     if session.get('is_admin'):
-        return redirect(url_for('dashboard'))
-
-    check_in = request.args.get('check_in')
-    check_out = request.args.get('check_out')
-
+        return redirect(url_for('hotel.dashboard'))
+
+    # Anonymous visitors without a search all get the same page: serve it from the catalog cache
+    if not session.get('user_id') and not request.args and not session.get('_flashes'):
+        page = catalog_cache.page(catalog_cache.page_key(db.session), lambda: render_home(None, None))
+        response = make_response(page.html)
+        response.set_etag(page.etag)
+        response.last_modified = page.last_modified
+        response.cache_control.public = True
+        response.cache_control.no_cache = True   # Reuse only after revalidating (304)
+        return response.make_conditional(request)
+
+    return render_home(request.args.get('check_in'), request.args.get('check_out'))
+
+def render_home(check_in, check_out):
+    """Room grid, optionally filtered to the rooms free for [check_in, check_out)"""
     # Get all rooms
     all_rooms = Room.query.all()
-    rooms = all_rooms
+    alternatives = []
 
-    # Get all reservations to check current bookings
-    reservations = Reservation.query.all()
+    # Rooms booked tonight, from the room-night inventory
+    booked_tonight = RoomNight.booked_room_ids(datetime.now().date())
 
     # If dates are provided, filter for availability
     if check_in and check_out:
@@ -129,8 +107,18 @@ def home():
                 flash("Check-out date must be after check-in date.")
                 check_in = check_out = None
             else:
-                # Get available rooms for the date range
-                rooms = Room.get_available_rooms_for_dates(check_in_date, check_out_date)
+                # Get available rooms for the date range from the in-memory index
+                available_room_ids = availability_index.free_room_ids(check_in_date, check_out_date)
+
+                # Nothing free: offer the nearest free stays of the same length instead
+                if not available_room_ids:
+                    rooms_by_id = {room.id: room for room in all_rooms}
+                    alternatives = [
+                        {'room': rooms_by_id[room_id], 'check_in': start.isoformat(), 'check_out': end.isoformat()}
+                        for room_id, start, end in availability_index.nearest_stays(
+                            check_in_date, check_out_date, window=current_app.config.get('ALTERNATIVE_DATES_WINDOW', 7))
+                        if room_id in rooms_by_id
+                    ]
         except ValueError:
             flash("Invalid date format.")
             check_in = check_out = None
@@ -139,12 +127,11 @@ def home():
     rooms_with_status = []
     for room in all_rooms:
         # Check if room is currently booked (check-in <= today < check-out)
-        current_bookings = [r for r in reservations if r.room_id == room.id and r.check_in <= datetime.now().date() < r.check_out]
-        is_currently_booked = len(current_bookings) > 0
+        is_currently_booked = room.id in booked_tonight
 
         if check_in and check_out:
             # For specific date range search
-            is_available = room in rooms
+            is_available = room.id in available_room_ids
         else:
             # For general display, show as unavailable if currently booked
             is_available = not is_currently_booked and room.available
@@ -156,28 +143,44 @@ def home():
         rooms_with_status.append(room_data)
 
     today = datetime.now().date().isoformat()
-    return render_template('home.html', rooms=rooms_with_status, check_in=check_in, check_out=check_out, today=today)
+    return render_template('home.html', rooms=rooms_with_status, check_in=check_in, check_out=check_out, today=today,
+                           alternatives=alternatives)
 
-@app.route('/rooms')
+@bp.route('/rooms')
 def rooms():
-    return redirect(url_for('home') + '#rooms')
-
-@app.route('/register', methods=['GET', 'POST'])
+    return redirect(url_for('hotel.home') + '#rooms')
+
+@bp.route('/images/<digest>/<int:width>/<fmt>/<filename>')
+def room_image(digest, width, fmt, filename):
+    """Resized room photo; the URL names the source hash, so it can be cached forever"""
+    path = images.source_path(filename)
+    if path is None:
+        abort(404)
+    if digest != images.source_digest(path):
+        # The photo was replaced since this URL was rendered
+        return redirect(images.image_url(filename, width, fmt))
+    target = images.generate(filename, width, fmt)
+    if target is None:
+        abort(404)
+    response = send_file(target, max_age=images.MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@bp.route('/register', methods=['GET', 'POST'])
 def register():
+    from forms import RegistrationForm
     form = RegistrationForm()
     if form.validate_on_submit():
-        password = generate_password_hash(form.password.data)
+        try:
+            password = hash_password(form.password.data)
+        except HashingBusy:
+            return too_many_attempts('register.html', form=form)
         user = User(full_name=form.full_name.data, email=form.email.data, contact_info=form.contact_info.data, password=password)
         db.session.add(user)
-        db.session.commit()   # Save first
-
-        # Automatically log in the user after registration
-        session['user_id'] = user.id
-        session['username'] = user.full_name
-        session['is_admin'] = user.is_admin
 
-        # Send welcome email
-        msg = Message(
+        # Queue welcome email with the new account
+        enqueue_email(
             subject="Welcome to Our Hotel!",
             recipients=[user.email],
             body=f"""
@@ -190,85 +193,131 @@ Best regards,
 Hotel Management
 """
         )
-        email_sent = False
-        try:
-            mail.send(msg)
-            email_sent = True
-        except Exception as e:
-            print("Email failed:", e)
+        db.session.commit()
 
-        if email_sent:
-            flash("Registration successful! Welcome email sent. You are now logged in.")
-        else:
-            flash("Registration successful! You are now logged in. (Welcome email could not be sent)")
-        return redirect(url_for('home'))
+        # Automatically log in the user after registration
+        session['user_id'] = user.id
+        session['username'] = user.full_name
+        session['is_admin'] = user.is_admin
+
+        flash("Registration successful! A welcome email is on its way. You are now logged in.")
+        return redirect(url_for('hotel.home'))
 
     return render_template('register.html', form=form)
 
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         email = request.form['email']
         password = request.form['password']
         user = User.query.filter_by(email=email).first()
-        if user and check_password_hash(user.password, password):
+        try:
+            # Unknown emails are checked against a throwaway hash so they cost as much as a wrong password
+            valid = verify_password(user.password if user else None, password) and user is not None
+        except HashingBusy:
+            return too_many_attempts('login.html')
+        if valid:
+            try:
+                if needs_rehash(user.password):
+                    # The configured hashing cost changed since this password was stored
+                    user.password = hash_password(password)
+                    db.session.commit()
+            except HashingBusy:
+                pass   # Retried on the next login
             session['user_id'] = user.id
             session['username'] = user.full_name
             session['is_admin'] = user.is_admin
-            return redirect(url_for('dashboard') if user.is_admin else url_for('home'))
+            return redirect(url_for('hotel.dashboard') if user.is_admin else url_for('hotel.home'))
         else:
             flash("Invalid credentials!")
     return render_template('login.html')
 
-@app.route('/logout')
+def too_many_attempts(template, **context):
+    """Shed a login or registration quickly when the password hashing pool is full"""
+    flash("Too many sign-in attempts right now. Please try again in a moment.")
+    response = make_response(render_template(template, **context), 429)
+    response.headers['Retry-After'] = '1'
+    return response
+
+@bp.route('/logout')
 def logout():
     session.clear()
     flash("Logged out successfully.")
-    return redirect(url_for('home'))
+    return redirect(url_for('hotel.home'))
 
 # -----------------
 # User Reservations & Transactions & Notifications
 # -----------------
-@app.route('/user_reservations')
+def reservation_json(r):
+    return {'id': r.id, 'user_id': r.user_id, 'room_id': r.room_id, 'room': r.room.name,
+            'check_in': r.check_in.isoformat(), 'check_out': r.check_out.isoformat(),
+            'status': r.status, 'created_at': r.created_at.isoformat()}
+
+def transaction_json(t):
+    return {'id': t.id, 'reservation_id': t.reservation_id, 'room': t.reservation.room.name if t.reservation else None,
+            'amount': t.amount, 'status': t.status, 'created_at': t.created_at.isoformat()}
+
+def notification_json(n):
+    return {'id': n.id, 'message': n.message, 'is_read': n.is_read, 'created_at': n.created_at.isoformat()}
+
+def paginated_response(page, name, template, serialize, **context):
+    """Render a keyset page as HTML, or as JSON with ?format=json for load-more requests"""
+    if request.args.get('format') == 'json':
+        return jsonify({name: [serialize(item) for item in page.items], 'next_cursor': page.next_cursor})
+    return render_template(template, next_cursor=page.next_cursor, **{name: page.items}, **context)
+
+@bp.route('/user_reservations')
 def user_reservations():
     if not session.get('user_id'):
         flash("Please login first.")
-        return redirect(url_for('login'))
-    reservations = Reservation.query.filter_by(user_id=session['user_id']).order_by(Reservation.created_at.desc()).all()
-    return render_template('user_reservations.html', reservations=reservations)
-
-@app.route('/transactions')
+        return redirect(url_for('hotel.login'))
+    query = Reservation.query.filter_by(user_id=session['user_id']).options(joinedload(Reservation.room))
+    page = keyset_page(query, Reservation, request.args.get('cursor'))
+    # The counters are left out until the projections have caught up after a restart
+    counters = projections.user_counters.get(session['user_id']) if projections.refresh() else None
+    return paginated_response(page, 'reservations', 'user_reservations.html', reservation_json,
+                              counters=counters)
+
+@bp.route('/transactions')
+@read_only
 def transactions():
     if not session.get('user_id'):
         flash("Please login first.")
-        return redirect(url_for('login'))
+        return redirect(url_for('hotel.login'))
     # Get transactions with related reservation and room data
-    transactions = Transaction.query.join(Reservation).filter(
+    query = Transaction.query.join(Transaction.reservation).filter(
         Reservation.user_id == session['user_id']
-    ).order_by(Transaction.created_at.desc()).all()
-    return render_template('transactions.html', transactions=transactions)
+    ).options(contains_eager(Transaction.reservation).joinedload(Reservation.room))
+    page = keyset_page(query, Transaction, request.args.get('cursor'))
+    return paginated_response(page, 'transactions', 'transactions.html', transaction_json)
 
-@app.route('/confirm_payment/<int:transaction_id>', methods=['POST'])
+@bp.route('/confirm_payment/<int:transaction_id>', methods=['POST'])
 def confirm_payment(transaction_id):
     if not session.get('user_id'):
         flash("Please login first.")
-        return redirect(url_for('login'))
+        return redirect(url_for('hotel.login'))
 
     transaction = Transaction.query.get_or_404(transaction_id)
 
     # Ensure the transaction belongs to the current user
     if transaction.reservation.user_id != session['user_id']:
         flash("Access denied!")
-        return redirect(url_for('transactions'))
+        return redirect(url_for('hotel.transactions'))
 
     # Check if already paid or cancelled
     if transaction.status != "Pending":
         flash("This transaction is already processed.")
-        return redirect(url_for('transactions'))
+        return redirect(url_for('hotel.transactions'))
+
+    # Unpaid holds lapse and release the room; the sweeper cancels this transaction soon
+    if transaction.reservation.hold_lapsed:
+        flash("Your reservation hold has expired. Please book the room again.")
+        return redirect(url_for('hotel.transactions'))
 
     # Update transaction status to "Payment Confirmed" (user has indicated payment made)
-    transaction.status = "Payment Confirmed"
+    journal.transition(transaction, "Payment Confirmed")
+    transaction.reservation.expires_at = None   # Paid holds no longer lapse
 
     # Create admin notification for payment confirmation
     admin_notification = Notification(
@@ -284,14 +333,12 @@ def confirm_payment(transaction_id):
     )
     db.session.add(user_notification)
 
-    db.session.commit()
-
-    # Send payment confirmation email to user
+    # Queue payment confirmation email to user
     user = User.query.get(session['user_id'])
     room = transaction.reservation.room
     nights = (transaction.reservation.check_out - transaction.reservation.check_in).days
 
-    msg = Message(
+    enqueue_email(
         subject="Payment Confirmation Received - Pending Admin Approval",
         recipients=[user.email],
         body=f"""
@@ -316,28 +363,38 @@ Best regards,
 Hotel Management Team
 """
     )
-    try:
-        mail.send(msg)
-        flash("Payment confirmation sent to admin. Confirmation email sent to your email address.")
-    except Exception as e:
-        print("Email failed:", e)
-        flash("Payment confirmation sent to admin. Please wait for approval.")
+    db.session.commit()
+
+    flash("Payment confirmation sent to admin. A confirmation email is on its way to you.")
 
-    return redirect(url_for('transactions'))
+    return redirect(url_for('hotel.transactions'))
 
-@app.route('/admin/approve_payment/<int:transaction_id>', methods=['POST'])
+@bp.route('/admin/approve_payment/<int:transaction_id>', methods=['POST'])
 def approve_payment(transaction_id):
     if not session.get('is_admin'):
         flash("Admin access required!")
-        return redirect(url_for('login'))
+        return redirect(url_for('hotel.login'))
 
     transaction = Transaction.query.get_or_404(transaction_id)
+    reservation = transaction.reservation
+    # Update transaction status to "Paid" and reservation status to "Confirmed"
+    try:
+        journal.transition(transaction, "Paid")
+    except InvalidTransition:
+        db.session.rollback()
+        flash("This transaction is already processed.")
+        return redirect(url_for('hotel.dashboard'))
+    if reservation.status != "Confirmed":
+        try:
+            journal.transition(reservation, "Confirmed")
+        except InvalidTransition:
+            db.session.rollback()
+            flash(f"Reservation #{reservation.id} is {reservation.status.lower()} and cannot be confirmed.")
+            return redirect(url_for('hotel.dashboard'))
+    analytics.record_stay(db.session, reservation.room_id, reservation.check_in, reservation.check_out,
+                          nights=0, revenue=transaction.amount)
 
-    # Update transaction status to "Paid"
-    transaction.status = "Paid"
-
-    # Update reservation status to "Confirmed"
-    transaction.reservation.status = "Confirmed"
+    transaction.reservation.expires_at = None
 
     # Create user notification
     user_notification = Notification(
@@ -353,14 +410,12 @@ def approve_payment(transaction_id):
     )
     db.session.add(admin_notification)
 
-    db.session.commit()
-
-    # Send confirmation email to user
+    # Queue confirmation email to user
     user = User.query.get(transaction.reservation.user_id)
     room = transaction.reservation.room
     nights = (transaction.reservation.check_out - transaction.reservation.check_in).days
 
-    msg = Message(
+    enqueue_email(
         subject="Payment Approved - Reservation Confirmed",
         recipients=[user.email],
         body=f"""
@@ -379,28 +434,78 @@ def approve_payment(transaction_id):
     Thank you for choosing our hotel!
     """
     )
-    mail.send(msg)
+    db.session.commit()
 
-    flash("Payment approved successfully! Confirmation email sent to user.")
-    return redirect(url_for('dashboard'))
+    flash("Payment approved successfully! Confirmation email queued for the user.")
+    return redirect(url_for('hotel.dashboard'))
 
-@app.route('/notifications')
+@bp.route('/notifications')
+@read_only
 def notifications():
     if not session.get('user_id'):
         flash("Please login first.")
-        return redirect(url_for('login'))
-    notifications = Notification.query.filter_by(user_id=session['user_id']).order_by(Notification.created_at.desc()).all()
-    return render_template('notifications.html', notifications=notifications)
+        return redirect(url_for('hotel.login'))
+    query = Notification.query.filter_by(user_id=session['user_id'])
+    page = keyset_page(query, Notification, request.args.get('cursor'))
+    return paginated_response(page, 'notifications', 'notifications.html', notification_json)
+
+@bp.route('/notifications/stream')
+def notifications_stream():
+    """Server-Sent Events feed of new notifications (admins get the admin feed)"""
+    if not session.get('user_id'):
+        return jsonify({'error': 'Login required'}), 401
+    user_id, is_admin = session['user_id'], bool(session.get('is_admin'))
+    # Resume after the last event the browser saw, otherwise start from what exists now
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('after')
+    try:
+        last_id = int(last_id)
+    except (TypeError, ValueError):
+        last_id = notification_feed.latest_id(user_id, is_admin)
+    response = Response(stream_with_context(notification_feed.stream_events(user_id, is_admin, last_id)),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'   # Keep nginx from buffering the stream
+    return response
+
+@bp.route('/notifications/unread_count')
+def notifications_unread_count():
+    if not session.get('user_id'):
+        return jsonify({'error': 'Login required'}), 401
+    return jsonify({'unread': notification_feed.unread_count(session['user_id'], bool(session.get('is_admin')))})
+
+@bp.route('/notifications/mark_read', methods=['POST'])
+def notifications_mark_read():
+    """Mark the given ids (or everything up to up_to_id, or everything) as read in one UPDATE"""
+    if not session.get('user_id'):
+        flash("Please login first.")
+        return redirect(url_for('hotel.login'))
+    if request.is_json:
+        payload = request.get_json(silent=True) or {}
+        ids = payload.get('ids') or []
+    else:
+        payload = request.form
+        ids = request.form.getlist('ids')
+    try:
+        ids = [int(i) for i in ids]
+        up_to_id = int(payload['up_to_id']) if payload.get('up_to_id') else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'ids and up_to_id must be integers'}), 400
+    updated = notification_feed.mark_read(session['user_id'], bool(session.get('is_admin')),
+                                          ids=ids or None, up_to_id=up_to_id)
+    if request.is_json:
+        return jsonify({'updated': updated})
+    flash("Notifications marked as read.")
+    return redirect(url_for('hotel.notifications'))
 
 # -----------------
 # Reservation
 # -----------------
-@app.route('/reserve/<int:room_id>', methods=['GET', 'POST'])
+@bp.route('/reserve/<int:room_id>', methods=['GET', 'POST'])
 def reserve(room_id):
     # Require login
     if not session.get('user_id'):
         flash("Please login first.")
-        return redirect(url_for('login'))
+        return redirect(url_for('hotel.login'))
 
     room = Room.query.get_or_404(room_id)
 
@@ -413,227 +518,291 @@ def reserve(room_id):
         today = datetime.now().date()
         if check_in.date() < today:
             flash("Check-in date cannot be in the past.")
-            return redirect(url_for('reserve', room_id=room_id))
+            return redirect(url_for('hotel.reserve', room_id=room_id))
         if check_out <= check_in:
             flash("Check-out date must be after check-in date.")
-            return redirect(url_for('reserve', room_id=room_id))
-
-        # Check if room is already reserved for these dates
-        existing_reservation = Reservation.query.filter(
-            Reservation.room_id == room_id,
-            Reservation.check_in < check_out,
-            Reservation.check_out > check_in
-        ).first()
-        if existing_reservation:
-            flash("This room is already reserved for the selected dates.")
-            return redirect(url_for('reserve', room_id=room_id))
-
-        # 1️⃣ Create reservation with Pending status
-        reservation = Reservation(
-            user_id=session['user_id'],
-            room_id=room.id,
-            check_in=check_in,
-            check_out=check_out,
-            status="Pending"  # Reservation is pending payment
-        )
-        db.session.add(reservation)
-        db.session.commit()   # ✅ SAVE RESERVATION FIRST
-
-        # 2️⃣ Calculate total amount (room price × number of nights)
-        nights = (check_out.date() - check_in.date()).days
-        total_amount = room.price * nights
-
-        # 3️⃣ Create transaction record with Pending status
-        transaction = Transaction(
-            reservation_id=reservation.id,
-            amount=total_amount,
-            status="Pending"  # Payment is pending
-        )
-        db.session.add(transaction)
+            return redirect(url_for('hotel.reserve', room_id=room_id))
 
-        # 4️⃣ Create admin notification
-        admin_notification = Notification(
-            user_id=None,  # admin
-            message=f"New reservation #{reservation.id} created by User {session['username']} - ₱{total_amount} (Pending Payment)"
-        )
-        db.session.add(admin_notification)
-
-        # 5️⃣ Create user notification
-        user_notification = Notification(
-            user_id=session['user_id'],
-            message=f"Your reservation for {room.name} is pending payment. Check-in: {check_in.date()}, Check-out: {check_out.date()}. Total: ₱{total_amount}. Please proceed to payment."
-        )
-        db.session.add(user_notification)
-
-        db.session.commit()   # ✅ SAVE ALL RECORDS
-
-        # 6️⃣ Send reservation created email to user
+        # Reservation, transaction, notifications and email are written atomically;
+        # the room-night inventory rejects overlapping bookings at the database
         user = User.query.get(session['user_id'])
+        try:
+            book_room(user, room, check_in, check_out)
+        except RoomUnavailable:
+            flash("This room is already reserved for the selected dates.")
+            return redirect(url_for('hotel.reserve', room_id=room_id))
 
-        msg = Message(
-            subject="Reservation Created - Payment Pending",
-            recipients=[user.email],
-            body=f"""
-        Hello {user.full_name},
-
-        Your reservation has been created and is pending payment confirmation.
+        flash("Reservation created! Please proceed to payment confirmation.")
+        return redirect(url_for('hotel.home'))
 
-        Room: {room.name}
-        Check-in: {check_in.date()}
-        Check-out: {check_out.date()}
-        Nights: {nights}
-        Price per night: ₱{room.price}
-        Total Amount: ₱{total_amount}
+    today = datetime.now().date().isoformat()
+    return render_template('reserve.html', room=room, today=today)
 
-        Please proceed to the transactions page to confirm your payment.
-        You can pay over-the-counter or through online payment.
+@bp.route('/reserve/group', methods=['POST'])
+def reserve_group():
+    """Book many rooms at once from JSON: {"items": [{"room_id", "check_in", "check_out"}, ...]}"""
+    if not session.get('user_id'):
+        return jsonify(error="Please login first."), 401
 
-        Thank you for choosing our hotel!
-        """
-        )
-        mail.send(msg)
+    payload = request.get_json(silent=True) or {}
+    try:
+        items = [(int(item['room_id']),
+                  datetime.strptime(item['check_in'], '%Y-%m-%d').date(),
+                  datetime.strptime(item['check_out'], '%Y-%m-%d').date())
+                 for item in payload.get('items', [])]
+    except (KeyError, TypeError, ValueError):
+        return jsonify(error="Each item needs room_id, check_in and check_out (YYYY-MM-DD)."), 400
+
+    # Validate dates
+    today = datetime.now().date()
+    if not items:
+        return jsonify(error="No rooms requested."), 400
+    if len(items) > current_app.config.get('GROUP_BOOKING_MAX_ITEMS', 100):
+        return jsonify(error="Too many rooms in one group booking."), 400
+    if any(check_in < today for _, check_in, _ in items):
+        return jsonify(error="Check-in date cannot be in the past."), 400
+    if any(check_out <= check_in for _, check_in, check_out in items):
+        return jsonify(error="Check-out date must be after check-in date."), 400
 
-        flash("Reservation created! Please proceed to payment confirmation.")
-        return redirect(url_for('home'))
+    user = User.query.get(session['user_id'])
+    try:
+        reservation_ids = book_rooms(user, items)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    except RoomUnavailable as e:
+        conflicts = [{'room_id': room_id, 'check_in': check_in.isoformat(), 'check_out': check_out.isoformat()}
+                     for room_id, check_in, check_out in e.conflicts]
+        return jsonify(error="Some rooms are already reserved for the selected dates.", conflicts=conflicts), 409
 
-    today = datetime.now().date().isoformat()
-    return render_template('reserve.html', room=room, today=today)
+    return jsonify(reservation_ids=reservation_ids), 201
 
 # -----------------
 # Admin Dashboard
 # -----------------
-@app.route('/dashboard', methods=['GET', 'POST'])
+@bp.route('/dashboard', methods=['GET', 'POST'])
+@read_only
 def dashboard():
     if not session.get('is_admin'):
         flash("Admin access required!")
-        return redirect(url_for('login'))
-
-    reservations = Reservation.query.join(User).join(Room).order_by(Reservation.created_at.desc()).all()
-
-    # Get all rooms with their current status
-    all_rooms = Room.query.all()
-    rooms_with_status = []
-
-    for room in all_rooms:
-        # Check if room has any reservations
-        room_reservations = [r for r in reservations if r.room_id == room.id]
-        if room_reservations:
-            # Room has reservations, show as booked
-            status = 'booked'
-            # Find the latest checkout date for display
-            checkout_dates = [r.check_out for r in room_reservations]
-            booked_until = max(checkout_dates)
-        else:
-            booked_until = None
-            status = 'available' if room.available else 'unavailable'
-
-        room.status = status
-        room.booked_until = booked_until
-        rooms_with_status.append(room)
-
-    # Separate rooms into booked and unbooked sections
-    booked_rooms = [room for room in rooms_with_status if room.status == 'booked']
-    unbooked_rooms = [room for room in rooms_with_status if room.status != 'booked']
-
-    total_bookings = Reservation.query.count()
-    total_revenue = Transaction.get_total_revenue()
-    total_available_rooms = len([r for r in rooms_with_status if r.status == 'available'])
-    notifications = Notification.query.filter_by(user_id=None).order_by(Notification.created_at.desc()).limit(5).all()
-    rooms = Room.query.all()  # Add rooms for the manage rooms tab
-
-    # Get pending payment confirmations for the payment approvals tab
-    pending_transactions = Transaction.query.filter_by(status="Payment Confirmed").join(Reservation).all()
-
-    # Determine which tab should be active by default
-    active_tab = 'payment-approvals' if pending_transactions else 'overview'
+        return redirect(url_for('hotel.login'))
 
     today = datetime.now().date().isoformat()
 
-    return render_template('dashboard.html',
-                           reservations=reservations,
-                           all_rooms=rooms_with_status,
-                           booked_rooms=booked_rooms,
-                           unbooked_rooms=unbooked_rooms,
-                           total_bookings=total_bookings,
-                           total_revenue=total_revenue,
-                           total_available_rooms=len([r for r in rooms_with_status if r.status == 'available']),
-                           notifications=notifications,
-                           rooms=rooms,
-                           pending_transactions=pending_transactions,
-                           active_tab=active_tab,
-                           today=today)
+    return render_template('dashboard.html', today=today, **admin_queries.dashboard_context())
+
+@bp.route('/admin/reservations')
+def admin_reservations():
+    if not session.get('is_admin'):
+        flash("Admin access required!")
+        return redirect(url_for('hotel.login'))
+    query = Reservation.query.options(joinedload(Reservation.user), joinedload(Reservation.room))
+    page = keyset_page(query, Reservation, request.args.get('cursor'))
+    return paginated_response(page, 'reservations', 'admin_reservations.html', reservation_json)
+
+def report_range():
+    """start/end query args (YYYY-MM-DD), defaulting to the 30 days up to today"""
+    today = datetime.now().date()
+    start = request.args.get('start') or (today - timedelta(days=29)).isoformat()
+    end = request.args.get('end') or today.isoformat()
+    start, end = datetime.strptime(start, '%Y-%m-%d').date(), datetime.strptime(end, '%Y-%m-%d').date()
+    if end < start or (end - start).days >= current_app.config.get('REPORT_MAX_DAYS', 3660):
+        raise ValueError("Invalid report range.")
+    return start, end
+
+@bp.route('/admin/reports/revenue')
+def revenue_report():
+    """Revenue, room nights sold and occupancy per day (or ?group=month) from the rollups"""
+    if not session.get('is_admin'):
+        return jsonify(error="Admin access required!"), 403
+    try:
+        start, end = report_range()
+    except ValueError:
+        return jsonify(error="Use start and end dates (YYYY-MM-DD) with start before end."), 400
+    group = request.args.get('group', 'day')
+    if group not in ('day', 'month'):
+        return jsonify(error="group must be day or month."), 400
+    rows = analytics.daily_report(start, end) if group == 'day' else analytics.monthly_report(start, end)
+    return jsonify(start=start.isoformat(), end=end.isoformat(), group=group, rows=rows,
+                   revenue=round(sum(row['revenue'] for row in rows), 2),
+                   nights_sold=sum(row['nights_sold'] for row in rows))
+
+@bp.route('/admin/reports/rooms')
+def room_report():
+    """Revenue, room nights sold and occupancy per room from the rollups"""
+    if not session.get('is_admin'):
+        return jsonify(error="Admin access required!"), 403
+    try:
+        start, end = report_range()
+    except ValueError:
+        return jsonify(error="Use start and end dates (YYYY-MM-DD) with start before end."), 400
+    return jsonify(start=start.isoformat(), end=end.isoformat(), rooms=analytics.room_report(start, end))
+
+@bp.route('/admin/calendar')
+@read_only
+def admin_calendar():
+    """Rooms x nights occupancy for ?month=YYYY-MM (default this month); ?encoding=bitset packs the rows"""
+    if not session.get('is_admin'):
+        return jsonify(error="Admin access required!"), 403
+    try:
+        month = datetime.strptime(request.args.get('month') or datetime.now().strftime('%Y-%m'), '%Y-%m')
+    except ValueError:
+        return jsonify(error="month must be YYYY-MM."), 400
+    encoding = request.args.get('encoding', 'rows')
+    if encoding not in ('rows', 'bitset'):
+        return jsonify(error="encoding must be rows or bitset."), 400
+    # Loaded on first use so NumPy stays out of app startup
+    import occupancy_calendar
+    grid = occupancy_calendar.month_grid(month.year, month.month)
+    return jsonify(grid.to_json(encoding))
+
+@bp.route('/admin/export/<kind>')
+@read_only
+def admin_export(kind):
+    """Stream reservations, transactions or notifications as ?format=csv (default) or ndjson,
+    filtered by ?start and ?end (created date, inclusive) and ?status
+    """
+    if not session.get('is_admin'):
+        return jsonify(error="Admin access required!"), 403
+    if kind not in exports.EXPORTS:
+        abort(404)
+    fmt = request.args.get('format', 'csv')
+    if fmt not in exports.FORMATS:
+        return jsonify(error="format must be csv or ndjson."), 400
+    try:
+        start, end = (datetime.strptime(request.args[name], '%Y-%m-%d').date() if request.args.get(name) else None
+                      for name in ('start', 'end'))
+    except ValueError:
+        return jsonify(error="start and end must be YYYY-MM-DD."), 400
+    status = request.args.get('status')
+    if kind == 'notifications' and status not in (None, '', 'read', 'unread'):
+        return jsonify(error="status must be read or unread."), 400
+
+    chunks = exports.stream(kind, fmt, start, end, status)
+    response = Response(stream_with_context(chunks), mimetype=exports.FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{kind}-{datetime.now():%Y-%m-%d}.{fmt}"'
+    response.headers['X-Accel-Buffering'] = 'no'   # Let the first rows through nginx right away
+    return response
+
+@bp.route('/admin/import/<kind>', methods=['POST'])
+def admin_import(kind):
+    """Import rooms or historical reservations from an uploaded CSV (form field "file")"""
+    if not session.get('is_admin'):
+        return jsonify(error="Admin access required!"), 403
+    if kind not in imports.IMPORTERS:
+        abort(404)
+    upload = request.files.get('file')
+    if upload is None:
+        return jsonify(error="Upload a CSV file in the file field."), 400
+    # Read the spooled upload as a stream; rows are processed batch by batch
+    stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+    result = imports.IMPORTERS[kind](stream)
+    return jsonify(result.to_json())
 
 # -----------------
 # Admin Room Management
 # -----------------
-@app.route('/admin/rooms')
+@bp.route('/admin/rooms')
 def admin_rooms():
     if not session.get('is_admin'):
         flash("Admin access required!")
-        return redirect(url_for('login'))
+        return redirect(url_for('hotel.login'))
     rooms = Room.query.all()
     return render_template('admin_rooms.html', rooms=rooms)
 
-@app.route('/admin/rooms/add', methods=['GET','POST'])
+def save_room_photo(image):
+    """Store an uploaded photo if one was sent and pre-generate its thumbnails; returns the filename"""
+    photo = request.files.get('photo')
+    if photo and photo.filename:
+        image = images.save_upload(photo)
+    images.generate_all(image)
+    return image
+
+@bp.route('/admin/rooms/add', methods=['GET','POST'])
 def add_room():
     if not session.get('is_admin'):
         flash("Admin access required!")
-        return redirect(url_for('login'))
+        return redirect(url_for('hotel.login'))
     if request.method == 'POST':
+        try:
+            image = save_room_photo(request.form['image'])
+        except ValueError as e:
+            flash(str(e))
+            return render_template('add_room.html')
         room = Room(
             name=request.form['name'],
             price=float(request.form['price']),
             description=request.form['description'],
-            image=request.form['image'],
+            image=image,
             available=request.form.get('available')=='on'
         )
         db.session.add(room)
+        bump_catalog_version(db.session)
         db.session.commit()
         flash("Room added successfully!")
-        return redirect(url_for('dashboard') + '#manage-rooms')
+        return redirect(url_for('hotel.dashboard') + '#manage-rooms')
     return render_template('add_room.html')
 
-@app.route('/admin/rooms/edit/<int:room_id>', methods=['GET','POST'])
+@bp.route('/admin/rooms/edit/<int:room_id>', methods=['GET','POST'])
 def edit_room(room_id):
     if not session.get('is_admin'):
         flash("Admin access required!")
-        return redirect(url_for('login'))
+        return redirect(url_for('hotel.login'))
     room = Room.query.get_or_404(room_id)
     if request.method == 'POST':
         room.name = request.form['name']
         room.price = float(request.form['price'])
         room.description = request.form['description']
-        room.image = request.form['image']
+        try:
+            room.image = save_room_photo(request.form['image'])
+        except ValueError as e:
+            flash(str(e))
+            return render_template('edit_room.html', room=room)
         room.available = request.form.get('available')=='on'
+        bump_catalog_version(db.session)
         db.session.commit()
         flash("Room updated successfully!")
-        return redirect(url_for('dashboard') + '#manage-rooms')
+        return redirect(url_for('hotel.dashboard') + '#manage-rooms')
     return render_template('edit_room.html', room=room)
 
-@app.route('/admin/rooms/delete/<int:room_id>')
+@bp.route('/admin/rooms/delete/<int:room_id>')
 def delete_room(room_id):
     if not session.get('is_admin'):
         flash("Admin access required!")
-        return redirect(url_for('login'))
+        return redirect(url_for('hotel.login'))
     room = Room.query.get_or_404(room_id)
     db.session.delete(room)
+    bump_catalog_version(db.session)
     db.session.commit()
     flash("Room deleted successfully!")
-    return redirect(url_for('dashboard') + '#manage-rooms')
+    return redirect(url_for('hotel.dashboard') + '#manage-rooms')
 
 
 
-@app.route('/cancel_reservation/<int:reservation_id>', methods=['POST'])
+@bp.route('/cancel_reservation/<int:reservation_id>', methods=['POST'])
 def cancel_reservation(reservation_id):
     if not session.get('is_admin'):
         flash("Admin access required!")
-        return redirect(url_for('login'))
+        return redirect(url_for('hotel.login'))
     reservation = Reservation.query.get_or_404(reservation_id)
 
-    # Update transaction status to cancelled and remove reservation reference
+    # Release the nights and any paid revenue from the rollups
     transaction = Transaction.query.filter_by(reservation_id=reservation_id).first()
+    analytics.record_stay(db.session, reservation.room_id, reservation.check_in, reservation.check_out,
+                          nights=0 if reservation.status in Reservation.INACTIVE_STATUSES else -1,
+                          revenue=-transaction.amount if transaction and transaction.status == "Paid" else 0.0)
+
+    # Update transaction status to cancelled and remove reservation reference
+    try:
+        if transaction and transaction.status != "Cancelled":
+            journal.transition(transaction, "Cancelled")
+        # Journaled as cancelled, then removed below
+        if reservation.status != "Cancelled":
+            journal.transition(reservation, "Cancelled")
+    except InvalidTransition as error:
+        db.session.rollback()
+        flash(f"This reservation cannot be cancelled: {error}")
+        return redirect(url_for('hotel.dashboard'))
     if transaction:
-        transaction.status = "Cancelled"
         transaction.reservation_id = None
 
     # Create notification for the user
@@ -653,17 +822,48 @@ def cancel_reservation(reservation_id):
     db.session.delete(reservation)
     db.session.commit()
     flash("Reservation cancelled successfully!")
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('hotel.dashboard'))
 
-@app.route('/contact', methods=['GET', 'POST'])
+@bp.route('/admin/reservations/bulk', methods=['POST'])
+def bulk_reservations():
+    """Cancel or confirm many reservations from JSON:
+    {"action": "cancel"|"confirm", "room_ids": [...], "start": "YYYY-MM-DD", "end": "YYYY-MM-DD", "status": "..."}
+    """
+    if not session.get('is_admin'):
+        return jsonify(error="Admin access required!"), 403
+
+    payload = request.get_json(silent=True) or {}
+    action = payload.get('action')
+    if action not in bulk_admin.ACTIONS:
+        return jsonify(error="action must be cancel or confirm."), 400
+    try:
+        room_ids = [int(room_id) for room_id in payload.get('room_ids') or []]
+        start, end = [datetime.strptime(payload[key], '%Y-%m-%d').date() if payload.get(key) else None
+                      for key in ('start', 'end')]
+        batch_size = int(payload.get('batch_size') or bulk_admin.BATCH_SIZE)
+    except (TypeError, ValueError):
+        return jsonify(error="room_ids must be numbers and start/end dates (YYYY-MM-DD)."), 400
+    status = payload.get('status')
+    # Never touch every reservation by accident
+    if not (room_ids or start or end or status):
+        return jsonify(error="Filter by room_ids, a start/end date range or a status."), 400
+    if start and end and end <= start:
+        return jsonify(error="end must be after start."), 400
+    if not 1 <= batch_size <= 5000:
+        return jsonify(error="batch_size must be between 1 and 5000."), 400
+
+    condition = bulk_admin.reservation_filter(room_ids=room_ids, start=start, end=end, status=status)
+    return jsonify(bulk_admin.run(action, condition, batch_size=batch_size))
+
+@bp.route('/contact', methods=['GET', 'POST'])
 def contact():
     if request.method == 'POST':
         name = request.form['name']
         email = request.form['email']
         message = request.form['message']
 
-        # Send email to jethoteldemo@gmail.com
-        msg = Message(
+        # Queue email to jethoteldemo@gmail.com
+        enqueue_email(
             subject=f"Contact Form Message from {name}",
             recipients=['jethoteldemo@gmail.com'],
             body=f"""
@@ -674,18 +874,175 @@ Message:
 {message}
 """
         )
-        try:
-            mail.send(msg)
-            flash("Message sent successfully!")
-        except Exception as e:
-            print("Email failed:", e)
-            flash("Failed to send message. Please try again.")
+        db.session.commit()
+        flash("Message sent successfully!")
 
-        return redirect(url_for('contact'))
+        return redirect(url_for('hotel.contact'))
     return render_template('contact.html')
 
+# -----------------
+# CLI Commands
+# -----------------
+@bp.cli.command('backfill-room-nights')
+@click.option('--batch-size', default=1000, show_default=True, help='Reservations read per batch.')
+def backfill_room_nights(batch_size):
+    """Rebuild the room-night inventory from existing reservations."""
+    reservation_count, night_count, conflicts = RoomNight.backfill(batch_size=batch_size)
+    click.echo(f"Backfilled {night_count} room nights from {reservation_count} reservations.")
+    if conflicts:
+        click.echo(f"Skipped {len(conflicts)} overlapping reservations: {', '.join(map(str, conflicts))}")
+
+@bp.cli.command('rebuild-rollups')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows written per batch.')
+def rebuild_rollups(batch_size):
+    """Recompute the daily revenue and occupancy rollups from reservations and transactions."""
+    rows = analytics.rebuild(batch_size=batch_size)
+    click.echo(f"Rebuilt {rows} daily room rollups.")
+
+@bp.cli.command('import-csv')
+@click.argument('kind', type=click.Choice(sorted(imports.IMPORTERS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=imports.BATCH_SIZE, show_default=True, help='Rows validated and inserted per batch.')
+def import_csv(kind, path, batch_size):
+    """Bulk import rooms or historical reservations from a CSV file."""
+    with open(path, encoding='utf-8-sig', newline='') as stream:
+        result = imports.IMPORTERS[kind](stream, batch_size=batch_size)
+    click.echo(f"Imported {result.imported} {kind}, rejected {len(result.rejected)}.")
+    for line, reason in result.rejected:
+        click.echo(f"  line {line}: {reason}")
+
+@bp.cli.command('sweep-holds')
+@click.option('--batch-size', default=holds.BATCH_SIZE, show_default=True, help='Holds expired per batch.')
+def sweep_holds(batch_size):
+    """Expire unpaid reservation holds past their deadline."""
+    expired = holds.sweep(batch_size=batch_size)
+    click.echo(f"Expired {expired} unpaid holds.")
+
+@bp.cli.command('archive')
+@click.option('--days', type=int, default=None, help='Archive stays checked out more than this many days ago '
+                                                     '(default: ARCHIVE_AFTER_DAYS).')
+@click.option('--batch-size', default=archive.BATCH_SIZE, show_default=True, help='Rows moved per batch.')
+def archive_history(days, batch_size):
+    """Move old stays, their transactions and old notifications to the history tables."""
+    counts = archive.archive(days=days, batch_size=batch_size)
+    click.echo(f"Archived {counts['reservations']} reservations, {counts['orphaned_transactions']} orphaned "
+               f"transactions and {counts['notifications']} notifications.")
+
+@bp.cli.command('backfill-journal')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows journaled per batch.')
+def backfill_journal(batch_size):
+    """Journal existing reservations and transactions for a database that predates the event journal."""
+    written = journal.backfill(batch_size=batch_size)
+    click.echo(f"Journaled {written} reservations and transactions.")
+
+@bp.cli.command('outbox-worker')
+@click.option('--once', is_flag=True, help='Drain the outbox once and exit.')
+@click.option('--interval', default=5.0, show_default=True, help='Seconds between polls.')
+def outbox_worker(once, interval):
+    """Send queued emails from the outbox."""
+    import time
+    while True:
+        sent, failed = deliver_pending(mail_for(current_app))
+        if sent or failed:
+            click.echo(f"Outbox: {sent} sent, {failed} failed.")
+        if once:
+            break
+        time.sleep(interval)
+
+@bp.cli.command('init-db')
+def init_db():
+    """Create any missing tables and journal reservations that predate the journal."""
+    db.create_all()
+    ensure_version_row(db.session)
+    ensure_catalog_version_row(db.session)
+    written = journal.backfill()
+    click.echo(f"Database tables created; {written} journal events backfilled.")
+
+@bp.cli.command('seed')
+def seed():
+    """Insert the default admin, sample rooms and sample reservations if missing."""
+    seed_sample_data()
+    click.echo("Sample data ready.")
+
+def seed_sample_data():
+    # Default admin
+    if not User.query.filter_by(email="admin@hotel.com").first():
+        admin = User(
+            full_name="Admin",
+            email="admin@hotel.com",
+            contact_info="N/A",
+            password=hash_password("admin123"),
+            is_admin=True
+        )
+        db.session.add(admin)
+        db.session.commit()
+
+    # Sample rooms - only create if no rooms exist
+    if Room.query.count() == 0:
+        rooms = [
+            Room(name="Deluxe Room", price=150.0, description="A comfortable deluxe room with modern amenities.", image="deluxe.jpg"),
+            Room(name="Suite", price=250.0, description="A luxurious suite with spacious living area.", image="suite.jpg"),
+            Room(name="Standard Room", price=100.0, description="Affordable standard room perfect for budget travelers.", image="standard.jpg"),
+            Room(name="Executive Room", price=200.0, description="Executive room with business amenities and city view.", image="executive.jpg"),
+            Room(name="Family Room", price=180.0, description="Spacious family room with extra beds and play area.", image="family.jpg"),
+            Room(name="Penthouse Suite", price=350.0, description="Exclusive penthouse suite with panoramic views.", image="penthouse.jpg"),
+            Room(name="Ocean View Room", price=220.0, description="Beautiful ocean view room with balcony.", image="oceanview.jpg"),
+            Room(name="Garden View Room", price=160.0, description="Peaceful garden view room with natural surroundings.", image="gardenview.jpg"),
+            Room(name="Presidential Suite", price=400.0, description="The ultimate luxury experience with premium services.", image="presidential.jpg")
+        ]
+        db.session.add_all(rooms)
+        db.session.commit()
+
+    # Sample reservations and notifications if none exist
+    if not Reservation.query.first():
+        # Get sample rooms
+        sample_rooms = Room.query.limit(5).all()
+        if sample_rooms:
+            from datetime import timedelta
+            today = datetime.now().date()
+            reservations = []
+            notifications = []
+
+            for i, room in enumerate(sample_rooms):
+                # Create current bookings for all 5 rooms
+                check_in = today - timedelta(days=1)
+                check_out = today + timedelta(days=1)
+                reservation = Reservation(
+                    user_id=1,  # admin user
+                    room_id=room.id,
+                    check_in=check_in,
+                    check_out=check_out,
+                    status="Confirmed"
+                )
+                reservations.append(reservation)
+
+                # Admin notification
+                admin_notif = Notification(
+                    user_id=None,
+                    message=f"Sample reservation #{i+1} created for {room.name}"
+                )
+                notifications.append(admin_notif)
+
+                # User notification
+                user_notif = Notification(
+                    user_id=1,
+                    message=f"Your sample reservation for {room.name} is confirmed. Check-in: {check_in}, Check-out: {check_out}"
+                )
+                notifications.append(user_notif)
+
+            db.session.add_all(reservations)
+            db.session.add_all(notifications)
+            analytics.record_stays(db.session, [(r.room_id, r.check_in, r.check_out, 1, 0.0) for r in reservations])
+            db.session.commit()
+
+app = create_app()
+
 # -----------------
 # Run App
 # -----------------
 if __name__ == '__main__':
+    # Development server: prepare a fresh database, then serve
+    with app.app_context():
+        db.create_all()
+        seed_sample_data()
     app.run(debug=True)
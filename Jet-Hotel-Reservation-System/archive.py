@@ -0,0 +1,92 @@
+"""Hot/cold archival of completed stays.
+
+Reservations that checked out more than ARCHIVE_AFTER_DAYS ago move to
+reservation_history together with their transactions. Notifications older
+than the same cutoff move to notification_history, as do transactions left
+without a reservation by cancel_reservation(). Each batch is copied with one
+INSERT ... SELECT per table, deleted from the hot tables and committed on its
+own, so the hot tables keep only active and upcoming stays and recent activity.
+
+The history tables are range-partitioned by year on MySQL (see models.py).
+DailyRoomStats is left as it is, so reports still cover archived stays, and
+exports and analytics.rebuild() read the history tables too. Moved
+reservations and transactions are journaled as leaving the hot tables, so the
+dashboard projections stop counting them.
+"""
+from datetime import date, datetime, time, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, func, insert, literal, select
+
+from models import db, Reservation, RoomNight, Transaction, Notification, HISTORY
+import journal
+
+BATCH_SIZE = 1000
+
+
+def cutoff(days=None):
+    """Stays that checked out before this date are archived"""
+    if days is None:
+        days = current_app.config.get('ARCHIVE_AFTER_DAYS', 365)
+    return date.today() - timedelta(days=days)
+
+
+def _copy(session, model, condition, archived_at):
+    """INSERT INTO the model's history table SELECT its rows matching condition"""
+    history = HISTORY[model].__table__
+    hot = model.__table__
+    columns = []
+    for column in history.columns:
+        if column.name == 'archived_at':
+            columns.append(literal(archived_at, history.c.archived_at.type))
+        elif column.primary_key and hot.c[column.name].nullable:
+            # Partition keys are part of the history primary key and cannot be NULL
+            columns.append(func.coalesce(hot.c[column.name], archived_at))
+        else:
+            columns.append(hot.c[column.name])
+    session.execute(insert(history).from_select([column.name for column in history.columns],
+                                                select(*columns).where(condition)))
+
+
+def _archive(model, condition, batch_size, children=()):
+    """Move rows of model matching condition in id batches; children are (child model,
+    foreign key column) pairs moved (or, without a history table, deleted) with them"""
+    moved = 0
+    options = {'synchronize_session': False}
+    while True:
+        ids = db.session.execute(
+            select(model.id).where(condition).order_by(model.id).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            return moved
+        archived_at = datetime.utcnow().replace(microsecond=0)
+        for child, foreign_key in children:
+            if child is Transaction:
+                journal.record_removed(db.session, child, foreign_key.in_(ids))
+            if child in HISTORY:
+                _copy(db.session, child, foreign_key.in_(ids), archived_at)
+            db.session.execute(delete(child).where(foreign_key.in_(ids)), execution_options=options)
+        if model in (Reservation, Transaction):
+            journal.record_removed(db.session, model, model.id.in_(ids))
+        _copy(db.session, model, model.id.in_(ids), archived_at)
+        db.session.execute(delete(model).where(model.id.in_(ids)), execution_options=options)
+        db.session.commit()
+        moved += len(ids)
+
+
+def archive(days=None, batch_size=BATCH_SIZE):
+    """Move everything older than the cutoff to the history tables; returns counts per table.
+
+    Archived stays ended before today, so the availability index (which only
+    answers for today onwards) needs no update.
+    """
+    before = cutoff(days)
+    before_time = datetime.combine(before, time.min)
+    counts = {}
+    counts['reservations'] = _archive(Reservation, Reservation.check_out < before, batch_size,
+                                      children=((RoomNight, RoomNight.reservation_id),
+                                                (Transaction, Transaction.reservation_id)))
+    counts['orphaned_transactions'] = _archive(
+        Transaction, Transaction.reservation_id.is_(None) & (Transaction.created_at < before_time), batch_size)
+    counts['notifications'] = _archive(Notification, Notification.created_at < before_time, batch_size)
+    return counts
@@ -0,0 +1,364 @@
+"""Per-process availability index.
+
+Keeps a sorted interval list per room so overlap checks and "free rooms for
+[check_in, check_out)" are answered from memory. The free gaps between each
+room's bookings are derived from that list on first use, so the nearest free
+stay to a wanted date is a bisect per room rather than a probe per date.
+Unpaid holds carry their deadline: overlap checks skip a lapsed hold at once,
+while the free-gap lists keep counting it until the sweeper expires it.
+
+Session events on Reservation and Room writes keep it current. The shared
+AvailabilityVersion row is bumped in the writing transaction itself, as the
+last statement before COMMIT: the booking and the bump succeed or fail
+together, and the row lock is held only for the commit. Once committed, the
+changes are applied to this worker's index; other workers notice the new
+version and reload.
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from models import db, Room, Reservation, AvailabilityVersion
+
+_PENDING_CHANGES = 'availability_changes'
+_PENDING_VERSION = 'availability_version'
+_TRACKED_RESERVATION_FIELDS = ('room_id', 'check_in', 'check_out', 'status', 'expires_at')
+
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+class RoomIntervals:
+    """Immutable, check-in ordered (check_in, check_out, reservation_id, expires_at) intervals for one room"""
+    __slots__ = ('intervals', 'starts', 'max_ends', '_gaps')
+
+    def __init__(self, intervals):
+        self.intervals = sorted(intervals)
+        self.starts = [interval[0] for interval in self.intervals]
+        self.max_ends = []
+        max_end = None
+        for interval in self.intervals:
+            max_end = interval[1] if max_end is None else max(max_end, interval[1])
+            self.max_ends.append(max_end)
+        self._gaps = None
+
+    @property
+    def gaps(self):
+        """(starts, ends) of the free stretches between bookings, built on first use"""
+        if self._gaps is None:
+            starts, ends = [], []
+            free_from = date.min
+            for check_in, check_out, _, _ in self.intervals:
+                if check_in > free_from:
+                    starts.append(free_from)
+                    ends.append(check_in)
+                free_from = max(free_from, check_out)
+            starts.append(free_from)
+            ends.append(date.max)
+            self._gaps = (starts, ends)
+        return self._gaps
+
+    def overlaps(self, check_in, check_out, now=None):
+        # Intervals [0, i) start before check_out; walk back while any could still end after check_in
+        i = bisect_left(self.starts, check_out) - 1
+        while i >= 0 and self.max_ends[i] > check_in:
+            interval = self.intervals[i]
+            if interval[1] > check_in and (interval[3] is None or now is None or interval[3] > now):
+                return True
+            i -= 1
+        return False
+
+    def nearest_start(self, nights, target, earliest, latest):
+        """Free check-in in [earliest, latest] closest to target for a stay of nights, or None"""
+        starts, ends = self.gaps
+        length = timedelta(days=nights)
+        best = None
+        # Every start is >= earliest, so a target before it is as near as earliest itself
+        target = max(target, earliest)
+        # Gaps starting at or before target, nearest first; the first that fits is the closest
+        i = bisect_right(starts, target) - 1
+        for j in range(i, -1, -1):
+            if ends[j] <= earliest:
+                break
+            start = min(target, ends[j] - length)
+            if start >= max(starts[j], earliest):
+                best = start
+                break
+        # Gaps starting after target, nearest first
+        for j in range(i + 1, len(starts)):
+            start = max(starts[j], earliest)
+            if start > latest or (best is not None and start - target >= target - best):
+                break
+            if ends[j] - start >= length:
+                best = start
+                break
+        return best
+
+    def with_interval(self, interval):
+        return RoomIntervals(self.intervals + [interval])
+
+    def without_reservation(self, reservation_id):
+        return RoomIntervals([i for i in self.intervals if i[2] != reservation_id])
+
+
+_EMPTY = RoomIntervals([])
+
+
+class AvailabilityIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._rooms = {}
+        self._locations = {}
+        self._available_room_ids = frozenset()
+        self.version = None
+        self.horizon = None
+        self._stale = True
+        self._checked_at = 0.0
+
+    @property
+    def loaded(self):
+        return self.version is not None and not self._stale
+
+    def load(self):
+        """(Re)build the index from the database"""
+        with self._lock:
+            horizon = date.today()
+            version = current_version(db.session)
+            rooms = db.session.execute(select(Room.id, Room.available)).all()
+            reservations = db.session.execute(
+                select(Reservation.id, Reservation.room_id, Reservation.check_in, Reservation.check_out,
+                       Reservation.expires_at)
+                .where(Reservation.check_out > horizon, Reservation.status.not_in(Reservation.INACTIVE_STATUSES))
+            ).all()
+
+            intervals = {}
+            locations = {}
+            for reservation_id, room_id, check_in, check_out, expires_at in reservations:
+                intervals.setdefault(room_id, []).append((check_in, check_out, reservation_id, expires_at))
+                locations[reservation_id] = room_id
+
+            self._rooms = {room_id: RoomIntervals(items) for room_id, items in intervals.items()}
+            self._locations = locations
+            self._available_room_ids = frozenset(room_id for room_id, available in rooms if available)
+            self.version = version
+            self.horizon = horizon
+            self._stale = False
+            self._checked_at = time.monotonic()
+
+    def clear(self):
+        """Drop the loaded state; the next query reloads"""
+        with self._lock:
+            self.version = None
+            self._stale = True
+
+    def ensure_fresh(self, max_age=None):
+        """Reload if another worker has written since the last check; returns False if unusable"""
+        if max_age is None:
+            max_age = current_app.config.get('AVAILABILITY_INDEX_MAX_AGE', 1.0)
+        if not self.loaded:
+            self.load()
+        elif time.monotonic() - self._checked_at >= max_age:
+            if current_version(db.session) != self.version:
+                self.load()
+            else:
+                self._checked_at = time.monotonic()
+        return self.loaded
+
+    def check_version(self, version):
+        """Compare with a version read elsewhere: mark stale if behind, otherwise count as a fresh check"""
+        with self._lock:
+            if version != self.version:
+                self._stale = True
+            else:
+                self._checked_at = time.monotonic()
+
+    def covers(self, check_in):
+        return self.horizon is not None and _as_date(check_in) >= self.horizon
+
+    # -----------------
+    # Queries
+    # -----------------
+    def has_overlap(self, room_id, check_in, check_out, max_age=None):
+        check_in, check_out = _as_date(check_in), _as_date(check_out)
+        if not self.ensure_fresh(max_age) or not self.covers(check_in):
+            return Reservation.has_overlap(room_id, check_in, check_out)
+        return self._rooms.get(room_id, _EMPTY).overlaps(check_in, check_out, datetime.utcnow())
+
+    def is_available(self, room_id, check_in, check_out, max_age=None):
+        check_in, check_out = _as_date(check_in), _as_date(check_out)
+        if not self.ensure_fresh(max_age) or not self.covers(check_in):
+            return Room.available_for_dates_query(check_in, check_out).filter(Room.id == room_id).count() > 0
+        return room_id in self._available_room_ids and \
+            not self._rooms.get(room_id, _EMPTY).overlaps(check_in, check_out, datetime.utcnow())
+
+    def free_room_ids(self, check_in, check_out, max_age=None):
+        """Ids of available rooms with no reservation overlapping [check_in, check_out)"""
+        check_in, check_out = _as_date(check_in), _as_date(check_out)
+        if not self.ensure_fresh(max_age) or not self.covers(check_in):
+            query = Room.available_for_dates_query(check_in, check_out).with_entities(Room.id)
+            return {room_id for room_id, in query}
+        rooms = self._rooms
+        now = datetime.utcnow()
+        return {
+            room_id for room_id in self._available_room_ids
+            if not rooms.get(room_id, _EMPTY).overlaps(check_in, check_out, now)
+        }
+
+    def nearest_stays(self, check_in, check_out, window=7, limit=6, max_age=None):
+        """Closest free (room_id, check_in, check_out) stays of the same length, within
+        window days either side of check_in, nearest first"""
+        check_in, check_out = _as_date(check_in), _as_date(check_out)
+        length = check_out - check_in
+        earliest = max(check_in - timedelta(days=window), date.today())
+        latest = check_in + timedelta(days=window)
+        if self.ensure_fresh(max_age) and self.covers(earliest):
+            rooms, available = self._rooms, self._available_room_ids
+        else:
+            # Only the reservations touching the window matter for the search
+            intervals = {}
+            for reservation_id, room_id, start, end in db.session.execute(
+                    select(Reservation.id, Reservation.room_id, Reservation.check_in, Reservation.check_out)
+                    .where(Reservation.overlaps(earliest, latest + length))):
+                intervals.setdefault(room_id, []).append((start, end, reservation_id, None))
+            rooms = {room_id: RoomIntervals(items) for room_id, items in intervals.items()}
+            available = {room_id for room_id, in db.session.execute(select(Room.id).where(Room.available.is_(True)))}
+
+        found = []
+        for room_id in available:
+            start = rooms.get(room_id, _EMPTY).nearest_start(length.days, check_in, earliest, latest)
+            if start is not None:
+                found.append((abs((start - check_in).days), start, room_id))
+        return [(room_id, start, start + length) for _, start, room_id in heapq.nsmallest(limit, found)]
+
+    # -----------------
+    # Incremental maintenance
+    # -----------------
+    def apply(self, changes, version):
+        """Apply committed changes if their version directly follows ours, otherwise mark stale"""
+        with self._lock:
+            if not self.loaded or version != self.version + 1:
+                self._stale = True
+                return
+            for change in changes:
+                self._apply_change(change)
+            self.version = version
+
+    def _apply_change(self, change):
+        kind = change[0]
+        if kind == 'reservation':
+            _, reservation_id, room_id, check_in, check_out, expires_at = change
+            self._remove_reservation(reservation_id)
+            self._rooms[room_id] = self._rooms.get(room_id, _EMPTY).with_interval(
+                (_as_date(check_in), _as_date(check_out), reservation_id, expires_at))
+            self._locations[reservation_id] = room_id
+        elif kind == 'reservation_removed':
+            self._remove_reservation(change[1])
+        elif kind == 'room':
+            _, room_id, available = change
+            if available:
+                self._available_room_ids = self._available_room_ids | {room_id}
+            else:
+                self._available_room_ids = self._available_room_ids - {room_id}
+
+    def _remove_reservation(self, reservation_id):
+        room_id = self._locations.pop(reservation_id, None)
+        if room_id is not None:
+            self._rooms[room_id] = self._rooms[room_id].without_reservation(reservation_id)
+
+
+availability_index = AvailabilityIndex()
+
+
+def current_version(session):
+    return session.execute(
+        select(AvailabilityVersion.version).where(AvailabilityVersion.id == 1)
+    ).scalar() or 0
+
+
+def ensure_version_row(session):
+    """Insert the AvailabilityVersion row into a database created before it was seeded
+    with the table (see models.py)"""
+    if session.get(AvailabilityVersion, 1) is None:
+        session.add(AvailabilityVersion(id=1, version=0))
+        session.commit()
+
+
+def bump_version(connection):
+    """Increment the shared version row and return the new value"""
+    table = AvailabilityVersion.__table__
+    connection.execute(table.update().where(table.c.id == 1).values(version=table.c.version + 1))
+    return connection.execute(select(table.c.version).where(table.c.id == 1)).scalar()
+
+
+def record_changes(session, changes):
+    """Queue index changes for the current transaction; the shared version is bumped
+    just before it commits.
+
+    Bulk paths that write with Core statements call this directly; ORM writes are
+    picked up by the after_flush listener below.
+    """
+    if not changes:
+        return
+    session.info.setdefault(_PENDING_CHANGES, []).extend(changes)
+
+
+def _reservation_change(reservation):
+    if reservation.status in Reservation.INACTIVE_STATUSES:
+        return ('reservation_removed', reservation.id)
+    return ('reservation', reservation.id, reservation.room_id, reservation.check_in, reservation.check_out,
+            reservation.expires_at)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changes(session, flush_context):
+    changes = []
+    for obj in session.new:
+        if isinstance(obj, Reservation):
+            changes.append(_reservation_change(obj))
+        elif isinstance(obj, Room):
+            changes.append(('room', obj.id, obj.available))
+    for obj in session.dirty:
+        state = db.inspect(obj)
+        if isinstance(obj, Reservation):
+            if any(state.attrs[field].history.has_changes() for field in _TRACKED_RESERVATION_FIELDS):
+                changes.append(_reservation_change(obj))
+        elif isinstance(obj, Room):
+            if state.attrs.available.history.has_changes():
+                changes.append(('room', obj.id, obj.available))
+    for obj in session.deleted:
+        if isinstance(obj, Reservation):
+            changes.append(('reservation_removed', obj.id))
+        elif isinstance(obj, Room):
+            changes.append(('room', obj.id, False))
+    record_changes(session, changes)
+
+
+@event.listens_for(Session, 'before_commit')
+def _bump_before_commit(session):
+    if session.in_nested_transaction():
+        return
+    # Flush now so the last flush's changes are queued before the bump
+    session.flush()
+    if session.info.get(_PENDING_CHANGES) and _PENDING_VERSION not in session.info:
+        session.info[_PENDING_VERSION] = bump_version(session.connection())
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_changes(session):
+    changes = session.info.pop(_PENDING_CHANGES, None)
+    version = session.info.pop(_PENDING_VERSION, None)
+    if changes and version is not None:
+        availability_index.apply(changes, version)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop(_PENDING_CHANGES, None)
+    session.info.pop(_PENDING_VERSION, None)
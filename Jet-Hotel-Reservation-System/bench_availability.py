@@ -0,0 +1,109 @@
+"""Benchmark the date-range availability search.
+
+Compares the old per-room loop (1 + N queries) against the single NOT EXISTS
+query in Room.get_available_rooms_for_dates and the in-memory availability
+index as room and reservation counts grow.
+
+    python bench_availability.py
+    python bench_availability.py --database-uri mysql+pymysql://root@localhost/hotel_bench
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from flask import Flask
+from sqlalchemy import event, insert
+
+from models import db, User, Room, Reservation
+from availability_index import availability_index
+
+SCALES = [(50, 1000), (200, 10000), (500, 50000)]
+
+
+def legacy_available_rooms(check_in_date, check_out_date):
+    """The previous implementation: one overlap query per room"""
+    available_rooms = []
+    for room in Room.query.filter_by(available=True).all():
+        overlapping_reservation = Reservation.query.filter(
+            Reservation.room_id == room.id,
+            Reservation.check_in < check_out_date,
+            Reservation.check_out > check_in_date
+        ).first()
+        if overlapping_reservation is None:
+            available_rooms.append(room)
+    return available_rooms
+
+
+def seed(room_count, reservation_count):
+    db.drop_all()
+    db.create_all()
+    db.session.execute(insert(User), [{
+        'full_name': 'Bench User', 'email': 'bench@gmail.com', 'contact_info': '0', 'password': 'x'
+    }])
+    db.session.execute(insert(Room), [
+        {'name': f"Room {i}", 'price': 100.0, 'available': True} for i in range(room_count)
+    ])
+    rng = random.Random(42)
+    start = date(2030, 1, 1)
+    rows = []
+    for _ in range(reservation_count):
+        check_in = start + timedelta(days=rng.randrange(730))
+        rows.append({
+            'user_id': 1,
+            'room_id': rng.randrange(1, room_count + 1),
+            'check_in': check_in,
+            'check_out': check_in + timedelta(days=rng.randrange(1, 7)),
+            'status': 'Confirmed',
+        })
+    db.session.execute(insert(Reservation), rows)
+    db.session.commit()
+
+
+def index_available_rooms(check_in_date, check_out_date):
+    return availability_index.free_room_ids(check_in_date, check_out_date, max_age=float('inf'))
+
+
+def measure(func, repeat):
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            db.session.expire_all()
+            result = func(date(2030, 6, 1), date(2030, 6, 4))
+        elapsed = (time.perf_counter() - started) / repeat
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    return len(result), len(statements) // repeat, elapsed * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-uri', default='sqlite://')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = args.database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    print(f"{'rooms':>6} {'reservations':>12} | {'legacy q':>8} {'legacy ms':>10} | "
+          f"{'single q':>8} {'single ms':>10} | {'index q':>8} {'index us':>10}")
+    with app.app_context():
+        for room_count, reservation_count in SCALES:
+            seed(room_count, reservation_count)
+            legacy = measure(legacy_available_rooms, args.repeat)
+            single = measure(Room.get_available_rooms_for_dates, args.repeat)
+            availability_index.load()
+            index = measure(index_available_rooms, args.repeat)
+            assert legacy[0] == single[0] == index[0], "implementations disagree"
+            print(f"{room_count:>6} {reservation_count:>12} | {legacy[1]:>8} {legacy[2]:>10.2f} | "
+                  f"{single[1]:>8} {single[2]:>10.2f} | {index[1]:>8} {index[2] * 1000:>10.1f}")
+        db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Benchmark group bookings against one reserve() path call per room.
+
+    python bench_group_booking.py
+    python bench_group_booking.py --rooms 50 --database-uri mysql+pymysql://root@localhost/hotel_bench
+"""
+import argparse
+import time
+from datetime import date, timedelta
+
+from flask import Flask
+from sqlalchemy import event, insert
+
+from models import db, User, Room
+from booking import book_room, book_rooms
+
+
+def run(func, *args):
+    statements = []
+    listener = lambda *a: statements.append(a[2])
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        started = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - started
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    return len(statements), elapsed * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-uri', default='sqlite://')
+    parser.add_argument('--rooms', type=int, default=40)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = args.database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.execute(insert(User), [{'full_name': 'Tour Operator', 'email': 'tours@gmail.com',
+                                           'contact_info': '0', 'password': 'x'}])
+        db.session.execute(insert(Room), [{'name': f"Room {i}", 'price': 100.0, 'available': True}
+                                          for i in range(args.rooms)])
+        db.session.commit()
+        user = db.session.get(User, 1)
+        rooms = Room.query.order_by(Room.id).all()
+        first_stay = (date.today() + timedelta(days=30), date.today() + timedelta(days=33))
+        second_stay = (date.today() + timedelta(days=60), date.today() + timedelta(days=63))
+
+        def one_by_one():
+            for room in rooms:
+                book_room(user, room, *first_stay)
+
+        single_q, single_ms = run(one_by_one)
+        group_q, group_ms = run(book_rooms, user, [(room.id, *second_stay) for room in rooms])
+
+        print(f"{args.rooms} rooms")
+        print(f"  one booking per room: {single_q:>5} queries {single_ms:>9.1f} ms  ({single_ms / args.rooms:.2f} ms/room)")
+        print(f"  group booking:        {group_q:>5} queries {group_ms:>9.1f} ms  ({group_ms / args.rooms:.2f} ms/room)")
+        db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Measure home page latency for a signed-in guest while a login flood runs.
+
+    python bench_login_flood.py
+    python bench_login_flood.py --attackers 32 --seconds 10
+
+Runs three rounds against one app on a SQLite file: no flood, a flood of
+wrong-password logins with the configured hashing cap, and the same flood
+with the cap raised to one hash per attacker (nothing shed). The last round is
+how unbounded hashing on every request thread behaved.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run_round(app, attackers, seconds, think, hash_config):
+    from passwords import hash_slots
+    hash_slots.reset()
+    app.config.update(hash_config)
+
+    stop = threading.Event()
+    outcomes = {}
+    lock = threading.Lock()
+
+    def attack():
+        client = app.test_client()
+        while not stop.is_set():
+            status = client.post('/login', data={'email': "guest@gmail.com", 'password': "wrong"}).status_code
+            with lock:
+                outcomes[status] = outcomes.get(status, 0) + 1
+            stop.wait(think)
+
+    browser = app.test_client()
+    browser.post('/login', data={'email': "guest@gmail.com", 'password': "Secret123"})
+    threads = [threading.Thread(target=attack, daemon=True) for _ in range(attackers)]
+    for thread in threads:
+        thread.start()
+
+    latencies = []
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        assert browser.get('/').status_code == 200
+        latencies.append((time.perf_counter() - started) * 1000)
+        time.sleep(0.02)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return latencies, outcomes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--attackers', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--think-ms', type=float, default=20.0,
+                        help='Pause between one attacker\'s attempts (network round trip, client work).')
+    parser.add_argument('--max-concurrent', type=int,
+                        help='PASSWORD_HASH_MAX_CONCURRENT for the capped round (default: config).')
+    args = parser.parse_args()
+
+    from app import create_app, seed_sample_data
+    from models import db, User
+    from passwords import hash_password
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                          'SQLALCHEMY_ENGINE_OPTIONS': {'connect_args': {'timeout': 30}},
+                          'OUTBOX_WORKERS': 0, 'MAIL_SUPPRESS_SEND': True, 'INSTRUMENTATION_ENABLED': False})
+        app.logger.disabled = True
+        with app.app_context():
+            db.create_all()
+            seed_sample_data()
+            db.session.add(User(full_name="Guest", email="guest@gmail.com", contact_info="123",
+                                password=hash_password("Secret123")))
+            db.session.commit()
+
+        rounds = (
+            ('no flood', 0, {}),
+            ('flood, capped', args.attackers,
+             {'PASSWORD_HASH_MAX_CONCURRENT': args.max_concurrent or app.config['PASSWORD_HASH_MAX_CONCURRENT']}),
+            ('flood, unbounded', args.attackers, {'PASSWORD_HASH_MAX_CONCURRENT': args.attackers}),
+        )
+        print(f"{'round':<22} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}  logins (status: count)")
+        for label, attackers, hash_config in rounds:
+            latencies, outcomes = run_round(app, attackers, args.seconds, args.think_ms / 1000, hash_config)
+            print(f"{label:<22} {statistics.median(latencies):>8.1f} {_percentile(latencies, 95):>8.1f} "
+                  f"{max(latencies):>8.1f}  {dict(sorted(outcomes.items()))}")
+
+
+if __name__ == '__main__':
+    main()
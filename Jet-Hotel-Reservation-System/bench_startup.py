@@ -0,0 +1,67 @@
+"""Measure cold import and first-request time of the app in fresh interpreters.
+
+    python bench_startup.py
+    python bench_startup.py --tree /path/to/other/checkout --runs 10
+
+Each run starts a new Python process against a prepared SQLite file, imports
+app and serves GET / once. Pass --tree to time another checkout (for example
+a git worktree of an older commit) with the same database.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PROBE = """
+import json, time
+started = time.perf_counter()
+from app import app
+imported = time.perf_counter()
+app.config['MAIL_SUPPRESS_SEND'] = True
+response = app.test_client().get('/')
+served = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({'import_ms': (imported - started) * 1000, 'first_request_ms': (served - imported) * 1000}))
+"""
+
+
+def prepare_database(tree, database_url):
+    """Create and seed the schema, via the CLI where the tree has it"""
+    env = dict(os.environ, DATABASE_URL=database_url, OUTBOX_WORKERS='0')
+    commands = subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', '--help'], cwd=tree, env=env,
+                              capture_output=True, text=True).stdout
+    if 'init-db' in commands:
+        for command in ('init-db', 'seed'):
+            subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', command], cwd=tree, env=env,
+                           check=True, capture_output=True)
+
+
+def measure(tree, database_url):
+    env = dict(os.environ, DATABASE_URL=database_url, OUTBOX_WORKERS='0', PYTHONDONTWRITEBYTECODE='')
+    result = subprocess.run([sys.executable, '-c', PROBE], cwd=tree, env=env, check=True,
+                            capture_output=True, text=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tree', default=os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        prepare_database(args.tree, database_url)
+        measure(args.tree, database_url)   # Warm the bytecode cache and seed older trees
+        samples = [measure(args.tree, database_url) for _ in range(args.runs)]
+
+    print(f"{args.tree} ({args.runs} runs, median)")
+    for key, label in (('import_ms', 'import app'), ('first_request_ms', 'first GET /')):
+        print(f"  {label:<12} {statistics.median(s[key] for s in samples):>8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
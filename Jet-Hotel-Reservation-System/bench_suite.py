@@ -0,0 +1,303 @@
+"""Load and latency benchmarks for the main routes on generated data.
+
+    python bench_suite.py                                  # small scale, throwaway SQLite file
+    python bench_suite.py --scale large --output results.json
+    python bench_suite.py --database-url mysql+pymysql://root@localhost/hotel_bench --scale medium
+    python bench_suite.py --reuse --compare results.json   # rerun on the same data, show deltas
+
+The generator drops and recreates the schema, then bulk inserts users, rooms
+and non-overlapping reservations with their room nights, transactions and
+notifications. Generation is deterministic for a given --seed. Each scenario
+then drives the real routes through the Flask test client. It reports
+p50/p95/p99 latency, SQL statements per request (from the Server-Timing
+header) and throughput, and writes everything to a JSON file that can be
+compared with a run from another commit.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time as day_time, timedelta
+
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+
+SCALES = {
+    'small': {'rooms': 50, 'users': 1000, 'reservations': 10_000},
+    'medium': {'rooms': 200, 'users': 10_000, 'reservations': 100_000},
+    'large': {'rooms': 1000, 'users': 100_000, 'reservations': 1_000_000},
+}
+CHUNK = 10_000
+PASSWORD = 'benchpass'
+_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+# -----------------
+# Data generation
+# -----------------
+def _chunked(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == CHUNK:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _bulk_insert(db, model, rows):
+    count = 0
+    for batch in _chunked(rows):
+        db.session.execute(insert(model), batch)
+        db.session.commit()
+        count += len(batch)
+    return count
+
+
+def _stays(rng, rooms, reservations, today):
+    """(id, room_id, check_in, check_out) stays spread evenly over rooms, about 10% of them upcoming"""
+    per_room, extra = divmod(reservations, rooms)
+    reservation_id = 0
+    for room_id in range(1, rooms + 1):
+        count = per_room + (1 if room_id <= extra else 0)
+        # Stays average about 4.5 days including the gap before them
+        day = today - timedelta(days=int(count * 4.5 * 0.9))
+        for _ in range(count):
+            day += timedelta(days=rng.randint(0, 3))
+            nights = rng.randint(1, 5)
+            reservation_id += 1
+            yield reservation_id, room_id, day, day + timedelta(days=nights)
+            day += timedelta(days=nights)
+
+
+def generate(db, rooms, users, reservations, seed=42):
+    """Recreate the schema and fill it; returns row counts"""
+    from models import User, Room, Reservation, RoomNight, Transaction, Notification
+
+    rng = random.Random(seed)
+    today = date.today()
+    db.drop_all()
+    db.create_all()
+
+    password = generate_password_hash(PASSWORD)
+    counts = {}
+    counts['users'] = _bulk_insert(db, User, (
+        {'id': i, 'full_name': f"Guest {i}" if i > 1 else "Admin", 'email': f"user{i}@gmail.com",
+         'contact_info': '09170000000', 'password': password, 'is_admin': i == 1}
+        for i in range(1, users + 1)))
+    counts['rooms'] = _bulk_insert(db, Room, (
+        {'id': i, 'name': f"Room {i}", 'price': float(rng.choice((100, 150, 200, 250, 350))),
+         'description': "Generated room", 'image': 'standard.jpg', 'available': rng.random() > 0.05}
+        for i in range(1, rooms + 1)))
+
+    stays = list(_stays(rng, rooms, reservations, today))
+    created = {reservation_id: datetime.combine(check_in - timedelta(days=rng.randint(1, 60)),
+                                                day_time(rng.randint(0, 23), rng.randint(0, 59)))
+               for reservation_id, _, check_in, _ in stays}
+    owners = {reservation_id: rng.randint(2, users) if users > 1 else 1 for reservation_id, _, _, _ in stays}
+    counts['reservations'] = _bulk_insert(db, Reservation, (
+        {'id': reservation_id, 'user_id': owners[reservation_id], 'room_id': room_id, 'check_in': check_in,
+         'check_out': check_out, 'status': 'Confirmed' if check_in <= today else 'Pending',
+         'created_at': created[reservation_id]}
+        for reservation_id, room_id, check_in, check_out in stays))
+    counts['room_nights'] = _bulk_insert(db, RoomNight, (
+        {'room_id': room_id, 'night': check_in + timedelta(days=n), 'reservation_id': reservation_id}
+        for reservation_id, room_id, check_in, check_out in stays
+        for n in range((check_out - check_in).days)))
+    counts['transactions'] = _bulk_insert(db, Transaction, (
+        {'reservation_id': reservation_id, 'amount': 100.0 * (check_out - check_in).days,
+         'status': 'Paid' if check_in <= today else rng.choice(('Pending', 'Payment Confirmed')),
+         'created_at': created[reservation_id]}
+        for reservation_id, _, check_in, check_out in stays))
+    counts['notifications'] = _bulk_insert(db, Notification, (
+        {'user_id': owners[reservation_id] if n else None, 'is_read': check_in <= today,
+         'message': f"Reservation #{reservation_id} created", 'created_at': created[reservation_id]}
+        for reservation_id, _, check_in, _ in stays for n in (0, 1)))
+    # Derived from the rows above, like a backfill after an import
+    import analytics
+    counts['daily_room_stats'] = analytics.rebuild(batch_size=CHUNK)
+    return counts
+
+
+# -----------------
+# Scenarios
+# -----------------
+def _login(client, user_id):
+    client.post('/login', data={'email': f"user{user_id}@gmail.com", 'password': PASSWORD})
+
+
+def _future_range(rng):
+    check_in = date.today() + timedelta(days=rng.randint(1, 180))
+    return check_in, check_in + timedelta(days=rng.randint(1, 5))
+
+
+def scenarios(users, rooms):
+    """name -> (setup(client, rng), request(client, rng)); requests return a response"""
+    guest = lambda client, rng: _login(client, rng.randint(2, max(users, 2)))
+    admin = lambda client, rng: _login(client, 1)
+    anonymous = lambda client, rng: None
+
+    def search(client, rng):
+        check_in, check_out = _future_range(rng)
+        return client.get(f"/?check_in={check_in}&check_out={check_out}")
+
+    def reserve(client, rng):
+        check_in, check_out = _future_range(rng)
+        response = client.post(f"/reserve/{rng.randint(1, rooms)}",
+                               data={'check_in': check_in.isoformat(), 'check_out': check_out.isoformat()})
+        # Booking flashes would otherwise pile up in the session cookie
+        with client.session_transaction() as session:
+            session.pop('_flashes', None)
+        return response
+
+    return {
+        'home': (anonymous, lambda client, rng: client.get('/')),
+        'search': (guest, search),
+        'reserve': (guest, reserve),
+        'dashboard': (admin, lambda client, rng: client.get('/dashboard')),
+        'calendar': (admin, lambda client, rng: client.get('/admin/calendar')),
+        'admin_reservations': (admin, lambda client, rng: client.get('/admin/reservations')),
+        'transactions': (guest, lambda client, rng: client.get('/transactions')),
+        'notifications': (guest, lambda client, rng: client.get('/notifications')),
+    }
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run_scenario(app, setup, request, requests, concurrency, seed):
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        client = app.test_client()
+        setup(client, rng)
+        samples = []
+        for _ in range(requests // concurrency + (1 if index < requests % concurrency else 0)):
+            started = time.perf_counter()
+            response = request(client, rng)
+            elapsed = time.perf_counter() - started
+            match = _QUERIES.search(response.headers.get('Server-Timing', ''))
+            samples.append((elapsed, int(match.group(1)) if match else None, response.status_code))
+        return samples
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = [sample for result in pool.map(worker, range(concurrency)) for sample in result]
+    wall = time.perf_counter() - started
+
+    latencies = [elapsed * 1000 for elapsed, _, _ in samples]
+    queries = [count for _, count, _ in samples if count is not None]
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for _, _, status in samples if status >= 500),
+        'p50_ms': round(_percentile(latencies, 50), 3),
+        'p95_ms': round(_percentile(latencies, 95), 3),
+        'p99_ms': round(_percentile(latencies, 99), 3),
+        'mean_ms': round(statistics.fmean(latencies), 3),
+        'queries_per_request': round(statistics.fmean(queries), 2) if queries else None,
+        'throughput_rps': round(len(samples) / wall, 1),
+    }
+
+
+# -----------------
+# Reporting
+# -----------------
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_report(results, baseline=None):
+    print(f"commit {results['commit']}  {results['database']}  {results['counts']}")
+    print(f"{'scenario':<20}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}{'req/s':>9}")
+    for name, stats in results['scenarios'].items():
+        line = (f"{name:<20}{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}{stats['p99_ms']:>9.2f}"
+                f"{stats['queries_per_request'] or 0:>9.1f}{stats['throughput_rps']:>9.1f}")
+        before = (baseline or {}).get('scenarios', {}).get(name)
+        if before:
+            change = (stats['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0
+            line += f"   p95 {change:+.0f}% vs {baseline['commit']}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', help='Defaults to a SQLite file in a temporary directory.')
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    parser.add_argument('--rooms', type=int)
+    parser.add_argument('--users', type=int)
+    parser.add_argument('--reservations', type=int)
+    parser.add_argument('--requests', type=int, default=200, help='Requests per scenario.')
+    parser.add_argument('--concurrency', type=int, default=1, help='Client threads per scenario.')
+    parser.add_argument('--scenario', action='append', help='Run only these scenarios (repeatable).')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reuse', action='store_true', help='Skip generation and use the existing data.')
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', help='Earlier results file to compare against.')
+    args = parser.parse_args()
+    if args.reuse and not args.database_url:
+        parser.error('--reuse needs --database-url pointing at previously generated data')
+
+    scale = dict(SCALES[args.scale])
+    scale.update({key: getattr(args, key) for key in scale if getattr(args, key)})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        # Importing app also builds the module-level app from the environment
+        os.environ['DATABASE_URL'] = database_url
+        os.environ.pop('REPLICA_DATABASE_URL', None)
+        from app import create_app
+        from models import db
+        from availability_index import availability_index
+        from catalog import catalog_cache
+        app = create_app({'OUTBOX_WORKERS': 0, 'MAIL_SUPPRESS_SEND': True, 'WTF_CSRF_ENABLED': False})
+        app.logger.disabled = True   # N+1 warnings are reported in the numbers, not the console
+
+        with app.app_context():
+            started = time.perf_counter()
+            counts = None if args.reuse else generate(db, seed=args.seed, **scale)
+            generate_seconds = round(time.perf_counter() - started, 2)
+        # The bulk inserts bypass the session hooks that keep these caches current
+        availability_index.clear()
+        catalog_cache.clear()
+
+        results = {
+            'commit': _commit(),
+            'timestamp': datetime.utcnow().isoformat(timespec='seconds'),
+            'database': database_url.split('://')[0],
+            'scale': scale,
+            'counts': counts,
+            'generate_seconds': None if args.reuse else generate_seconds,
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'scenarios': {},
+        }
+        for name, (setup, request) in scenarios(scale['users'], scale['rooms']).items():
+            if args.scenario and name not in args.scenario:
+                continue
+            results['scenarios'][name] = run_scenario(app, setup, request, args.requests, args.concurrency,
+                                                      args.seed)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print_report(results, baseline)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+"""Atomic booking operations.
+
+A booking writes the Reservation, its RoomNight rows, the pending Transaction,
+the admin and guest notifications, the confirmation email and the occupancy
+rollups in a single transaction. The reservation is an unpaid hold until
+payment is confirmed; a lapsed hold on the wanted nights is expired first (see
+holds.py). Double bookings are rejected by the database itself: the unique
+(room_id, night) constraint on RoomNight fails the flush of the second writer,
+so no check-then-insert race or room-level serialization is needed.
+"""
+from datetime import datetime
+
+from sqlalchemy import insert, or_, select
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Room, Reservation, RoomNight, Transaction, Notification, stay_nights
+from availability_index import availability_index, record_changes
+from outbox import enqueue_email
+from analytics import record_stay, record_stays
+from notification_feed import broker
+from holds import hold_deadline, release_lapsed_holds
+import journal
+
+
+def _room_night_taken(error):
+    """Whether an IntegrityError is the uq_room_night constraint (another booking got
+    the night first) rather than some other failure that must not look like one"""
+    message = str(error.orig)
+    # MySQL names the key; SQLite lists the columns
+    return 'uq_room_night' in message or 'room_night.room_id, room_night.night' in message
+
+
+class RoomUnavailable(Exception):
+    """The room is already reserved for some of the requested nights"""
+
+    def __init__(self, conflicts=()):
+        super().__init__()
+        # (room_id, check_in, check_out) items that could not be booked
+        self.conflicts = list(conflicts)
+
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def book_room(user, room, check_in, check_out):
+    """Reserve room for user from check_in to check_out (exclusive).
+
+    Returns (reservation, transaction); raises RoomUnavailable on overlap.
+    """
+    check_in, check_out = _as_date(check_in), _as_date(check_out)
+
+    # Cheap in-memory rejection; the database has the final word below
+    if availability_index.has_overlap(room.id, check_in, check_out):
+        raise RoomUnavailable()
+
+    nights = (check_out - check_in).days
+    total_amount = room.price * nights
+    try:
+        release_lapsed_holds(db.session, [(room.id, check_in, check_out)])
+        reservation = Reservation(user_id=user.id, room_id=room.id, check_in=check_in,
+                                  check_out=check_out, status="Pending", expires_at=hold_deadline())
+        db.session.add(reservation)
+        db.session.flush()   # Inserts the room nights; a concurrent booking fails here
+        record_stay(db.session, room.id, check_in, check_out)
+
+        transaction = Transaction(reservation_id=reservation.id, amount=total_amount, status="Pending")
+        db.session.add(transaction)
+        db.session.add(Notification(
+            user_id=None,  # admin
+            message=f"New reservation #{reservation.id} created by User {user.full_name} - ₱{total_amount} (Pending Payment)"
+        ))
+        db.session.add(Notification(
+            user_id=user.id,
+            message=f"Your reservation for {room.name} is pending payment. Check-in: {check_in}, Check-out: {check_out}. Total: ₱{total_amount}. Please proceed to payment."
+        ))
+        enqueue_email(
+            subject="Reservation Created - Payment Pending",
+            recipients=[user.email],
+            body=f"""
+        Hello {user.full_name},
+
+        Your reservation has been created and is pending payment confirmation.
+
+        Room: {room.name}
+        Check-in: {check_in}
+        Check-out: {check_out}
+        Nights: {nights}
+        Price per night: ₱{room.price}
+        Total Amount: ₱{total_amount}
+
+        Please proceed to the transactions page to confirm your payment.
+        You can pay over-the-counter or through online payment.
+
+        Thank you for choosing our hotel!
+        """
+        )
+        db.session.commit()
+    except IntegrityError as error:
+        db.session.rollback()
+        if not _room_night_taken(error):
+            raise
+        raise RoomUnavailable()
+    return reservation, transaction
+
+
+def book_rooms(user, items):
+    """Book many (room_id, check_in, check_out) stays for user, all or nothing.
+
+    Availability for every item is checked with one query and all rows are
+    written with bulk INSERTs in one transaction, followed by one consolidated
+    notification pair and email. Returns the new reservation ids in item order;
+    raises RoomUnavailable listing the conflicting items, or ValueError for
+    unknown rooms.
+    """
+    items = [(room_id, _as_date(check_in), _as_date(check_out)) for room_id, check_in, check_out in items]
+    rooms = {room.id: room for room in Room.query.filter(Room.id.in_({item[0] for item in items}))}
+    unknown = sorted({room_id for room_id, _, _ in items} - rooms.keys())
+    if unknown:
+        raise ValueError(f"Unknown rooms: {', '.join(map(str, unknown))}")
+
+    conflicts = _group_conflicts(items, rooms)
+    if conflicts:
+        raise RoomUnavailable(conflicts)
+
+    # Whole seconds so the id read-back matches a MySQL DATETIME column exactly
+    created_at = datetime.utcnow().replace(microsecond=0)
+    expires_at = hold_deadline(created_at)
+    try:
+        release_lapsed_holds(db.session, items)
+        reservation_ids = _insert_reservations([{
+            'user_id': user.id, 'room_id': room_id, 'check_in': check_in, 'check_out': check_out,
+            'status': "Pending", 'created_at': created_at, 'expires_at': expires_at,
+        } for room_id, check_in, check_out in items])
+
+        nights = []
+        transactions = []
+        total_amount = 0
+        lines = []
+        for reservation_id, (room_id, check_in, check_out) in zip(reservation_ids, items):
+            room = rooms[room_id]
+            stay = stay_nights(check_in, check_out)
+            nights.extend({'room_id': room_id, 'night': night, 'reservation_id': reservation_id} for night in stay)
+            amount = room.price * len(stay)
+            total_amount += amount
+            transactions.append({'reservation_id': reservation_id, 'amount': amount, 'status': "Pending",
+                                 'created_at': created_at})
+            lines.append(f"        #{reservation_id} {room.name}: {check_in} to {check_out}, {len(stay)} nights, ₱{amount}")
+
+        # The unique room-night constraint still guards against concurrent writers
+        db.session.execute(insert(RoomNight), nights)
+        db.session.execute(insert(Transaction), transactions)
+        journal.record(db.session, [journal.reservation_event(reservation_id, user.id, None, "Pending")
+                                    for reservation_id in reservation_ids])
+        journal.record_new_transactions(db.session, reservation_ids)
+        db.session.execute(insert(Notification), [
+            {'user_id': None, 'created_at': created_at, 'is_read': False,
+             'message': f"Group reservation of {len(items)} rooms created by User {user.full_name} - ₱{total_amount} (Pending Payment)"},
+            {'user_id': user.id, 'created_at': created_at, 'is_read': False,
+             'message': f"Your group reservation of {len(items)} rooms is pending payment. Total: ₱{total_amount}. Please proceed to payment."},
+        ])
+        record_changes(db.session, [
+            ('reservation', reservation_id, room_id, check_in, check_out, expires_at)
+            for reservation_id, (room_id, check_in, check_out) in zip(reservation_ids, items)
+        ])
+        record_stays(db.session, [(room_id, check_in, check_out, 1, 0.0) for room_id, check_in, check_out in items])
+        line_list = "\n".join(lines)
+        enqueue_email(
+            subject="Group Reservation Created - Payment Pending",
+            recipients=[user.email],
+            body=f"""
+        Hello {user.full_name},
+
+        Your group reservation has been created and is pending payment confirmation.
+
+{line_list}
+
+        Total Amount: ₱{total_amount}
+
+        Please proceed to the transactions page to confirm your payments.
+
+        Thank you for choosing our hotel!
+        """
+        )
+        db.session.commit()
+    except IntegrityError as error:
+        db.session.rollback()
+        if not _room_night_taken(error):
+            raise
+        # Another writer took some of the nights since the check; name them if they are visible yet
+        raise RoomUnavailable(_group_conflicts(items, rooms) or items)
+    # Bulk inserted notifications bypass the flush hook, so wake the streams here
+    broker.publish()
+    return reservation_ids
+
+
+def _group_conflicts(items, rooms):
+    """Items that overlap an earlier item for the same room, are not bookable, or overlap
+    an existing stay, in item order"""
+    conflicts = [item for item in items if not rooms[item[0]].available]
+    # Compared with the latest check-out so far per room, not just the previous item:
+    # (1-10) must catch (5-6) even after (2-3)
+    latest_check_out = {}
+    for item in sorted(items):
+        room_id, check_in, check_out = item
+        if room_id in latest_check_out and latest_check_out[room_id] > check_in:
+            conflicts.append(item)
+        latest_check_out[room_id] = max(latest_check_out.get(room_id, check_out), check_out)
+    booked = db.session.execute(
+        select(Reservation.room_id, Reservation.check_in, Reservation.check_out)
+        .where(or_(*[Reservation.overlaps(check_in, check_out, room_id=room_id) for room_id, check_in, check_out in items]))
+    ).all()
+    for room_id, check_in, check_out in items:
+        if any(b.room_id == room_id and b.check_in < check_out and b.check_out > check_in for b in booked):
+            conflicts.append((room_id, check_in, check_out))
+    conflicts = set(conflicts)
+    return [item for item in dict.fromkeys(items) if item in conflicts]
+
+
+def _insert_reservations(rows):
+    """Bulk insert reservation rows and return their ids in row order.
+
+    A single executemany INSERT, then one SELECT to read the ids back (MySQL
+    cannot RETURNING from an executemany). The rows share user and created_at,
+    and a room cannot have two stays starting the same day, so
+    (room_id, check_in) identifies each one.
+    """
+    db.session.execute(insert(Reservation), rows)
+    inserted = db.session.execute(
+        select(Reservation.id, Reservation.room_id, Reservation.check_in)
+        .where(Reservation.user_id == rows[0]['user_id'],
+               Reservation.created_at == rows[0]['created_at'],
+               Reservation.room_id.in_({row['room_id'] for row in rows}))
+    ).all()
+    ids = {(room_id, check_in): reservation_id for reservation_id, room_id, check_in in inserted}
+    return [ids[(row['room_id'], row['check_in'])] for row in rows]
@@ -0,0 +1,183 @@
+"""Bulk admin cancellation and confirmation of reservations.
+
+cancel_reservation() and approve_payment() load, change and commit one
+reservation per POST. Here a filtered set (rooms, a date range, a status) is
+walked in id batches, and each batch is one transaction of set-based
+statements: an UPDATE or DELETE per table, one INSERT of all notifications and
+one of all outbox emails (one per guest per batch, sent by the outbox workers
+over a single SMTP connection), plus the rollup and availability index updates
+the single-reservation views make. The size and wall time of every batch are
+reported back.
+"""
+import time
+from datetime import datetime
+
+from sqlalchemy import and_, delete, insert, select, update
+
+from models import db, User, Room, Reservation, RoomNight, Transaction, Notification, OutboxMessage
+from availability_index import record_changes
+from notification_feed import broker
+from outbox import outbox_workers
+import analytics
+import journal
+
+BATCH_SIZE = 500
+
+
+def reservation_filter(room_ids=None, start=None, end=None, status=None):
+    """SQL condition for reservations in room_ids, overlapping [start, end), with status"""
+    conditions = []
+    if room_ids:
+        conditions.append(Reservation.room_id.in_(room_ids))
+    if start is not None:
+        conditions.append(Reservation.check_out > start)
+    if end is not None:
+        conditions.append(Reservation.check_in < end)
+    if status:
+        conditions.append(Reservation.status == status)
+    return and_(*conditions)
+
+
+def _batch(condition, last_id, batch_size):
+    return db.session.execute(
+        select(Reservation.id, Reservation.user_id, Reservation.room_id, Reservation.check_in,
+               Reservation.check_out, Reservation.status, User.email, User.full_name, Room.name.label('room_name'))
+        .join(User, User.id == Reservation.user_id)
+        .join(Room, Room.id == Reservation.room_id)
+        .where(condition, Reservation.id > last_id)
+        .order_by(Reservation.id)
+        .limit(batch_size)
+    ).all()
+
+
+def _transactions(ids):
+    return db.session.execute(
+        select(Transaction.id, Transaction.reservation_id, Transaction.amount, Transaction.status)
+        .where(Transaction.reservation_id.in_(ids))
+    ).all()
+
+
+def _notify(rows, now, guest_message, admin_message, subject, email_line):
+    """One INSERT of the guests' notifications and the admin summary, one of the guests' emails"""
+    db.session.execute(insert(Notification), [
+        {'user_id': row.user_id, 'message': guest_message(row), 'created_at': now, 'is_read': False}
+        for row in rows
+    ] + [{'user_id': None, 'message': admin_message, 'created_at': now, 'is_read': False}])
+
+    guests = {}
+    for row in rows:
+        guests.setdefault(row.user_id, []).append(row)
+    db.session.execute(insert(OutboxMessage), [{
+        'subject': subject,
+        'recipients': stays[0].email,
+        'created_at': now,
+        'next_attempt_at': now,
+        'body': f"""
+Hello {stays[0].full_name},
+
+{chr(10).join(email_line(row) for row in stays)}
+
+Thank you for choosing our hotel!
+""",
+    } for stays in guests.values()])
+
+
+def _cancel(rows, now):
+    ids = [row.id for row in rows]
+    transactions = _transactions(ids)
+    paid = {}
+    for _, reservation_id, amount, status in transactions:
+        if status == "Paid":
+            paid[reservation_id] = paid.get(reservation_id, 0.0) + amount
+
+    # Release the nights and any paid revenue from the rollups, as cancel_reservation() does
+    analytics.record_stays(db.session, [
+        (row.room_id, row.check_in, row.check_out, 0 if row.status in Reservation.INACTIVE_STATUSES else -1,
+         -paid.get(row.id, 0.0))
+        for row in rows
+    ])
+    options = {'synchronize_session': False}
+    db.session.execute(update(Transaction).where(Transaction.reservation_id.in_(ids))
+                       .values(status="Cancelled", reservation_id=None), execution_options=options)
+    db.session.execute(delete(RoomNight).where(RoomNight.reservation_id.in_(ids)), execution_options=options)
+    db.session.execute(delete(Reservation).where(Reservation.id.in_(ids)), execution_options=options)
+    record_changes(db.session, [('reservation_removed', reservation_id) for reservation_id in ids])
+    # Cancelled, then gone from the hot tables, as when cancel_reservation() deletes one
+    journal.record(db.session, [
+        journal.reservation_event(row.id, row.user_id, row.status, "Cancelled")
+        for row in rows if row.status != "Cancelled"
+    ] + [journal.reservation_event(row.id, row.user_id, "Cancelled", None) for row in rows] + [
+        journal.transaction_event(transaction_id, reservation_id, status, "Cancelled", amount)
+        for transaction_id, reservation_id, amount, status in transactions if status != "Cancelled"
+    ])
+    _notify(rows, now,
+            guest_message=lambda row: f"Your reservation #{row.id} has been cancelled by admin.",
+            admin_message=f"{len(rows)} reservations cancelled in bulk (#{ids[0]} to #{ids[-1]}).",
+            subject="Reservation Cancelled",
+            email_line=lambda row: f"Your reservation #{row.id} for {row.room_name} "
+                                   f"({row.check_in} to {row.check_out}) has been cancelled by the hotel.")
+
+
+def _confirm(rows, now):
+    ids = [row.id for row in rows]
+    revenue = {}
+    payable = []
+    events = [journal.reservation_event(row.id, row.user_id, row.status, "Confirmed") for row in rows]
+    for transaction_id, reservation_id, amount, status in _transactions(ids):
+        if status not in ("Paid", "Cancelled"):
+            payable.append(transaction_id)
+            revenue[reservation_id] = revenue.get(reservation_id, 0.0) + amount
+            events.append(journal.transaction_event(transaction_id, reservation_id, status, "Paid", amount))
+
+    options = {'synchronize_session': False}
+    if payable:
+        db.session.execute(update(Transaction).where(Transaction.id.in_(payable)).values(status="Paid"),
+                           execution_options=options)
+    db.session.execute(update(Reservation).where(Reservation.id.in_(ids))
+                       .values(status="Confirmed", expires_at=None), execution_options=options)
+    # Add the newly paid revenue to the rollups, as approve_payment() does; confirmed stays no longer lapse
+    analytics.record_stays(db.session, [(row.room_id, row.check_in, row.check_out, 0, revenue[row.id])
+                                        for row in rows if row.id in revenue])
+    record_changes(db.session, [('reservation', row.id, row.room_id, row.check_in, row.check_out, None)
+                                for row in rows])
+    journal.record(db.session, events)
+    _notify(rows, now,
+            guest_message=lambda row: f"Your payment for Reservation #{row.id} has been approved. "
+                                      f"Your reservation is now confirmed!",
+            admin_message=f"{len(rows)} reservations confirmed in bulk (#{ids[0]} to #{ids[-1]}).",
+            subject="Reservation Confirmed",
+            email_line=lambda row: f"Your reservation #{row.id} for {row.room_name} "
+                                   f"({row.check_in} to {row.check_out}) is now confirmed!")
+
+
+ACTIONS = {
+    'cancel': (_cancel, None),
+    # Only live reservations that are not confirmed yet
+    'confirm': (_confirm, Reservation.status.not_in(Reservation.INACTIVE_STATUSES + ("Confirmed",))),
+}
+
+
+def run(action, condition, batch_size=BATCH_SIZE):
+    """Apply action ('cancel' or 'confirm') to the reservations matching condition.
+
+    Returns {'action', 'updated', 'batches': [{'reservations', 'seconds'}, ...]}.
+    """
+    apply, eligible = ACTIONS[action]
+    if eligible is not None:
+        condition = and_(condition, eligible)
+    batches = []
+    last_id = 0
+    while True:
+        started = time.perf_counter()
+        rows = _batch(condition, last_id, batch_size)
+        if not rows:
+            break
+        apply(rows, datetime.utcnow())
+        db.session.commit()
+        last_id = rows[-1].id
+        batches.append({'reservations': len(rows), 'seconds': round(time.perf_counter() - started, 4)})
+    if batches:
+        # Bulk inserted rows bypass the flush hooks, so wake the streams and the mailers here
+        broker.publish()
+        outbox_workers.wake()
+    return {'action': action, 'updated': sum(batch['reservations'] for batch in batches), 'batches': batches}
@@ -0,0 +1,112 @@
+"""Versioned room catalog cache.
+
+The room grid on the landing page only changes when an admin adds, edits or
+deletes a room (CatalogVersion) or when bookings change what is taken tonight
+(AvailabilityVersion). Anonymous, date-less views are rendered once per
+(catalog version, availability version, day) and served from memory with an
+ETag, so repeat visitors and reverse proxies get 304s. Both versions are
+re-read with a single primary-key SELECT at most every CATALOG_CACHE_MAX_AGE
+seconds per worker, which bounds how long another worker's write goes
+unnoticed; commits in this worker expire the check at once.
+"""
+import hashlib
+import threading
+import time
+from datetime import date, datetime
+
+from flask import current_app
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from models import CatalogVersion, AvailabilityVersion
+from availability_index import availability_index
+
+_BUMPED = 'catalog_bumped'
+
+
+class CachedPage:
+    __slots__ = ('key', 'html', 'etag', 'last_modified')
+
+    def __init__(self, key, html):
+        self.key = key
+        self.html = html
+        # Hash of the body, so a deploy that changes the templates also changes the ETag
+        self.etag = hashlib.sha1(html.encode()).hexdigest()[:16]
+        # First render of this key; always after the change that produced it
+        self.last_modified = datetime.utcnow().replace(microsecond=0)
+
+
+class CatalogCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+        self._page = None
+
+    def clear(self):
+        with self._lock:
+            self._version = None
+            self._page = None
+
+    def page_key(self, session, max_age=None):
+        """(catalog version, availability version, day), both versions read in one query"""
+        if max_age is None:
+            max_age = current_app.config.get('CATALOG_CACHE_MAX_AGE', 1.0)
+        if self._version is None or time.monotonic() - self._checked_at >= max_age:
+            catalog, availability = session.execute(select(
+                select(CatalogVersion.version).where(CatalogVersion.id == 1).scalar_subquery(),
+                select(AvailabilityVersion.version).where(AvailabilityVersion.id == 1).scalar_subquery(),
+            )).one()
+            self._version = catalog or 0
+            availability_index.check_version(availability or 0)
+            self._checked_at = time.monotonic()
+        # Only (re)loads when the index is empty or check_version() found it behind
+        availability_index.ensure_fresh(max_age=float('inf'))
+        return self._version, availability_index.version, date.today()
+
+    def page(self, key, render):
+        """Cached page for key, calling render() to build it on a miss"""
+        page = self._page
+        if page is not None and page.key == key:
+            return page
+        page = CachedPage(key, render())
+        with self._lock:
+            self._page = page
+        return page
+
+    def expire(self):
+        """Force a version re-read on the next request (after a local commit)"""
+        self._checked_at = 0.0
+
+
+catalog_cache = CatalogCache()
+
+
+def current_catalog_version(session):
+    return session.execute(select(CatalogVersion.version).where(CatalogVersion.id == 1)).scalar() or 0
+
+
+def ensure_catalog_version_row(session):
+    """Insert the CatalogVersion row into a database created before it was seeded with the
+    table (see models.py)"""
+    if session.get(CatalogVersion, 1) is None:
+        session.add(CatalogVersion(id=1, version=0))
+        session.commit()
+
+
+def bump_catalog_version(session):
+    """Increment the catalog version in the caller's transaction"""
+    table = CatalogVersion.__table__
+    session.connection().execute(table.update().where(table.c.id == 1).values(version=table.c.version + 1))
+    session.info[_BUMPED] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _expire_after_bump(session):
+    if session.info.pop(_BUMPED, False):
+        catalog_cache.expire()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_bump(session):
+    session.info.pop(_BUMPED, None)
@@ -0,0 +1,51 @@
+import os
+
+
+class Config:
+    """Default settings; create_app() layers the environment's database settings and any overrides on top"""
+    SECRET_KEY = 'dev-secret-key'
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    MAIL_SERVER = 'smtp.gmail.com'
+    MAIL_PORT = 587
+    MAIL_USE_TLS = True
+    MAIL_USERNAME = 'jethoteldemo@gmail.com'  # Replace
+    MAIL_PASSWORD = 'smmi bdpq rgxr afns'     # Replace
+    MAIL_DEFAULT_SENDER = "Hotel Reservation System <jethoteldemo@gmail.com>"
+
+    # Outbox worker threads per process (0 when running `flask outbox-worker` separately)
+    OUTBOX_WORKERS = int(os.environ.get('OUTBOX_WORKERS', 2))
+
+    # Password hashing cost and the per-process cap on concurrent hashes (see passwords.py)
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    # Half the CPUs by default, leaving the rest for page requests during a login burst;
+    # divide by the number of worker processes when running several
+    PASSWORD_HASH_MAX_CONCURRENT = int(os.environ.get('PASSWORD_HASH_MAX_CONCURRENT',
+                                                      max(1, (os.cpu_count() or 2) // 2)))
+
+    # Minutes an unpaid booking holds its room, and seconds between hold sweeps (0 disables
+    # the per-process sweeper thread, e.g. when running `flask sweep-holds` from cron)
+    HOLD_MINUTES = int(os.environ.get('HOLD_MINUTES', 30))
+    HOLD_SWEEP_SECONDS = int(os.environ.get('HOLD_SWEEP_SECONDS', 60))
+
+    # Live notification streams (see notification_feed.py). Each open stream occupies a
+    # request worker, so streams are short and only the dashboard and notifications pages
+    # open one; serve the app with threaded or async workers (e.g. gunicorn --threads) if
+    # many people keep those pages open.
+    NOTIFICATION_STREAM_SECONDS = int(os.environ.get('NOTIFICATION_STREAM_SECONDS', 25))
+    NOTIFICATION_RETRY_SECONDS = int(os.environ.get('NOTIFICATION_RETRY_SECONDS', 10))
+
+    # `flask archive` moves stays checked out more than this many days ago to the history tables
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 365))
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SQLALCHEMY_BINDS = {}
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    WTF_CSRF_ENABLED = False
+    MAIL_SUPPRESS_SEND = True
+    OUTBOX_WORKERS = 0
+    HOLD_SWEEP_SECONDS = 0
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
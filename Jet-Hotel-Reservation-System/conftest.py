@@ -0,0 +1,48 @@
+import os
+
+import pytest
+from flask import Flask
+from models import db
+from availability_index import availability_index
+from projections import projections
+
+# `from app import app` builds the real app; point it at SQLite unless told otherwise
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+
+def _make_app(database_uri, **config):
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'test-secret-key'
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['TESTING'] = True
+    app.config.update(config)
+    db.init_app(app)
+    return app
+
+
+@pytest.fixture
+def app():
+    """Throwaway app bound to an in-memory SQLite database"""
+    app = _make_app('sqlite://')
+    availability_index.clear()
+    projections.clear()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def file_app(tmp_path):
+    """App bound to a SQLite file so several threads can hold their own connections"""
+    app = _make_app(f"sqlite:///{tmp_path / 'test.db'}",
+                    SQLALCHEMY_ENGINE_OPTIONS={'connect_args': {'timeout': 30}})
+    availability_index.clear()
+    projections.clear()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
@@ -0,0 +1,96 @@
+"""Engine configuration and primary/replica routing.
+
+Connection settings come from the environment:
+
+    DATABASE_URL           primary (default: local MySQL hotel_db)
+    REPLICA_DATABASE_URL   optional read replica
+    DB_POOL_SIZE           connections kept per worker process (default 10)
+    DB_MAX_OVERFLOW        extra connections allowed under load (default 10)
+    DB_POOL_TIMEOUT        seconds to wait for a free connection (default 30)
+    DB_POOL_RECYCLE        seconds before a connection is replaced (default 1800,
+                           below MySQL's wait_timeout)
+    DB_POOL_PRE_PING       test connections before use (default on)
+    DB_STICKY_SECONDS      how long a client reads from the primary after it
+                           wrote something (default 5)
+
+Views decorated with @read_only send their SELECTs to the replica. Writes
+always go to the primary, and a client that has just written keeps reading
+from the primary for DB_STICKY_SECONDS so it sees its own booking.
+"""
+import os
+import time
+from functools import wraps
+
+from flask import g, has_request_context, session
+from flask_sqlalchemy.session import Session as FlaskSession
+
+DEFAULT_DATABASE_URL = 'mysql+pymysql://root@localhost/hotel_db'
+REPLICA = 'replica'
+
+
+def _flag(value):
+    return str(value).lower() in ('1', 'true', 'yes', 'on')
+
+
+def engine_options(url, environ):
+    options = {
+        'pool_pre_ping': _flag(environ.get('DB_POOL_PRE_PING', 'true')),
+        'pool_recycle': int(environ.get('DB_POOL_RECYCLE', 1800)),
+    }
+    # SQLite's file and memory pools do not take sizing options
+    if not url.startswith('sqlite'):
+        options.update(
+            pool_size=int(environ.get('DB_POOL_SIZE', 10)),
+            max_overflow=int(environ.get('DB_MAX_OVERFLOW', 10)),
+            pool_timeout=int(environ.get('DB_POOL_TIMEOUT', 30)),
+        )
+    return options
+
+
+def engine_config(environ=None):
+    """Flask config for the primary engine and, if configured, the replica bind"""
+    environ = os.environ if environ is None else environ
+    url = environ.get('DATABASE_URL', DEFAULT_DATABASE_URL)
+    binds = {}
+    replica_url = environ.get('REPLICA_DATABASE_URL')
+    if replica_url:
+        binds[REPLICA] = {'url': replica_url, **engine_options(replica_url, environ)}
+    return {
+        'SQLALCHEMY_DATABASE_URI': url,
+        'SQLALCHEMY_ENGINE_OPTIONS': engine_options(url, environ),
+        'SQLALCHEMY_BINDS': binds,
+        'DB_STICKY_SECONDS': float(environ.get('DB_STICKY_SECONDS', 5)),
+    }
+
+
+class RoutingSession(FlaskSession):
+    """Sends SELECTs from read-only views to the replica and everything else to the primary"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            if self._flushing or getattr(clause, 'is_dml', False):
+                g.db_wrote = True
+            elif g.get('db_read_only') and getattr(clause, 'is_select', False):
+                replica = self._db.engines.get(REPLICA)
+                if replica is not None:
+                    return replica
+        return super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_only(view):
+    """Serve the view's reads from the replica unless this client wrote recently"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if session.get('db_primary_until', 0) <= time.time():
+            g.db_read_only = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def remember_writes(app):
+    """Keep clients that wrote in this request on the primary for a few seconds"""
+    @app.after_request
+    def stick_to_primary(response):
+        if g.get('db_wrote') and app.config.get('SQLALCHEMY_BINDS', {}).get(REPLICA):
+            session['db_primary_until'] = time.time() + app.config.get('DB_STICKY_SECONDS', 5)
+        return response
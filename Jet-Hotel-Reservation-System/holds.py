@@ -0,0 +1,146 @@
+"""Expiring holds for unpaid reservations.
+
+book_room() and book_rooms() give every Pending reservation a deadline
+(HOLD_MINUTES after booking); confirming payment clears it. Availability
+checks ignore a hold as soon as its deadline passes, and the sweeper then
+expires it for good: it walks the (status, expires_at) index in batches and,
+per batch, marks the reservations Expired, releases their room nights, cancels
+their pending transactions and notifies the guests with a few bulk statements.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, delete, insert, or_, select, update
+
+from models import db, Reservation, RoomNight, Transaction, Notification
+from availability_index import record_changes
+from notification_feed import broker
+import analytics
+import journal
+
+BATCH_SIZE = 500
+
+
+def hold_deadline(now=None):
+    """When a hold placed now lapses"""
+    return (now or datetime.utcnow()) + timedelta(minutes=current_app.config.get('HOLD_MINUTES', 30))
+
+
+def expire_holds(session, reservation_ids, now=None):
+    """Expire the given holds that are still Pending past their deadline.
+
+    Writes everything in the caller's transaction and returns the number expired.
+    """
+    now = now or datetime.utcnow()
+    if not reservation_ids:
+        return 0
+    # Lock the rows so two sweepers never expire (and notify) the same hold twice
+    expired = session.execute(
+        select(Reservation.id, Reservation.user_id, Reservation.room_id, Reservation.check_in, Reservation.check_out)
+        .where(Reservation.id.in_(reservation_ids), Reservation.status == "Pending", Reservation.expires_at <= now)
+        .order_by(Reservation.id)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not expired:
+        return 0
+    ids = [row.id for row in expired]
+    transactions = session.execute(
+        select(Transaction.id, Transaction.reservation_id, Transaction.amount)
+        .where(Transaction.reservation_id.in_(ids), Transaction.status == "Pending")
+    ).all()
+
+    options = {'synchronize_session': False}
+    session.execute(update(Reservation).where(Reservation.id.in_(ids)).values(status="Expired"),
+                    execution_options=options)
+    session.execute(delete(RoomNight).where(RoomNight.reservation_id.in_(ids)), execution_options=options)
+    if transactions:
+        session.execute(update(Transaction).where(Transaction.id.in_([row.id for row in transactions]))
+                        .values(status="Cancelled"), execution_options=options)
+    journal.record(session, [journal.reservation_event(row.id, row.user_id, "Pending", "Expired") for row in expired] +
+                   [journal.transaction_event(row.id, row.reservation_id, "Pending", "Cancelled", row.amount)
+                    for row in transactions])
+    session.execute(insert(Notification), [
+        {'user_id': row.user_id, 'created_at': now, 'is_read': False,
+         'message': f"Your reservation #{row.id} was not paid in time and has expired. The room has been released."}
+        for row in expired
+    ] + [{'user_id': None, 'created_at': now, 'is_read': False,
+          # One admin line per batch; an id range keeps it within the 200-character message column
+          'message': f"{len(expired)} unpaid reservation hold(s) expired (#{ids[0]} to #{ids[-1]})."}])
+    record_changes(session, [('reservation_removed', reservation_id) for reservation_id in ids])
+    analytics.record_stays(session, [(row.room_id, row.check_in, row.check_out, -1, 0.0) for row in expired])
+    return len(expired)
+
+
+def release_lapsed_holds(session, stays, now=None):
+    """Expire lapsed holds on the (room_id, check_in, check_out) stays about to be booked,
+    so their room nights are free before the sweeper gets there"""
+    now = now or datetime.utcnow()
+    ids = session.execute(
+        select(Reservation.id).where(
+            Reservation.status == "Pending", Reservation.expires_at <= now,
+            or_(*[and_(Reservation.room_id == room_id, Reservation.check_in < check_out,
+                       Reservation.check_out > check_in)
+                  for room_id, check_in, check_out in stays]))
+    ).scalars().all()
+    return expire_holds(session, ids, now)
+
+
+def sweep(batch_size=None, now=None):
+    """Expire every lapsed hold, committing one batch at a time; returns the number expired"""
+    batch_size = batch_size or current_app.config.get('HOLD_SWEEP_BATCH_SIZE', BATCH_SIZE)
+    now = now or datetime.utcnow()
+    total = 0
+    while True:
+        ids = db.session.execute(
+            select(Reservation.id)
+            .where(Reservation.status == "Pending", Reservation.expires_at <= now)
+            .order_by(Reservation.expires_at)
+            .limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            break
+        expired = expire_holds(db.session, ids, now)
+        db.session.commit()
+        total += expired
+        if not expired:
+            break   # Every candidate is locked by another sweeper
+    if total:
+        # Bulk inserted notifications bypass the flush hook, so wake the streams here
+        broker.publish()
+    return total
+
+
+class HoldSweeper:
+    """Daemon thread expiring lapsed holds every HOLD_SWEEP_SECONDS for one process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def ensure_started(self, app):
+        """Start the thread once per process (threads do not survive a fork)"""
+        if self._pid == os.getpid() or not app.config.get('HOLD_SWEEP_SECONDS'):
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            threading.Thread(target=self._run, args=(app,), name="hold-sweeper", daemon=True).start()
+            self._pid = os.getpid()
+
+    def _run(self, app):
+        while True:
+            time.sleep(app.config['HOLD_SWEEP_SECONDS'])
+            with app.app_context():
+                try:
+                    sweep()
+                except Exception as e:
+                    db.session.rollback()
+                    print("Hold sweeper error:", e)
+                finally:
+                    db.session.remove()
+
+
+hold_sweeper = HoldSweeper()
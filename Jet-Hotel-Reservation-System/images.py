@@ -0,0 +1,172 @@
+"""Responsive derivatives of the room photos in static/css/uploads.
+
+Each photo is resized to a few widths in its own format and in WebP. The
+results are written once to a cache directory under names that include a hash
+of the source bytes, so the URLs can be cached forever: replacing a photo
+changes its hash and therefore every URL that points at it. Derivatives are
+generated when an admin saves a photo or on the first request for them.
+
+Pillow is optional and imported on first use. Without it the helpers fall
+back to the original files.
+"""
+import hashlib
+import os
+import threading
+
+from flask import current_app, url_for
+from werkzeug.utils import secure_filename
+
+
+WIDTHS = (320, 480, 640, 960)
+FORMATS = {'jpg': 'JPEG', 'webp': 'WEBP'}
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 82, 'optimize': True, 'progressive': True},
+    'WEBP': {'quality': 80, 'method': 4},
+}
+ALLOWED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp'}
+MAX_AGE = 365 * 24 * 3600
+
+_sources = {}
+_pil = None
+_generate_lock = threading.Lock()
+
+
+def _pillow():
+    """Import Pillow on first use; None when it is not installed"""
+    global _pil
+    if _pil is None:
+        try:
+            from PIL import Image, ImageOps
+            _pil = (Image, ImageOps)
+        except ImportError:
+            _pil = False
+    return _pil or None
+
+
+def enabled():
+    return _pillow() is not None and current_app.config.get('IMAGE_DERIVATIVES', True)
+
+
+def upload_dir():
+    return os.path.join(current_app.static_folder, 'css', 'uploads')
+
+
+def cache_dir():
+    return current_app.config.get('IMAGE_CACHE_DIR') or os.path.join(current_app.instance_path, 'image_cache')
+
+
+def source_path(filename):
+    """Absolute path of an uploaded photo, or None if it does not exist"""
+    filename = secure_filename(filename or '')
+    path = os.path.join(upload_dir(), filename)
+    return path if filename and os.path.isfile(path) else None
+
+
+def _source_info(path):
+    """(content hash, display width) of a source photo, memoized on (mtime, size)"""
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _sources.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    with open(path, 'rb') as source:
+        digest = hashlib.sha1(source.read()).hexdigest()[:12]
+    Image, _ = _pillow()
+    with Image.open(path) as image:
+        width, height = image.size
+        # EXIF orientations 5-8 are rotated by 90 degrees
+        if image.getexif().get(0x0112) in (5, 6, 7, 8):
+            width = height
+    _sources[path] = (signature, (digest, width))
+    return digest, width
+
+
+def source_digest(path):
+    return _source_info(path)[0]
+
+
+def widths_for(path):
+    """Target widths for a photo, never upscaling past its own width"""
+    width = _source_info(path)[1]
+    if width >= WIDTHS[-1]:
+        return list(WIDTHS)
+    return [w for w in WIDTHS if w < width] + [width]
+
+
+def nearest_width(path, width):
+    """The generated width closest to the one asked for (narrow photos stop at their own width)"""
+    return min(widths_for(path), key=lambda candidate: (abs(candidate - width), candidate))
+
+
+def derivative_name(filename, digest, width, fmt):
+    stem = os.path.splitext(secure_filename(filename))[0]
+    return f"{stem}-{digest}-{width}.{fmt}"
+
+
+def generate(filename, width, fmt):
+    """Write one derivative if it is not cached yet; returns its path or None"""
+    path = source_path(filename)
+    if path is None or fmt not in FORMATS or not enabled() or width not in widths_for(path):
+        return None
+    digest = source_digest(path)
+    target = os.path.join(cache_dir(), derivative_name(filename, digest, width, fmt))
+    if os.path.exists(target):
+        return target
+    with _generate_lock:
+        if os.path.exists(target):
+            return target
+        os.makedirs(cache_dir(), exist_ok=True)
+        Image, ImageOps = _pillow()
+        with Image.open(path) as image:
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((width, image.height), Image.LANCZOS)
+            if FORMATS[fmt] == 'JPEG' and image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            # Write to a temporary name first so readers never see a partial file
+            partial = f"{target}.{os.getpid()}.tmp"
+            image.save(partial, FORMATS[fmt], **SAVE_OPTIONS[FORMATS[fmt]])
+            os.replace(partial, target)
+    return target
+
+
+def generate_all(filename):
+    """Pre-generate every width and format of a photo; returns how many files exist"""
+    path = source_path(filename)
+    if path is None or not enabled():
+        return 0
+    return sum(1 for width in widths_for(path) for fmt in FORMATS if generate(filename, width, fmt))
+
+
+def save_upload(file_storage):
+    """Store an uploaded photo in static/css/uploads and return its filename.
+
+    The stored name carries a hash of the contents, so a new photo uploaded
+    under an existing name never overwrites the one other rooms still show.
+    Raises ValueError for unsupported file types.
+    """
+    stem, extension = os.path.splitext(secure_filename(file_storage.filename or ''))
+    if extension.lower() not in ALLOWED_EXTENSIONS:
+        raise ValueError("Photos must be JPEG, PNG or WebP files.")
+    data = file_storage.read()
+    filename = f"{stem or 'photo'}-{hashlib.sha1(data).hexdigest()[:12]}{extension.lower()}"
+    path = os.path.join(upload_dir(), filename)
+    if not os.path.exists(path):
+        with open(path, 'wb') as target:
+            target.write(data)
+    return filename
+
+
+def image_url(filename, width, fmt='jpg'):
+    path = source_path(filename)
+    if path is None or not enabled():
+        return url_for('static', filename='css/uploads/' + (filename or ''))
+    return url_for('hotel.room_image', digest=source_digest(path), width=nearest_width(path, width), fmt=fmt,
+                   filename=secure_filename(filename))
+
+
+def image_srcset(filename, fmt='jpg'):
+    """srcset attribute value for a photo, or '' when derivatives are unavailable"""
+    path = source_path(filename)
+    if path is None or not enabled():
+        return ''
+    return ', '.join(f"{image_url(filename, width, fmt)} {width}w" for width in widths_for(path))
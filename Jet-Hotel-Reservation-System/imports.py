@@ -0,0 +1,318 @@
+"""Bulk CSV import of rooms and historical reservations.
+
+Rows are read from a stream and handled in batches. Each batch is validated
+with a few set-based queries: one for the guests' emails, and one for the
+room nights already taken, looked up by (room_id, night) through the unique
+index. It is then written with executemany INSERTs and committed on its own.
+Bad rows are reported by line number and never stop the import.
+
+rooms.csv         name, price[, description, image, available]
+reservations.csv  email, room_id, check_in, check_out[, status, amount, payment_status, created_at]
+
+Imported reservations get their RoomNight rows, an optional Transaction and
+their occupancy rollups. No notifications or emails are sent. A Pending row is
+an unpaid hold like any other, with a deadline counted from its created_at
+(see holds.py), so an old one is expired by the next sweep.
+"""
+import csv
+from datetime import date, datetime, timezone
+
+from sqlalchemy import Column, Date, Integer, MetaData, Table, and_, func, insert, select
+from sqlalchemy.exc import IntegrityError
+
+from models import db, User, Room, Reservation, RoomNight, Transaction, stay_nights
+from availability_index import record_changes
+from catalog import bump_catalog_version
+from holds import hold_deadline
+import analytics
+import journal
+
+BATCH_SIZE = 1000
+MAX_NIGHTS = 365
+_TRUE = ('1', 'true', 'yes', 'y', 'on')
+_FALSE = ('0', 'false', 'no', 'n', 'off')
+
+
+# Per-connection scratch table for the batch's room-night keys; not part of db.metadata
+_night_keys = Table('import_night_keys', MetaData(),
+                    Column('room_id', Integer, primary_key=True),
+                    Column('night', Date, primary_key=True),
+                    prefixes=['TEMPORARY'])
+
+
+class ImportResult:
+    def __init__(self):
+        self.imported = 0
+        self.rejected = []          # (line number, reason)
+
+    def reject(self, line, reason):
+        self.rejected.append((line, reason))
+
+    def to_json(self, limit=1000):
+        return {'imported': self.imported, 'rejected_count': len(self.rejected),
+                'rejected': [{'line': line, 'error': reason} for line, reason in self.rejected[:limit]]}
+
+
+class RowError(ValueError):
+    pass
+
+
+def _required(row, name):
+    value = (row.get(name) or '').strip()
+    if not value:
+        raise RowError(f"{name} is required")
+    return value
+
+
+def _date(row, name):
+    value = _required(row, name)
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise RowError(f"{name} must be YYYY-MM-DD")
+
+
+def _status(row, name, default, statuses):
+    value = (row.get(name) or '').strip() or default
+    if value not in statuses:
+        raise RowError(f"{name} must be one of {', '.join(sorted(statuses))}")
+    return value
+
+
+def _number(value, name):
+    try:
+        number = float(value)
+    except ValueError:
+        raise RowError(f"{name} must be a number")
+    if number < 0:
+        raise RowError(f"{name} cannot be negative")
+    return number
+
+
+def _batches(stream, batch_size):
+    """(line number, row) lists from a CSV text stream"""
+    reader = csv.DictReader(stream)
+    batch = []
+    for row in reader:
+        batch.append((reader.line_num, {(key or '').strip().lower(): value for key, value in row.items()}))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# -----------------
+# Rooms
+# -----------------
+def _room_row(row):
+    name = _required(row, 'name')
+    if len(name) > 50:
+        raise RowError("name is longer than 50 characters")
+    price = _number(_required(row, 'price'), 'price')
+    description = (row.get('description') or '').strip() or None
+    if description and len(description) > 200:
+        raise RowError("description is longer than 200 characters")
+    image = (row.get('image') or '').strip() or None
+    if image and len(image) > 100:
+        raise RowError("image is longer than 100 characters")
+    available = (row.get('available') or 'true').strip().lower()
+    if available not in _TRUE + _FALSE:
+        raise RowError("available must be true or false")
+    return {'name': name, 'price': price, 'description': description, 'image': image,
+            'available': available in _TRUE}
+
+
+def import_rooms(stream, batch_size=BATCH_SIZE):
+    """Insert rooms from a CSV text stream; returns an ImportResult"""
+    result = ImportResult()
+    for batch in _batches(stream, batch_size):
+        rows = []
+        for line, row in batch:
+            try:
+                rows.append(_room_row(row))
+            except RowError as e:
+                result.reject(line, str(e))
+        if not rows:
+            continue
+        last_id = db.session.query(func.max(Room.id)).scalar() or 0
+        db.session.execute(insert(Room.__table__), rows)
+        # Room ids for the availability index; MySQL cannot RETURNING from an executemany. Matched
+        # by name so a room another request adds meanwhile is not picked up as one of ours
+        ids = {}
+        for room_id, name in db.session.execute(
+                select(Room.id, Room.name)
+                .where(Room.id > last_id, Room.name.in_({row['name'] for row in rows})).order_by(Room.id)):
+            ids.setdefault(name, []).append(room_id)
+        record_changes(db.session, [('room', ids[row['name']].pop(0), row['available']) for row in rows])
+        bump_catalog_version(db.session)
+        db.session.commit()
+        result.imported += len(rows)
+    return result
+
+
+# -----------------
+# Reservations
+# -----------------
+def _reservation_row(row, users, rooms):
+    email = _required(row, 'email')
+    if email not in users:
+        raise RowError(f"no user with email {email}")
+    try:
+        room_id = int(_required(row, 'room_id'))
+    except ValueError:
+        raise RowError("room_id must be a number")
+    if room_id not in rooms:
+        raise RowError(f"room {room_id} does not exist")
+    check_in, check_out = _date(row, 'check_in'), _date(row, 'check_out')
+    if check_out <= check_in:
+        raise RowError("check_out must be after check_in")
+    if (check_out - check_in).days > MAX_NIGHTS:
+        raise RowError(f"stays are limited to {MAX_NIGHTS} nights")
+    amount = (row.get('amount') or '').strip()
+    created_at = (row.get('created_at') or '').strip()
+    try:
+        created_at = datetime.fromisoformat(created_at) if created_at else datetime.combine(check_in, datetime.min.time())
+    except ValueError:
+        raise RowError("created_at must be an ISO date or datetime")
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+    # Whole seconds so the id read-back matches a MySQL DATETIME column exactly
+    created_at = created_at.replace(microsecond=0)
+    status = _status(row, 'status', "Confirmed", journal.RESERVATION_STATUSES)
+    return {
+        'reservation': {'user_id': users[email], 'room_id': room_id, 'check_in': check_in, 'check_out': check_out,
+                        'status': status, 'created_at': created_at,
+                        'expires_at': hold_deadline(created_at) if status == "Pending" else None},
+        'amount': _number(amount, 'amount') if amount else None,
+        'payment_status': _status(row, 'payment_status', "Paid", journal.TRANSACTION_STATUSES),
+    }
+
+
+def _taken_nights(keys):
+    """The (room_id, night) keys already in the room-night inventory.
+
+    The keys go into a temporary table joined against the unique (room_id, night)
+    index: one probe per key, where a long row-value IN list is a full scan on SQLite.
+    """
+    if not keys:
+        return set()
+    connection = db.session.connection()
+    _night_keys.create(connection)
+    try:
+        connection.execute(_night_keys.insert(), [{'room_id': room_id, 'night': night} for room_id, night in keys])
+        return {tuple(row) for row in connection.execute(
+            select(RoomNight.room_id, RoomNight.night)
+            .join(_night_keys, and_(_night_keys.c.room_id == RoomNight.room_id, _night_keys.c.night == RoomNight.night))
+        )}
+    finally:
+        _night_keys.drop(connection)
+
+
+def _validate_reservations(batch, rooms, result):
+    emails = {(row.get('email') or '').strip() for _, row in batch}
+    users = {email: user_id for user_id, email in db.session.execute(
+        select(User.id, User.email).where(User.email.in_(emails)))}
+
+    parsed = []
+    for line, row in batch:
+        try:
+            parsed.append((line, _reservation_row(row, users, rooms)))
+        except RowError as e:
+            result.reject(line, str(e))
+
+    # One lookup for every night the active stays need, then the batch against itself
+    nights = {}
+    for line, item in parsed:
+        reservation = item['reservation']
+        if reservation['status'] not in Reservation.INACTIVE_STATUSES:
+            nights[line] = [(reservation['room_id'], night)
+                            for night in stay_nights(reservation['check_in'], reservation['check_out'])]
+    taken = _taken_nights({key for keys in nights.values() for key in keys})
+    accepted = []
+    for line, item in parsed:
+        keys = nights.get(line, ())
+        if any(key in taken for key in keys):
+            result.reject(line, "overlaps an existing reservation")
+            continue
+        taken.update(keys)
+        item['nights'] = keys
+        accepted.append(item)
+    return accepted
+
+
+def _write_reservations(items):
+    last_id = db.session.query(func.max(Reservation.id)).scalar() or 0
+    rows = [item['reservation'] for item in items]
+    db.session.execute(insert(Reservation.__table__), rows)
+
+    # Read the ids back (no RETURNING from a MySQL executemany) by the inserted keys, so a
+    # booking committed meanwhile is not taken for one of ours; identical rows may take either id
+    keys = {(row['user_id'], row['room_id'], row['check_in'], row['check_out'], row['created_at']) for row in rows}
+    ids = {}
+    for reservation_id, *key in db.session.execute(
+            select(Reservation.id, Reservation.user_id, Reservation.room_id, Reservation.check_in,
+                   Reservation.check_out, Reservation.created_at)
+            .where(Reservation.id > last_id,
+                   Reservation.user_id.in_({row['user_id'] for row in rows}),
+                   Reservation.room_id.in_({row['room_id'] for row in rows}),
+                   Reservation.created_at.in_({row['created_at'] for row in rows}))
+            .order_by(Reservation.id)):
+        if tuple(key) in keys:
+            ids.setdefault(tuple(key), []).append(reservation_id)
+
+    room_nights, transactions, changes, stays, events = [], [], [], [], []
+    for item in items:
+        row = item['reservation']
+        reservation_id = ids[(row['user_id'], row['room_id'], row['check_in'], row['check_out'],
+                              row['created_at'])].pop(0)
+        events.append(journal.reservation_event(reservation_id, row['user_id'], None, row['status']))
+        room_nights.extend({'room_id': room_id, 'night': night, 'reservation_id': reservation_id}
+                           for room_id, night in item['nights'])
+        paid = 0.0
+        if item['amount'] is not None:
+            transactions.append({'reservation_id': reservation_id, 'amount': item['amount'],
+                                 'status': item['payment_status'], 'created_at': row['created_at']})
+            paid = item['amount'] if item['payment_status'] == "Paid" else 0.0
+        active = 1 if item['nights'] else 0
+        if active:
+            changes.append(('reservation', reservation_id, row['room_id'], row['check_in'], row['check_out'],
+                            row['expires_at']))
+        stays.append((row['room_id'], row['check_in'], row['check_out'], active, paid))
+
+    if room_nights:
+        db.session.execute(insert(RoomNight.__table__), room_nights)
+    if transactions:
+        db.session.execute(insert(Transaction.__table__), transactions)
+    journal.record(db.session, events)
+    if transactions:
+        journal.record_new_transactions(db.session, [event['entity_id'] for event in events])
+    record_changes(db.session, changes)
+    analytics.record_stays(db.session, stays)
+
+
+def import_reservations(stream, batch_size=BATCH_SIZE):
+    """Insert historical reservations from a CSV text stream; returns an ImportResult"""
+    result = ImportResult()
+    rooms = {room_id for room_id, in db.session.execute(select(Room.id))}
+    for batch in _batches(stream, batch_size):
+        # A booking that lands between validation and insert fails the unique room-night
+        # constraint; validate the batch again so only the clashing rows are rejected
+        for attempt in range(3):
+            rejected = len(result.rejected)
+            items = _validate_reservations(batch, rooms, result)
+            try:
+                if items:
+                    _write_reservations(items)
+                db.session.commit()
+                break
+            except IntegrityError:
+                db.session.rollback()
+                del result.rejected[rejected:]
+                if attempt == 2:
+                    raise
+        result.imported += len(items)
+    return result
+
+
+IMPORTERS = {'rooms': import_rooms, 'reservations': import_reservations}
@@ -0,0 +1,236 @@
+"""Per-request SQL and timing instrumentation with a Prometheus /metrics endpoint.
+
+Every request records its endpoint, latency, SQL statement count, SQL time
+and template render time. The same statement text executed N_PLUS_ONE_THRESHOLD
+or more times in one request is logged as an N+1 suspect (typically a lazy
+relationship load inside a template loop). Totals are kept per process and
+served in Prometheus text format from /metrics to scrapers presenting
+METRICS_TOKEN as a bearer token, or to a logged-in admin; everyone else gets
+a 403. With several gunicorn workers, scrape each one or aggregate in
+Prometheus. Streamed responses (exports, notification streams) are timed
+until the last chunk is sent, not just until the view returns.
+
+The hooks are engine cursor events and Flask signals; outside a request they
+return after a single context variable lookup, so the overhead is a couple of
+perf_counter() calls and a dict update per statement.
+"""
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+
+from flask import Response, abort, current_app, request, session
+from flask.signals import (before_render_template, request_finished, request_started, request_tearing_down,
+                           template_rendered)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+_current = ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    __slots__ = ('started', 'statements', 'sql_count', 'sql_seconds', 'template_seconds', 'template_starts')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = {}
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_starts = []
+
+    def repeated_statements(self, threshold):
+        return {statement: count for statement, count in self.statements.items() if count >= threshold}
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+
+class Metrics:
+    """Thread-safe counters and histograms keyed by label tuples"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+
+    def describe(self, name, kind, text):
+        self._help[name] = (kind, text)
+
+    def inc(self, name, labels, amount=1):
+        with self._lock:
+            key = (name, labels)
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+        with self._lock:
+            key = (name, labels)
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self):
+        """Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, (kind, text) in sorted(self._help.items()):
+                lines.append(f"# HELP {name} {text}")
+                lines.append(f"# TYPE {name} {kind}")
+                if kind == 'counter':
+                    for (metric, labels), value in sorted(self._counters.items()):
+                        if metric == name:
+                            lines.append(f"{name}{_labels(labels)} {value}")
+                    continue
+                for (metric, labels), histogram in sorted(self._histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_labels(labels + (('le', str(bound)),))} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(labels)} {histogram.total:.6f}")
+                    lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+metrics = Metrics()
+metrics.describe('http_requests_total', 'counter', 'Requests by endpoint, method and status.')
+metrics.describe('http_request_duration_seconds', 'histogram', 'Request latency.')
+metrics.describe('db_statements_per_request', 'histogram', 'SQL statements executed per request.')
+metrics.describe('db_time_per_request_seconds', 'histogram', 'Time spent in SQL per request.')
+metrics.describe('template_render_seconds', 'histogram', 'Template rendering time per request.')
+metrics.describe('n_plus_one_suspects_total', 'counter', 'Requests that repeated an identical SQL statement.')
+
+
+def current_stats():
+    return _current.get()
+
+
+# -----------------
+# SQLAlchemy engine events
+# -----------------
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None:
+        return
+    started = conn.info.get('query_started')
+    if started:
+        stats.sql_seconds += time.perf_counter() - started.pop()
+    stats.sql_count += 1
+    stats.statements[statement] = stats.statements.get(statement, 0) + 1
+
+
+# -----------------
+# Flask signals
+# -----------------
+def _request_started(sender, **extra):
+    _current.set(RequestStats())
+
+
+def _before_render(sender, template, context, **extra):
+    stats = _current.get()
+    if stats is not None:
+        stats.template_starts.append(time.perf_counter())
+
+
+def _template_rendered(sender, template, context, **extra):
+    stats = _current.get()
+    if stats is not None and stats.template_starts:
+        stats.template_seconds += time.perf_counter() - stats.template_starts.pop()
+
+
+def _record(app, stats, endpoint, method, status):
+    elapsed = time.perf_counter() - stats.started
+    labels = (('endpoint', endpoint), ('method', method))
+    metrics.inc('http_requests_total', labels + (('status', status),))
+    metrics.observe('http_request_duration_seconds', labels, elapsed)
+    metrics.observe('db_statements_per_request', (('endpoint', endpoint),), stats.sql_count, STATEMENT_BUCKETS)
+    metrics.observe('db_time_per_request_seconds', (('endpoint', endpoint),), stats.sql_seconds)
+    metrics.observe('template_render_seconds', (('endpoint', endpoint),), stats.template_seconds)
+
+    repeated = stats.repeated_statements(app.config.get('N_PLUS_ONE_THRESHOLD', 5))
+    if repeated:
+        metrics.inc('n_plus_one_suspects_total', (('endpoint', endpoint),))
+        for statement, count in repeated.items():
+            app.logger.warning("Possible N+1 in %s: %d x %s", endpoint, count, ' '.join(statement.split())[:200])
+
+
+def _request_finished(sender, response, **extra):
+    stats = _current.get()
+    if stats is None:
+        return
+    endpoint = request.endpoint or 'unmatched'
+    if endpoint == 'metrics':
+        return
+    args = (sender, stats, endpoint, request.method, str(response.status_code))
+    if response.is_streamed:
+        # The body is still to be generated; record once the server has sent the last chunk
+        response.call_on_close(lambda: _record(*args))
+    else:
+        _record(*args)
+
+    # Up to the end of the view for a streamed response
+    elapsed = time.perf_counter() - stats.started
+    response.headers['Server-Timing'] = (
+        f'db;dur={stats.sql_seconds * 1000:.1f};desc="{stats.sql_count} queries", '
+        f'tpl;dur={stats.template_seconds * 1000:.1f}, total;dur={elapsed * 1000:.1f}'
+    )
+
+
+def _request_tearing_down(sender, **extra):
+    _current.set(None)
+
+
+def metrics_view():
+    """Metrics for the configured scraper token or an admin session; denied otherwise"""
+    token = current_app.config.get('METRICS_TOKEN')
+    if not (token and request.headers.get('Authorization') == f"Bearer {token}") and not session.get('is_admin'):
+        abort(403)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    """Collect request metrics for app and serve them from /metrics"""
+    if not app.config.get('INSTRUMENTATION_ENABLED', True):
+        return
+    request_started.connect(_request_started, app)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_template_rendered, app)
+    request_finished.connect(_request_finished, app)
+    request_tearing_down.connect(_request_tearing_down, app)
+    app.add_url_rule('/metrics', endpoint='metrics', view_func=metrics_view)
@@ -0,0 +1,178 @@
+"""Reservation and transaction state machine with an append-only event journal.
+
+Status changes are validated against RESERVATION_TRANSITIONS and
+TRANSACTION_TRANSITIONS. Views call transition() so a bad change is refused
+before anything is written. Every change is appended to ReservationEvent in
+the same transaction as the change itself:
+- ORM writes are picked up (and validated again) by the after_flush listener below;
+- bulk paths that write with Core statements call record() with the events
+  they make, like record_changes() for the availability index.
+projections.py folds the journal into the small read models behind the admin
+dashboard.
+"""
+from datetime import datetime
+
+from sqlalchemy import event, func, insert, select
+from sqlalchemy.orm import Session
+
+from models import db, Reservation, Transaction, ReservationEvent
+
+# Allowed status changes; any status may be the first one, and a row may always leave
+# the hot tables (to None) when it is deleted or archived. Staying put is not a transition.
+RESERVATION_TRANSITIONS = {
+    'Booked': ('Pending', 'Confirmed', 'Cancelled'),
+    'Pending': ('Confirmed', 'Cancelled', 'Expired'),
+    'Confirmed': ('Cancelled',),
+    'Expired': ('Cancelled',),
+}
+TRANSACTION_TRANSITIONS = {
+    'Pending': ('Payment Confirmed', 'Paid', 'Cancelled'),
+    'Payment Confirmed': ('Paid', 'Cancelled'),
+    'Paid': ('Cancelled',),
+}
+# Every status the state machine knows, for validating data that bypasses transition()
+RESERVATION_STATUSES = frozenset(RESERVATION_TRANSITIONS).union(*RESERVATION_TRANSITIONS.values())
+TRANSACTION_STATUSES = frozenset(TRANSACTION_TRANSITIONS).union(*TRANSACTION_TRANSITIONS.values())
+_TRANSITIONS = {'reservation': RESERVATION_TRANSITIONS, 'transaction': TRANSACTION_TRANSITIONS}
+_ENTITIES = {Reservation: 'reservation', Transaction: 'transaction'}
+
+
+class InvalidTransition(ValueError):
+    def __init__(self, entity, entity_id, from_status, to_status):
+        super().__init__(f"{entity} #{entity_id} cannot go from {from_status} to {to_status}")
+        self.from_status = from_status
+        self.to_status = to_status
+
+
+def allowed(entity, from_status, to_status):
+    return from_status is None or to_status is None or to_status in _TRANSITIONS[entity].get(from_status, ())
+
+
+def can_transition(obj, to_status):
+    return allowed(_ENTITIES[type(obj)], obj.status, to_status)
+
+
+def transition(obj, to_status):
+    """Set a Reservation's or Transaction's status, refusing changes the state machine does not allow"""
+    if not can_transition(obj, to_status):
+        raise InvalidTransition(_ENTITIES[type(obj)], obj.id, obj.status, to_status)
+    obj.status = to_status
+
+
+def reservation_event(reservation_id, user_id, from_status, to_status):
+    return {'entity': 'reservation', 'entity_id': reservation_id, 'reservation_id': reservation_id,
+            'user_id': user_id, 'from_status': from_status, 'to_status': to_status, 'amount': None}
+
+
+def transaction_event(transaction_id, reservation_id, from_status, to_status, amount):
+    return {'entity': 'transaction', 'entity_id': transaction_id, 'reservation_id': reservation_id,
+            'user_id': None, 'from_status': from_status, 'to_status': to_status, 'amount': amount}
+
+
+def record(session, events):
+    """Validate and append events to the journal in the current transaction"""
+    if not events:
+        return
+    now = datetime.utcnow()
+    for item in events:
+        if not allowed(item['entity'], item['from_status'], item['to_status']):
+            raise InvalidTransition(item['entity'], item['entity_id'], item['from_status'], item['to_status'])
+        item.setdefault('created_at', now)
+    session.connection().execute(insert(ReservationEvent.__table__), events)
+
+
+def record_new_transactions(session, reservation_ids):
+    """Journal the transactions just bulk inserted for reservation_ids"""
+    rows = session.execute(
+        select(Transaction.id, Transaction.reservation_id, Transaction.status, Transaction.amount)
+        .where(Transaction.reservation_id.in_(reservation_ids))
+    ).all()
+    record(session, [transaction_event(row.id, row.reservation_id, None, row.status, row.amount) for row in rows])
+
+
+def record_removed(session, model, condition):
+    """Journal the Reservation or Transaction rows matching condition as leaving the hot
+    tables; call before the bulk DELETE"""
+    if model is Reservation:
+        rows = session.execute(select(Reservation.id, Reservation.user_id, Reservation.status).where(condition))
+        events = [reservation_event(row.id, row.user_id, row.status, None) for row in rows]
+    else:
+        rows = session.execute(select(Transaction.id, Transaction.reservation_id, Transaction.status,
+                                      Transaction.amount).where(condition))
+        events = [transaction_event(row.id, row.reservation_id, row.status, None, row.amount) for row in rows]
+    record(session, events)
+
+
+def _before(obj, name):
+    """The attribute's value when obj was loaded, before any change pending in this flush"""
+    history = db.inspect(obj).attrs[name].history
+    return history.deleted[0] if history.deleted else getattr(obj, name)
+
+
+def _event(obj, from_status, to_status):
+    if isinstance(obj, Reservation):
+        return reservation_event(obj.id, obj.user_id, from_status, to_status)
+    # cancel_reservation() detaches the transaction; keep the reservation it belonged to
+    return transaction_event(obj.id, _before(obj, 'reservation_id'), from_status, to_status, obj.amount)
+
+
+def _status_change(obj):
+    return _before(obj, 'status'), obj.status
+
+
+def _keep_old_value(target, value, oldvalue, initiator):
+    pass
+
+
+# active_history loads the old value before an assignment to an expired row, so the
+# flush listener below still sees which status (and reservation) the row came from
+for _attribute in (Reservation.status, Transaction.status, Transaction.reservation_id):
+    event.listen(_attribute, 'set', _keep_old_value, active_history=True)
+
+
+def _ordered(objects):
+    """Reservations and transactions among objects, reservations first, each by id; the
+    session's sets are unordered and journal ids must not depend on hash order"""
+    return sorted((obj for obj in objects if type(obj) in _ENTITIES), key=lambda obj: (_ENTITIES[type(obj)], obj.id))
+
+
+@event.listens_for(Session, 'after_flush')
+def _journal_changes(session, flush_context):
+    events = []
+    for obj in _ordered(session.new):
+        events.append(_event(obj, None, obj.status))
+    for obj in _ordered(session.dirty):
+        before, after = _status_change(obj)
+        if before != after:
+            events.append(_event(obj, before, after))
+    for obj in _ordered(session.deleted):
+        before, after = _status_change(obj)
+        if before != after:
+            events.append(_event(obj, before, after))
+        events.append(_event(obj, after, None))
+    record(session, events)
+
+
+def backfill(batch_size=1000):
+    """Journal the current status of every reservation and transaction, for a database that
+    predates the journal; does nothing once the journal has events. Returns the events written."""
+    if db.session.query(func.count(ReservationEvent.id)).scalar():
+        return 0
+    written = 0
+    for query, make in (
+        (select(Reservation.id, Reservation.user_id, Reservation.status),
+         lambda row: reservation_event(row.id, row.user_id, None, row.status)),
+        (select(Transaction.id, Transaction.reservation_id, Transaction.status, Transaction.amount),
+         lambda row: transaction_event(row.id, row.reservation_id, None, row.status, row.amount)),
+    ):
+        model_id = query.selected_columns[0]
+        last_id = 0
+        while True:
+            batch = db.session.execute(query.where(model_id > last_id).order_by(model_id).limit(batch_size)).all()
+            if not batch:
+                break
+            record(db.session, [make(row) for row in batch])
+            written += len(batch)
+            last_id = batch[-1].id
+    db.session.commit()
+    return written
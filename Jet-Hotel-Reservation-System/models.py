@@ -1,7 +1,10 @@
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from sqlalchemy import DDL, and_, exists, event, insert, or_, select
+from sqlalchemy.orm import Session
+from datetime import date, datetime, timedelta
+from database import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -27,26 +30,21 @@ class Room(db.Model):
         if not self.available:
             return False
 
-        # Check for overlapping reservations
-        overlapping_reservation = Reservation.query.filter(
-            Reservation.room_id == self.id,
-            Reservation.check_in < check_out_date,
-            Reservation.check_out > check_in_date
-        ).first()
+        from availability_index import availability_index
+        return not availability_index.has_overlap(self.id, check_in_date, check_out_date)
 
-        return overlapping_reservation is None
+    @classmethod
+    def available_for_dates_query(cls, check_in_date, check_out_date):
+        """Query for available rooms with no overlapping reservation (NOT EXISTS anti-join)"""
+        overlapping = exists().where(
+            Reservation.overlaps(check_in_date, check_out_date, room_id=cls.id)
+        )
+        return cls.query.filter(cls.available.is_(True), ~overlapping)
 
     @classmethod
     def get_available_rooms_for_dates(cls, check_in_date, check_out_date):
         """Get all rooms available for the given date range"""
-        all_rooms = cls.query.filter_by(available=True).all()
-        available_rooms = []
-
-        for room in all_rooms:
-            if room.is_available_for_dates(check_in_date, check_out_date):
-                available_rooms.append(room)
-
-        return available_rooms
+        return cls.available_for_dates_query(check_in_date, check_out_date).order_by(cls.id).all()
 
 class Reservation(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -56,15 +54,158 @@ class Reservation(db.Model):
     check_out = db.Column(db.Date, nullable=False)
     status = db.Column(db.String(20), default="Booked")
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Deadline (UTC) of an unpaid hold; NULL once payment is confirmed
+    expires_at = db.Column(db.DateTime, nullable=True)
     transactions = db.relationship('Transaction', backref='reservation', lazy=True)
+    room_nights = db.relationship('RoomNight', backref='reservation', lazy=True, cascade='all, delete-orphan')
 
-class Transaction(db.Model):
+    # Statuses that no longer hold room nights
+    INACTIVE_STATUSES = ('Cancelled', 'Expired')
+
+    # Covers the overlap predicate used by every availability check
+    __table_args__ = (
+        db.Index('ix_reservation_room_dates', 'room_id', 'check_in', 'check_out'),
+        # Keyset pagination on (created_at, id), per guest and for the admin list
+        db.Index('ix_reservation_user_created', 'user_id', 'created_at', 'id'),
+        db.Index('ix_reservation_created', 'created_at', 'id'),
+        # Hold sweeper: lapsed Pending holds in deadline order
+        db.Index('ix_reservation_status_expires', 'status', 'expires_at'),
+    )
+
+    @classmethod
+    def overlaps(cls, check_in_date, check_out_date, room_id=None):
+        """SQL condition matching live reservations that overlap [check_in_date, check_out_date)"""
+        condition = and_(cls.check_in < check_out_date, cls.check_out > check_in_date, cls.is_holding())
+        if room_id is not None:
+            condition = and_(cls.room_id == room_id, condition)
+        return condition
+
+    @classmethod
+    def is_holding(cls, now=None):
+        """SQL condition for reservations still holding their nights: not cancelled or
+        expired, and not a hold past its deadline that the sweeper has yet to reach"""
+        return and_(cls.status.not_in(cls.INACTIVE_STATUSES),
+                    or_(cls.expires_at.is_(None), cls.expires_at > (now or datetime.utcnow())))
+
+    @property
+    def hold_lapsed(self):
+        return self.expires_at is not None and self.expires_at <= datetime.utcnow()
+
+    @classmethod
+    def has_overlap(cls, room_id, check_in_date, check_out_date):
+        """Check whether a room already has a reservation overlapping the date range"""
+        return db.session.query(
+            exists().where(cls.overlaps(check_in_date, check_out_date, room_id=room_id))
+        ).scalar()
+
+    def nights(self):
+        """Dates of every night covered by the stay"""
+        return stay_nights(self.check_in, self.check_out)
+
+    def sync_room_nights(self):
+        """Make room_nights match the stay dates, keeping rows for unchanged nights"""
+        if self.status in self.INACTIVE_STATUSES:
+            wanted = set()
+        else:
+            wanted = {(self.room_id, night) for night in self.nights()}
+        current = {(rn.room_id, rn.night): rn for rn in self.room_nights}
+        for key in current.keys() - wanted:
+            self.room_nights.remove(current[key])
+        for room_id, night in sorted(wanted - current.keys()):
+            self.room_nights.append(RoomNight(room_id=room_id, night=night))
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+def stay_nights(check_in, check_out):
+    """Dates of each night from check_in up to, not including, check_out"""
+    check_in, check_out = _as_date(check_in), _as_date(check_out)
+    return [check_in + timedelta(days=i) for i in range((check_out - check_in).days)]
+
+class RoomNight(db.Model):
+    """Room-night inventory: one row per room per booked night"""
     id = db.Column(db.Integer, primary_key=True)
+    room_id = db.Column(db.Integer, db.ForeignKey('room.id'), nullable=False)
+    night = db.Column(db.Date, nullable=False)
     reservation_id = db.Column(db.Integer, db.ForeignKey('reservation.id'), nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('room_id', 'night', name='uq_room_night'),
+        db.Index('ix_room_night_night', 'night', 'room_id'),
+    )
+
+    @classmethod
+    def booked_room_ids(cls, first_night, last_night=None):
+        """Ids of rooms booked on any night from first_night up to and including last_night"""
+        query = db.session.query(cls.room_id).distinct()
+        if last_night is None:
+            query = query.filter(cls.night == first_night)
+        else:
+            query = query.filter(cls.night >= first_night, cls.night <= last_night)
+        return {room_id for room_id, in query}
+
+    @classmethod
+    def backfill(cls, batch_size=1000):
+        """Rebuild the inventory from the Reservation table.
+
+        Returns (reservations, nights, conflicts) where conflicts lists the ids of
+        reservations whose nights were already taken by an earlier reservation.
+        """
+        db.session.query(cls).delete()
+        taken = set()
+        conflicts = []
+        reservation_count = night_count = 0
+        last_id = 0
+        while True:
+            # Walk the table in id order so the read never holds a cursor open across inserts
+            batch = db.session.execute(
+                select(Reservation.id, Reservation.room_id, Reservation.check_in, Reservation.check_out)
+                .where(Reservation.id > last_id, Reservation.status.not_in(Reservation.INACTIVE_STATUSES))
+                .order_by(Reservation.id)
+                .limit(batch_size)
+            ).all()
+            if not batch:
+                break
+            rows = []
+            for reservation_id, room_id, check_in, check_out in batch:
+                keys = [(room_id, night) for night in stay_nights(check_in, check_out)]
+                if any(key in taken for key in keys):
+                    conflicts.append(reservation_id)
+                    continue
+                taken.update(keys)
+                reservation_count += 1
+                rows.extend({'room_id': room_id, 'night': night, 'reservation_id': reservation_id}
+                            for room_id, night in keys)
+            if rows:
+                db.session.execute(insert(cls), rows)
+                night_count += len(rows)
+            last_id = batch[-1][0]
+        db.session.commit()
+        return reservation_count, night_count, conflicts
+
+@event.listens_for(Session, 'before_flush')
+def _sync_room_nights(session, flush_context, instances):
+    for obj in session.new:
+        if isinstance(obj, Reservation):
+            obj.sync_room_nights()
+    for obj in session.dirty:
+        if isinstance(obj, Reservation):
+            state = db.inspect(obj)
+            if any(state.attrs[field].history.has_changes() for field in ('room_id', 'check_in', 'check_out', 'status')):
+                obj.sync_room_nights()
+
+class Transaction(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    # NULL once the reservation is cancelled and deleted; the transaction stays for the books
+    reservation_id = db.Column(db.Integer, db.ForeignKey('reservation.id'), nullable=True)
     amount = db.Column(db.Float, nullable=False)
     status = db.Column(db.String(20), default="Paid")
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_transaction_created', 'created_at', 'id'),
+    )
+
     @classmethod
     def get_total_revenue(cls):
         """Get total revenue from all paid transactions"""
@@ -76,7 +217,9 @@ class Transaction(db.Model):
         """Cancel transaction for a reservation"""
         transaction = cls.query.filter_by(reservation_id=reservation_id).first()
         if transaction:
-            transaction.status = "Cancelled"
+            if transaction.status != "Cancelled":
+                from journal import transition
+                transition(transaction, "Cancelled")
             transaction.reservation_id = None
             db.session.commit()
         return transaction
@@ -87,3 +230,144 @@ class Notification(db.Model):
     message = db.Column(db.String(200), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_read = db.Column(db.Boolean, default=False)
+
+    __table_args__ = (
+        db.Index('ix_notification_user_created', 'user_id', 'created_at', 'id'),
+        # Unread badge counts and mark-as-read updates
+        db.Index('ix_notification_user_unread', 'user_id', 'is_read', 'created_at'),
+    )
+
+class CatalogVersion(db.Model):
+    """Single-row counter bumped whenever rooms are added, edited or deleted"""
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class AvailabilityVersion(db.Model):
+    """Single-row counter bumped whenever reservations or room availability change"""
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+# Created with their one row, so concurrent first writers never race to insert it
+event.listen(CatalogVersion.__table__, 'after_create',
+             DDL("INSERT INTO catalog_version (id, version) VALUES (1, 0)"))
+event.listen(AvailabilityVersion.__table__, 'after_create',
+             DDL("INSERT INTO availability_version (id, version) VALUES (1, 0)"))
+
+class DailyRoomStats(db.Model):
+    """Rollup of room nights sold and revenue earned per room per night (maintained by analytics.py)"""
+    day = db.Column(db.Date, primary_key=True)
+    # No foreign key: the history outlives deleted rooms
+    room_id = db.Column(db.Integer, primary_key=True)
+    nights_sold = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+
+class MonthlyRevenue(db.Model):
+    """Revenue per calendar month, kept alongside DailyRoomStats so the all-time total is a
+    sum over months rather than over every room-night"""
+    month = db.Column(db.Date, primary_key=True)   # First day of the month
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+
+class ReservationEvent(db.Model):
+    """Append-only journal of reservation and transaction status changes (see journal.py).
+
+    from_status is NULL when the row was created and to_status is NULL when it
+    left the hot tables (deleted or archived). No foreign keys: the journal
+    outlives the rows it describes.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(12), nullable=False)   # reservation, transaction
+    entity_id = db.Column(db.Integer, nullable=False)
+    reservation_id = db.Column(db.Integer, nullable=True)
+    user_id = db.Column(db.Integer, nullable=True)
+    from_status = db.Column(db.String(20), nullable=True)
+    to_status = db.Column(db.String(20), nullable=True)
+    amount = db.Column(db.Float, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_reservation_event_entity', 'entity', 'entity_id'),
+    )
+
+class OutboxMessage(db.Model):
+    """Email queued in the same transaction as the change that triggered it"""
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(200), nullable=False)
+    recipients = db.Column(db.String(500), nullable=False)  # comma-separated
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default="Pending")  # Pending, Sending, Sent, Failed
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    claim_token = db.Column(db.String(32), nullable=True)
+    last_error = db.Column(db.String(500), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+# -----------------
+# History: checked-out stays moved out of the hot tables by archive.py
+# -----------------
+def _partition_by_year(table, column, first_year=2020):
+    """Range-partition a history table by year of column on MySQL; other backends keep one table.
+
+    MySQL requires the partition column in every unique key, so it is part of the primary key.
+    """
+    years = ', '.join(f"PARTITION p{year} VALUES LESS THAN ('{year + 1}-01-01')"
+                      for year in range(first_year, date.today().year + 6))
+    event.listen(table, 'after_create', DDL(
+        f"ALTER TABLE {table.name} PARTITION BY RANGE COLUMNS({column}) ("
+        f"PARTITION p_old VALUES LESS THAN ('{first_year}-01-01'), {years}, "
+        f"PARTITION p_future VALUES LESS THAN (MAXVALUE))"
+    ).execute_if(dialect='mysql'))
+
+class ReservationHistory(db.Model):
+    """Archived Reservation; same columns, no foreign keys"""
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    check_out = db.Column(db.Date, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    room_id = db.Column(db.Integer, nullable=False)
+    check_in = db.Column(db.Date, nullable=False)
+    status = db.Column(db.String(20))
+    created_at = db.Column(db.DateTime)
+    expires_at = db.Column(db.DateTime, nullable=True)
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_reservation_history_user_created', 'user_id', 'created_at'),
+        db.Index('ix_reservation_history_created', 'created_at', 'id'),
+    )
+
+class TransactionHistory(db.Model):
+    """Archived Transaction, including those orphaned by a cancelled reservation"""
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    created_at = db.Column(db.DateTime, primary_key=True)
+    reservation_id = db.Column(db.Integer, nullable=True)
+    amount = db.Column(db.Float, nullable=False)
+    status = db.Column(db.String(20))
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_transaction_history_reservation', 'reservation_id'),
+    )
+
+class NotificationHistory(db.Model):
+    """Archived Notification"""
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    created_at = db.Column(db.DateTime, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=True)
+    message = db.Column(db.String(200), nullable=False)
+    is_read = db.Column(db.Boolean, default=False)
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_notification_history_user_created', 'user_id', 'created_at', 'id'),
+    )
+
+_partition_by_year(ReservationHistory.__table__, 'check_out')
+_partition_by_year(TransactionHistory.__table__, 'created_at')
+_partition_by_year(NotificationHistory.__table__, 'created_at')
+
+# Hot model -> history model, for archive.py and for reads across both (exports, analytics)
+HISTORY = {Reservation: ReservationHistory, Transaction: TransactionHistory, Notification: NotificationHistory}
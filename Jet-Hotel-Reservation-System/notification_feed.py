@@ -0,0 +1,129 @@
+"""Live notification feed.
+
+Server-Sent Events push new Notification rows to guests (their own) and admins
+(user_id NULL) so nobody has to reload the dashboard to see payment
+confirmations. Commits that insert notifications wake the streams in this
+process immediately; a short poll on the primary key picks up rows written by
+other workers. A stream holds a request worker while it is open, so it lasts
+NOTIFICATION_STREAM_SECONDS and the browser reconnects after
+NOTIFICATION_RETRY_SECONDS, freeing the worker in between.
+"""
+import json
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import event, func, update
+from sqlalchemy.orm import Session
+
+from models import db, Notification
+
+_INSERTED = 'notifications_inserted'
+
+
+class NotificationBroker:
+    """Wakes waiting streams when this process commits new notifications"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._generation = 0
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def publish(self):
+        with self._condition:
+            self._generation += 1
+            self._condition.notify_all()
+
+    def wait(self, generation, timeout):
+        """Block until something is published after generation or timeout passes"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._generation != generation, timeout)
+            return self._generation
+
+
+broker = NotificationBroker()
+
+
+def _recipient_filter(user_id, is_admin):
+    # Admins see the shared admin feed, guests their own notifications
+    if is_admin:
+        return Notification.user_id.is_(None)
+    return Notification.user_id == user_id
+
+
+def latest_id(user_id, is_admin):
+    return db.session.query(func.max(Notification.id)).filter(_recipient_filter(user_id, is_admin)).scalar() or 0
+
+
+def unread_count(user_id, is_admin):
+    """Count unread notifications; served by the (user_id, is_read, created_at) index"""
+    return (db.session.query(func.count(Notification.id))
+            .filter(_recipient_filter(user_id, is_admin), Notification.is_read.is_(False))
+            .scalar())
+
+
+def mark_read(user_id, is_admin, ids=None, up_to_id=None):
+    """Mark notifications read with a single UPDATE; returns the number of rows changed"""
+    statement = update(Notification).where(_recipient_filter(user_id, is_admin), Notification.is_read.is_(False))
+    if ids is not None:
+        statement = statement.where(Notification.id.in_(ids))
+    if up_to_id is not None:
+        statement = statement.where(Notification.id <= up_to_id)
+    result = db.session.execute(statement.values(is_read=True), execution_options={'synchronize_session': False})
+    db.session.commit()
+    return result.rowcount
+
+
+def notification_event(notification):
+    data = json.dumps({'id': notification.id, 'message': notification.message, 'is_read': notification.is_read,
+                       'created_at': notification.created_at.isoformat()})
+    return f"id: {notification.id}\nevent: notification\ndata: {data}\n\n"
+
+
+def stream_events(user_id, is_admin, last_id):
+    """Yield SSE frames for notifications newer than last_id.
+
+    The stream ends after NOTIFICATION_STREAM_SECONDS; EventSource reconnects
+    after NOTIFICATION_RETRY_SECONDS with Last-Event-ID and resumes where it
+    left off.
+    """
+    config = current_app.config
+    poll_seconds = config.get('NOTIFICATION_POLL_SECONDS', 2.0)
+    heartbeat_seconds = config.get('NOTIFICATION_HEARTBEAT_SECONDS', 15.0)
+    deadline = time.monotonic() + config.get('NOTIFICATION_STREAM_SECONDS', 25.0)
+    last_sent = time.monotonic()
+    yield f"retry: {int(config.get('NOTIFICATION_RETRY_SECONDS', 10.0) * 1000)}\n\n"
+    while time.monotonic() < deadline:
+        generation = broker.generation
+        rows = (Notification.query
+                .filter(_recipient_filter(user_id, is_admin), Notification.id > last_id)
+                .order_by(Notification.id)
+                .limit(100)
+                .all())
+        # End the transaction so the next poll sees new commits and the connection goes back to the pool
+        db.session.close()
+        for notification in rows:
+            last_id = notification.id
+            last_sent = time.monotonic()
+            yield notification_event(notification)
+        if rows:
+            continue
+        if time.monotonic() - last_sent >= heartbeat_seconds:
+            last_sent = time.monotonic()
+            yield ": keepalive\n\n"
+        broker.wait(generation, poll_seconds)
+
+
+@event.listens_for(Session, 'after_flush')
+def _note_inserted(session, flush_context):
+    if any(isinstance(obj, Notification) for obj in session.new):
+        session.info[_INSERTED] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_inserted(session):
+    if session.info.pop(_INSERTED, False):
+        broker.publish()
@@ -0,0 +1,102 @@
+"""Rooms x nights occupancy grid for a month, built as a NumPy boolean matrix.
+
+One query fetches the active reservations overlapping the month. Their room
+rows and clipped night offsets are computed as arrays, and every stay is
+filled at once with a difference array: np.bincount puts +1 at each first
+night and -1 after each last night, then a cumulative sum runs along each
+row. No Python loop runs per cell. The matrix is served as one '0'/'1' string
+per room or as a packed, base64 encoded bitset.
+
+NumPy is imported here only; app.py loads this module on first use so app
+startup does not pay for it.
+"""
+import base64
+import calendar
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import select
+
+from models import db, Room, Reservation
+
+
+class MonthGrid:
+    __slots__ = ('first', 'days', 'rooms', 'matrix')
+
+    def __init__(self, first, days, rooms, matrix):
+        self.first = first
+        self.days = days
+        self.rooms = rooms          # (id, name, price, available) in row order
+        self.matrix = matrix        # bool array, rooms x days; True = booked that night
+
+    def nights(self):
+        return [self.first + timedelta(days=i) for i in range(self.days)]
+
+    def rows(self):
+        """One '0'/'1' string per room, a character per night"""
+        if not self.rooms:
+            return []
+        chars = np.where(self.matrix, ord('1'), ord('0')).astype(np.uint8)
+        return [row.tobytes().decode('ascii') for row in chars]
+
+    def bitset(self):
+        """Rows packed 8 nights per byte (first night in the high bit), base64 encoded"""
+        return base64.b64encode(np.packbits(self.matrix, axis=1).tobytes()).decode('ascii')
+
+    def to_json(self, encoding='rows'):
+        data = {
+            'month': self.first.strftime('%Y-%m'),
+            'first': self.first.isoformat(),
+            'days': self.days,
+            'rooms': [{'id': room_id, 'name': name, 'price': price, 'available': bool(available)}
+                      for room_id, name, price, available in self.rooms],
+            'booked_per_night': self.matrix.sum(axis=0).tolist(),
+            'encoding': encoding,
+        }
+        if encoding == 'bitset':
+            data['row_bytes'] = (self.days + 7) // 8
+            data['bitset'] = self.bitset()
+        else:
+            data['rows'] = self.rows()
+        return data
+
+
+def month_grid(year, month):
+    """Occupancy of every room for every night of the month"""
+    first = date(year, month, 1)
+    days = calendar.monthrange(year, month)[1]
+    end = first + timedelta(days=days)
+
+    rooms = db.session.execute(select(Room.id, Room.name, Room.price, Room.available).order_by(Room.id)).all()
+    stays = db.session.execute(
+        select(Reservation.room_id, Reservation.check_in, Reservation.check_out)
+        .where(Reservation.overlaps(first, end), Reservation.status.not_in(Reservation.INACTIVE_STATUSES))
+    ).all()
+    return MonthGrid(first, days, rooms, occupancy_matrix([room.id for room in rooms], stays, first, days))
+
+
+def occupancy_matrix(room_ids, stays, first, days):
+    """rooms x days boolean matrix of the (room_id, check_in, check_out) stays; room_ids must be sorted"""
+    if not room_ids or not stays:
+        return np.zeros((len(room_ids), days), dtype=bool)
+    ids = np.asarray(room_ids)
+    count = len(stays)
+    stay_rooms = np.fromiter((stay[0] for stay in stays), dtype=np.int64, count=count)
+    # Day offsets from the first night via ordinals; far cheaper than converting to datetime64
+    origin = first.toordinal()
+    starts = np.fromiter((stay[1].toordinal() for stay in stays), dtype=np.int64, count=count) - origin
+    ends = np.fromiter((stay[2].toordinal() for stay in stays), dtype=np.int64, count=count) - origin
+
+    rows = np.searchsorted(ids, stay_rooms)
+    # Stays of deleted rooms have no row
+    known = (rows < len(ids)) & (ids[np.minimum(rows, len(ids) - 1)] == stay_rooms)
+    rows = rows[known]
+    starts = np.clip(starts[known], 0, days)
+    ends = np.clip(ends[known], 0, days)
+
+    # Difference array over the flattened rows x (days + 1) grid
+    width = days + 1
+    size = len(room_ids) * width
+    diff = (np.bincount(rows * width + starts, minlength=size)
+            - np.bincount(rows * width + ends, minlength=size)).reshape(len(room_ids), width)
+    return np.cumsum(diff[:, :days], axis=1) > 0
@@ -0,0 +1,207 @@
+"""Transactional email outbox.
+
+Request handlers queue mail with enqueue_email() before they commit, so the
+message is stored in the same transaction as the booking or payment change.
+Background workers claim pending rows in batches, send them over a reused SMTP
+connection, retry transient failures with exponential backoff and dead-letter
+permanent ones (status "Failed").
+"""
+import os
+import smtplib
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import event, or_, select, update
+from sqlalchemy.orm import Session
+
+from models import db, OutboxMessage
+
+_QUEUED = 'outbox_queued'
+
+
+def enqueue_email(subject, recipients, body):
+    """Add an email to the outbox; it is sent once the surrounding transaction commits"""
+    message = OutboxMessage(subject=subject, recipients=','.join(recipients), body=body)
+    db.session.add(message)
+    return message
+
+
+def claim_batch(batch_size):
+    """Claim up to batch_size due messages for this worker and return them.
+
+    Claimed rows move to "Sending" with a lease; rows whose lease expired (a
+    worker died mid-batch) become claimable again.
+    """
+    now = datetime.utcnow()
+    lease = timedelta(seconds=current_app.config.get('OUTBOX_LEASE_SECONDS', 300))
+    token = uuid.uuid4().hex
+    candidate_ids = db.session.execute(
+        select(OutboxMessage.id)
+        .where(or_(OutboxMessage.status == "Pending", OutboxMessage.status == "Sending"),
+               OutboxMessage.next_attempt_at <= now)
+        .order_by(OutboxMessage.next_attempt_at, OutboxMessage.id)
+        .limit(batch_size)
+    ).scalars().all()
+    if not candidate_ids:
+        db.session.commit()
+        return []
+    # Re-check the due condition so two workers never claim the same row
+    db.session.execute(
+        update(OutboxMessage)
+        .where(OutboxMessage.id.in_(candidate_ids),
+               or_(OutboxMessage.status == "Pending", OutboxMessage.status == "Sending"),
+               OutboxMessage.next_attempt_at <= now)
+        .values(status="Sending", claim_token=token, next_attempt_at=now + lease),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.commit()
+    return OutboxMessage.query.filter_by(claim_token=token, status="Sending").order_by(OutboxMessage.id).all()
+
+
+def mail_for(app):
+    """The app's Flask-Mail state, set up on first use so importing the app stays cheap"""
+    mail = app.extensions.get('mail')
+    if mail is None:
+        from flask_mail import Mail
+        Mail(app)
+        mail = app.extensions['mail']
+    return mail
+
+
+def _is_permanent(error):
+    from flask_mail import BadHeaderError
+    if isinstance(error, (smtplib.SMTPRecipientsRefused, BadHeaderError, AssertionError)):
+        return True
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+
+def _mark_failed(message, error, permanent):
+    config = current_app.config
+    message.attempts = (message.attempts or 0) + 1
+    message.last_error = str(error)[:500]
+    message.claim_token = None
+    if permanent or message.attempts >= config.get('OUTBOX_MAX_ATTEMPTS', 8):
+        message.status = "Failed"
+    else:
+        delay = config.get('OUTBOX_RETRY_BASE_SECONDS', 30) * 2 ** (message.attempts - 1)
+        message.status = "Pending"
+        message.next_attempt_at = datetime.utcnow() + timedelta(seconds=min(delay, 6 * 3600))
+
+
+def send_batch(connection, messages):
+    """Send claimed messages over an open connection.
+
+    Returns (sent, failed, disconnected); on a dropped connection the unsent
+    rest of the batch is rescheduled.
+    """
+    from flask_mail import Message
+    sent = failed = 0
+    for index, message in enumerate(messages):
+        try:
+            connection.send(Message(subject=message.subject, recipients=message.recipients.split(','),
+                                    body=message.body))
+        except (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError) as e:
+            # The connection is gone, not just this message
+            for remaining in messages[index:]:
+                _mark_failed(remaining, e, permanent=False)
+            db.session.commit()
+            return sent, failed + len(messages) - index, True
+        except Exception as e:
+            _mark_failed(message, e, permanent=_is_permanent(e))
+            failed += 1
+        else:
+            message.status = "Sent"
+            message.sent_at = datetime.utcnow()
+            message.claim_token = None
+            sent += 1
+    db.session.commit()
+    return sent, failed, False
+
+
+def deliver_pending(mail, batch_size=None):
+    """Drain due messages, reusing one SMTP connection while batches keep coming.
+
+    Returns (sent, failed) totals.
+    """
+    batch_size = batch_size or current_app.config.get('OUTBOX_BATCH_SIZE', 50)
+    sent = failed = 0
+    messages = claim_batch(batch_size)
+    if not messages:
+        return sent, failed
+    try:
+        with mail.connect() as connection:
+            while messages:
+                batch_sent, batch_failed, disconnected = send_batch(connection, messages)
+                sent += batch_sent
+                failed += batch_failed
+                if disconnected:
+                    break
+                messages = claim_batch(batch_size)
+    except Exception as e:
+        # Could not connect: put the claimed batch back for a retry
+        unsent = [message for message in messages if message.status == "Sending"]
+        for message in unsent:
+            _mark_failed(message, e, permanent=False)
+        db.session.commit()
+        failed += len(unsent)
+        print("Outbox delivery failed:", e)
+    return sent, failed
+
+
+class OutboxWorkers:
+    """Pool of daemon threads draining the outbox for one process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._threads = []
+        self._pid = None
+
+    def ensure_started(self, app):
+        """Start the pool once per process (threads do not survive a fork)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._threads = []
+            for i in range(app.config.get('OUTBOX_WORKERS', 2)):
+                thread = threading.Thread(target=self._run, args=(app,), name=f"outbox-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self._pid = os.getpid()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def _run(self, app):
+        poll_interval = app.config.get('OUTBOX_POLL_SECONDS', 5)
+        mail = mail_for(app)
+        while True:
+            self._wakeup.clear()
+            with app.app_context():
+                try:
+                    deliver_pending(mail)
+                except Exception as e:
+                    db.session.rollback()
+                    print("Outbox worker error:", e)
+                finally:
+                    db.session.remove()
+            self._wakeup.wait(poll_interval)
+
+
+outbox_workers = OutboxWorkers()
+
+
+@event.listens_for(Session, 'after_flush')
+def _note_queued(session, flush_context):
+    if any(isinstance(obj, OutboxMessage) for obj in session.new):
+        session.info[_QUEUED] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_workers(session):
+    if session.info.pop(_QUEUED, False):
+        outbox_workers.wake()
@@ -0,0 +1,56 @@
+"""Keyset (cursor) pagination on (created_at, id).
+
+Each page continues from the last row of the previous one instead of using
+OFFSET, so page 1000 costs the same index range scan as page 1.
+"""
+import base64
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+PER_PAGE = 20
+
+
+class Page:
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_more(self):
+        return self.next_cursor is not None
+
+
+def encode_cursor(created_at, row_id):
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (created_at, id) for a cursor, or None if it is missing or malformed"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.split('|')
+        return datetime.fromisoformat(created_at), int(row_id)
+    except ValueError:
+        return None
+
+
+def keyset_page(query, model, cursor=None, per_page=PER_PAGE):
+    """Return the page of query (newest first) that follows cursor"""
+    position = decode_cursor(cursor)
+    if position is not None:
+        created_at, row_id = position
+        query = query.filter(or_(
+            model.created_at < created_at,
+            and_(model.created_at == created_at, model.id < row_id),
+        ))
+    # One extra row tells us whether there is another page
+    rows = query.order_by(model.created_at.desc(), model.id.desc()).limit(per_page + 1).all()
+    items = rows[:per_page]
+    next_cursor = None
+    if len(rows) > per_page:
+        next_cursor = encode_cursor(items[-1].created_at, items[-1].id)
+    return Page(items, next_cursor)
@@ -0,0 +1,103 @@
+"""Password hashing with a per-process cap on concurrent hashes.
+
+scrypt and PBKDF2 are deliberately slow. If every request thread may hash at
+once, a login burst takes all the CPU and the rest of the site stalls. A
+non-blocking semaphore lets at most PASSWORD_HASH_MAX_CONCURRENT hashes run at
+once in each process, on the request threads themselves. Past that,
+HashingBusy is raised at once and the view answers 429 rather than queueing.
+The cap is per worker process: with several gunicorn workers the site-wide
+limit is workers x PASSWORD_HASH_MAX_CONCURRENT, so size it as the CPUs
+you are willing to spend on hashing divided by the workers.
+
+PASSWORD_HASH_METHOD is any werkzeug method string. Stored hashes made with a
+different method are replaced after the next successful login.
+
+    PASSWORD_HASH_METHOD            default 'scrypt:32768:8:1'
+    PASSWORD_HASH_MAX_CONCURRENT    hashes running at once per process (default half the CPUs)
+"""
+import os
+import threading
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+
+
+class HashingBusy(Exception):
+    """Too many password hashes are already running in this process"""
+
+
+class HashSlots:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._slots = None
+        self._key = None
+
+    def _semaphore(self, config):
+        # Rebuilt after a fork or when the configured cap changes
+        key = (os.getpid(), config.get('PASSWORD_HASH_MAX_CONCURRENT', 1))
+        if self._key != key:
+            with self._lock:
+                if self._key != key:
+                    self._slots = threading.BoundedSemaphore(max(1, key[1]))
+                    self._key = key
+        return self._slots
+
+    def run(self, function, *args):
+        """Run function(*args) on this thread if a slot is free; raises HashingBusy otherwise"""
+        slots = self._semaphore(current_app.config)
+        if not slots.acquire(blocking=False):
+            raise HashingBusy()
+        try:
+            return function(*args)
+        finally:
+            slots.release()
+
+    def reset(self):
+        with self._lock:
+            self._slots = self._key = None
+
+
+hash_slots = HashSlots()
+
+
+def _method():
+    return current_app.config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD)
+
+
+def hash_password(password):
+    return hash_slots.run(generate_password_hash, password, _method())
+
+
+_reference_hashes = {}
+_reference_lock = threading.Lock()
+
+
+def _reference_hash(method):
+    # Made once per method, on first use inside a hashing slot rather than at import: checked when
+    # the email is unknown (so a miss costs as much as a wrong password) and shows how werkzeug
+    # spells the method with its defaults filled in
+    reference = _reference_hashes.get(method)
+    if reference is None:
+        with _reference_lock:
+            reference = _reference_hashes.get(method)
+            if reference is None:
+                reference = _reference_hashes[method] = generate_password_hash('unknown user', method)
+    return reference
+
+
+def _check(stored_hash, password):
+    return check_password_hash(stored_hash or _reference_hash(_method()), password)
+
+
+def verify_password(stored_hash, password):
+    """Check password against stored_hash, or against a throwaway hash when stored_hash is None"""
+    return hash_slots.run(_check, stored_hash, password)
+
+
+def needs_rehash(stored_hash):
+    """True if stored_hash was made with a different method or cost than configured;
+    raises HashingBusy if the reference hash is not made yet and no slot is free"""
+    reference = hash_slots.run(_reference_hash, _method())
+    return stored_hash.split('$', 1)[0] != reference.split('$', 1)[0]
@@ -0,0 +1,159 @@
+"""Per-process projections of the reservation event journal.
+
+Each projection folds ReservationEvent rows (see journal.py) into a small
+in-memory read model:
+- PendingApprovals: transactions waiting for the admin to approve the payment;
+- UserCounters: bookings made, cancelled and currently held per guest;
+- DashboardTotals: reservations in the hot tables per status.
+
+catch_up() applies only the events added since the last call, in one query,
+so the dashboard and the payment approvals tab read precomputed state instead
+of scanning reservations and transactions. Journal ids are handed out when a
+transaction inserts, not when it commits, so a lower id can show up after a
+higher one: ids skipped over are retried for GAP_SECONDS before being given up
+as rolled back. rebuild() replays the whole journal.
+
+Requests call refresh() instead, which applies at most CATCH_UP_LIMIT events.
+After a restart against a long journal the projections are then rebuilt a
+slice per request rather than all at once inside one; until refresh() reports
+them current, callers read the source tables instead.
+"""
+import threading
+import time
+
+from sqlalchemy import or_, select
+
+from models import db, Reservation, ReservationEvent
+import journal  # noqa: F401  registers the flush listener that writes the journal
+
+GAP_SECONDS = 60.0
+BATCH_SIZE = 5000
+CATCH_UP_LIMIT = 1000
+
+
+class PendingApprovals:
+    """Ids of transactions in "Payment Confirmed", oldest transaction first (the order
+    admin_queries.pending_payment_transactions() reads them in)"""
+
+    def __init__(self):
+        self.transaction_ids = set()
+
+    def apply(self, event):
+        if event.entity != 'transaction':
+            return
+        if event.to_status == "Payment Confirmed":
+            self.transaction_ids.add(event.entity_id)
+        else:
+            self.transaction_ids.discard(event.entity_id)
+
+    def ids(self):
+        return sorted(self.transaction_ids)
+
+
+class UserCounters:
+    """Per guest: reservations ever made, cancelled, and held now by status"""
+
+    def __init__(self):
+        self.users = {}
+
+    def get(self, user_id):
+        return self.users.get(user_id) or {'bookings': 0, 'cancelled': 0, 'statuses': {}}
+
+    def apply(self, event):
+        if event.entity != 'reservation' or event.user_id is None:
+            return
+        counters = self.users.setdefault(event.user_id, {'bookings': 0, 'cancelled': 0, 'statuses': {}})
+        statuses = counters['statuses']
+        if event.from_status is None:
+            counters['bookings'] += 1
+        else:
+            statuses[event.from_status] = statuses.get(event.from_status, 0) - 1
+            if not statuses[event.from_status]:
+                del statuses[event.from_status]
+        if event.to_status is not None:
+            statuses[event.to_status] = statuses.get(event.to_status, 0) + 1
+            if event.to_status == "Cancelled":
+                counters['cancelled'] += 1
+
+
+class DashboardTotals:
+    """Reservations in the hot tables per status"""
+
+    def __init__(self):
+        self.statuses = {}
+
+    @property
+    def total_bookings(self):
+        """Reservations still holding their nights; cancelled and expired ones are left out"""
+        return sum(count for status, count in self.statuses.items() if status not in Reservation.INACTIVE_STATUSES)
+
+    def apply(self, event):
+        if event.entity != 'reservation':
+            return
+        if event.from_status is not None:
+            self.statuses[event.from_status] = self.statuses.get(event.from_status, 0) - 1
+            if not self.statuses[event.from_status]:
+                del self.statuses[event.from_status]
+        if event.to_status is not None:
+            self.statuses[event.to_status] = self.statuses.get(event.to_status, 0) + 1
+
+
+class Projections:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        """Forget everything; the next catch_up() replays the journal from the start"""
+        with self._lock:
+            self.pending_approvals = PendingApprovals()
+            self.user_counters = UserCounters()
+            self.dashboard_totals = DashboardTotals()
+            self.last_id = 0
+            self.current = False   # whether the last catch-up reached the end of the journal
+            self._gaps = {}   # skipped journal id -> monotonic time first seen missing
+
+    def _apply(self, events):
+        for event in events:
+            if event.id > self.last_id:
+                now = time.monotonic()
+                for missing in range(self.last_id + 1, event.id):
+                    self._gaps[missing] = now
+                self.last_id = event.id
+            else:
+                self._gaps.pop(event.id, None)
+            self.pending_approvals.apply(event)
+            self.user_counters.apply(event)
+            self.dashboard_totals.apply(event)
+
+    def catch_up(self, limit=None):
+        """Apply journal events added since the last call; returns how many were applied"""
+        with self._lock:
+            now = time.monotonic()
+            self._gaps = {event_id: seen for event_id, seen in self._gaps.items() if now - seen < GAP_SECONDS}
+            condition = ReservationEvent.id > self.last_id
+            if self._gaps:
+                condition = or_(condition, ReservationEvent.id.in_(list(self._gaps)))
+            query = select(ReservationEvent.__table__).where(condition).order_by(ReservationEvent.id)
+            if limit is not None:
+                query = query.limit(limit)
+            events = db.session.execute(query).all()
+            self._apply(events)
+            self.current = limit is None or len(events) < limit
+            return len(events)
+
+    def refresh(self):
+        """Catch up by at most CATCH_UP_LIMIT events; returns whether the projections are current"""
+        with self._lock:
+            self.catch_up(limit=CATCH_UP_LIMIT)
+            return self.current
+
+    def rebuild(self, batch_size=BATCH_SIZE):
+        """Replay the whole journal from scratch"""
+        with self._lock:
+            self.clear()
+            while self.catch_up(limit=batch_size) == batch_size:
+                pass
+
+
+projections = Projections()
@@ -0,0 +1,87 @@
+from datetime import date, datetime, timedelta
+from sqlalchemy import event, update
+from models import db, User, Room, Reservation, Transaction, Notification
+import admin_queries
+import holds
+from booking import book_room
+from projections import projections
+
+
+def _seed():
+    db.session.add_all([User(full_name=f"Guest {i}", email=f"guest{i}@gmail.com", contact_info="123", password="x")
+                        for i in range(5)])
+    db.session.add_all([Room(name=f"Room {i}", price=100.0) for i in range(10)])
+    db.session.commit()
+
+
+def _add_reservations(start, count):
+    for i in range(start, start + count):
+        check_in = date(2030, 1, 1) + timedelta(days=3 * (i // 10))
+        reservation = Reservation(user_id=i % 5 + 1, room_id=i % 10 + 1,
+                                  check_in=check_in, check_out=check_in + timedelta(days=2))
+        db.session.add(reservation)
+        db.session.flush()
+        db.session.add(Transaction(reservation_id=reservation.id, amount=200.0,
+                                   status="Payment Confirmed" if i % 2 else "Paid"))
+        db.session.add(Notification(user_id=None, message=f"Reservation #{reservation.id}"))
+    db.session.commit()
+    db.session.expunge_all()
+
+
+def _render_queries():
+    """Build the dashboard context and touch every attribute dashboard.html reads"""
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        context = admin_queries.dashboard_context()
+        for r in context['reservations'][:10]:
+            r.user.full_name, r.room.name, r.check_in, r.status
+        for room in context['rooms']:
+            room.name, room.price, room.available
+        for transaction in context['pending_transactions']:
+            transaction.reservation.user.full_name, transaction.reservation.room.name
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    return context, len(statements)
+
+
+def test_dashboard_query_count_is_constant(app):
+    _seed()
+    _add_reservations(0, 20)
+    context, small = _render_queries()
+    assert context['total_bookings'] == 20
+    assert len(context['pending_transactions']) == 10
+    assert len([room for room in context['rooms'] if room.status == 'booked']) == 10
+
+    _add_reservations(20, 180)
+    context, large = _render_queries()
+    assert context['total_bookings'] == 200
+    assert len(context['reservations']) == 10
+    assert small == large == 6
+
+
+def test_booked_until_is_latest_check_out(app):
+    _seed()
+    _add_reservations(0, 30)
+    rooms = {room.name: room for room in admin_queries.rooms_with_booking_status()}
+    assert rooms['Room 0'].status == 'booked'
+    assert rooms['Room 0'].booked_until == date(2030, 1, 9)
+
+
+def test_expired_holds_neither_book_rooms_nor_count(app):
+    _seed()
+    reservation, _ = book_room(db.session.get(User, 1), db.session.get(Room, 1), date(2030, 1, 1), date(2030, 1, 3))
+    book_room(db.session.get(User, 2), db.session.get(Room, 2), date(2030, 1, 1), date(2030, 1, 3))
+    db.session.execute(update(Reservation).where(Reservation.id == reservation.id)
+                       .values(expires_at=datetime.utcnow() - timedelta(minutes=1)))
+    db.session.commit()
+
+    # Lapsed but not swept yet: the room is free again
+    rooms = {room.id: room for room in admin_queries.rooms_with_booking_status()}
+    assert (rooms[1].status, rooms[2].status) == ('available', 'booked')
+
+    assert holds.sweep() == 1
+    assert admin_queries.dashboard_context()['total_bookings'] == 1
+    assert admin_queries.total_bookings(current=False) == 1
+    assert projections.dashboard_totals.statuses == {"Expired": 1, "Pending": 1}
@@ -0,0 +1,68 @@
+from datetime import date
+
+import analytics
+from models import db, User, Room, Reservation, Transaction, DailyRoomStats, MonthlyRevenue
+from booking import book_room, book_rooms
+
+
+def _seed():
+    db.session.add(User(full_name="Guest", email="guest@gmail.com", contact_info="123", password="x"))
+    db.session.add_all([Room(name="Suite", price=250.0), Room(name="Standard", price=100.0)])
+    db.session.commit()
+
+
+def _snapshot():
+    return {(row.day, row.room_id): (row.nights_sold, round(row.revenue, 2))
+            for row in DailyRoomStats.query if row.nights_sold or row.revenue}
+
+
+def test_incremental_rollups_match_a_rebuild(app):
+    _seed()
+    user, suite = db.session.get(User, 1), db.session.get(Room, 1)
+    reservation, transaction = book_room(user, suite, date(2030, 1, 30), date(2030, 2, 2))
+    book_rooms(user, [(2, date(2030, 1, 31), date(2030, 2, 1)), (2, date(2030, 2, 5), date(2030, 2, 7))])
+
+    # Approving the payment adds its revenue to the stay's nights (as approve_payment does)
+    transaction.status = "Paid"
+    analytics.record_stay(db.session, 1, reservation.check_in, reservation.check_out, nights=0,
+                          revenue=transaction.amount)
+    db.session.commit()
+    assert _snapshot()[(date(2030, 1, 31), 1)] == (1, 250.0)
+    assert analytics.total_revenue() == 750.0
+
+    # Cancelling releases the nights (as cancel_reservation does)
+    second = Reservation.query.filter_by(room_id=2, check_in=date(2030, 2, 5)).one()
+    analytics.record_stay(db.session, 2, second.check_in, second.check_out, nights=-1)
+    Transaction.query.filter_by(reservation_id=second.id).delete()
+    db.session.delete(second)
+    db.session.commit()
+
+    incremental = _snapshot()
+    assert len(incremental) == 4
+    analytics.rebuild()
+    assert _snapshot() == incremental
+    # The monthly rollup behind the dashboard total agrees with the daily rows
+    assert [(row.month, round(row.revenue, 2)) for row in MonthlyRevenue.query.order_by(MonthlyRevenue.month)] == \
+        [(date(2030, 1, 1), 500.0), (date(2030, 2, 1), 250.0)]
+    assert analytics.total_revenue() == 750.0
+
+
+def test_reports_read_the_rollups(app):
+    _seed()
+    analytics.record_stays(db.session, [(1, date(2030, 1, 30), date(2030, 2, 2), 1, 750.0),
+                                        (2, date(2030, 1, 31), date(2030, 2, 1), 1, 0.0)])
+    db.session.commit()
+
+    daily = analytics.daily_report(date(2030, 1, 30), date(2030, 2, 2))
+    assert [row['nights_sold'] for row in daily] == [1, 2, 1, 0]
+    assert [row['occupancy'] for row in daily] == [0.5, 1.0, 0.5, 0.0]
+    assert daily[0]['revenue'] == 250.0
+
+    monthly = analytics.monthly_report(date(2030, 1, 1), date(2030, 2, 28))
+    assert [(row['period'], row['revenue'], row['nights_sold']) for row in monthly] == \
+        [('2030-01', 500.0, 3), ('2030-02', 250.0, 1)]
+    assert monthly[0]['occupancy'] == round(3 / 62, 4)
+
+    rooms = analytics.room_report(date(2030, 1, 30), date(2030, 2, 8))
+    assert [(row['room'], row['nights_sold'], row['occupancy']) for row in rooms] == \
+        [('Suite', 3, 0.3), ('Standard', 1, 0.1)]
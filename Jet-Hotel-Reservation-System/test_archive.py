@@ -0,0 +1,61 @@
+import csv
+import io
+from datetime import date, datetime, timedelta
+
+import analytics
+import archive
+import exports
+from models import (db, User, Room, Reservation, RoomNight, Transaction, Notification, DailyRoomStats,
+                    ReservationHistory, TransactionHistory, NotificationHistory)
+
+
+def _seed():
+    db.session.add(User(full_name="Guest", email="guest@gmail.com", contact_info="123", password="x"))
+    db.session.add(Room(name="Suite", price=100.0))
+    db.session.commit()
+    today = date.today()
+    stays = [(today - timedelta(days=800), 2), (today - timedelta(days=400), 3), (today - timedelta(days=30), 1),
+             (today + timedelta(days=10), 2)]
+    for check_in, nights in stays:
+        reservation = Reservation(user_id=1, room_id=1, check_in=check_in, check_out=check_in + timedelta(days=nights),
+                                  status="Confirmed", created_at=datetime.combine(check_in, datetime.min.time()))
+        db.session.add(reservation)
+        db.session.flush()
+        db.session.add(Transaction(reservation_id=reservation.id, amount=100.0 * nights, status="Paid",
+                                   created_at=reservation.created_at))
+        db.session.add(Notification(user_id=1, message=f"Booked #{reservation.id}", created_at=reservation.created_at))
+    db.session.commit()
+    analytics.rebuild()
+
+
+def _snapshot():
+    return {(row.day, row.room_id): (row.nights_sold, row.revenue) for row in DailyRoomStats.query}
+
+
+def test_archive_moves_old_stays_in_batches(app):
+    _seed()
+    before = _snapshot()
+
+    counts = archive.archive(days=365, batch_size=1)
+    assert counts == {'reservations': 2, 'orphaned_transactions': 0, 'notifications': 2}
+
+    # Hot tables keep the recent and upcoming stays only
+    assert [r.id for r in Reservation.query.order_by(Reservation.id)] == [3, 4]
+    assert [t.reservation_id for t in Transaction.query.order_by(Transaction.id)] == [3, 4]
+    assert RoomNight.query.filter(RoomNight.reservation_id.in_([1, 2])).count() == 0
+    assert Notification.query.count() == 2
+    assert [(r.id, r.status) for r in ReservationHistory.query.order_by(ReservationHistory.id)] == \
+        [(1, "Confirmed"), (2, "Confirmed")]
+    assert [t.amount for t in TransactionHistory.query.order_by(TransactionHistory.id)] == [200.0, 300.0]
+    assert NotificationHistory.query.count() == 2
+    assert archive.archive(days=365) == {'reservations': 0, 'orphaned_transactions': 0, 'notifications': 0}
+
+    # Reports are untouched, and a rebuild counts the archived stays from history
+    assert _snapshot() == before
+    analytics.rebuild()
+    assert _snapshot() == before
+
+    # Exports read history first, then the live rows
+    rows = list(csv.DictReader(io.StringIO(''.join(exports.stream('transactions', 'csv')))))
+    assert [(row['reservation_id'], row['room']) for row in rows] == [('1', 'Suite'), ('2', 'Suite'),
+                                                                      ('3', 'Suite'), ('4', 'Suite')]
@@ -0,0 +1,48 @@
+from datetime import date
+from sqlalchemy import event
+from models import db, User, Room, Reservation
+
+
+def _seed():
+    user = User(full_name="Guest", email="guest@gmail.com", contact_info="123", password="x")
+    rooms = [Room(name=f"Room {i}", price=100.0) for i in range(4)]
+    rooms[3].available = False
+    db.session.add(user)
+    db.session.add_all(rooms)
+    db.session.commit()
+    # Room 0 booked 10th-12th, room 1 booked 12th-14th
+    db.session.add_all([
+        Reservation(user_id=user.id, room_id=rooms[0].id, check_in=date(2030, 1, 10), check_out=date(2030, 1, 12)),
+        Reservation(user_id=user.id, room_id=rooms[1].id, check_in=date(2030, 1, 12), check_out=date(2030, 1, 14)),
+    ])
+    db.session.commit()
+    return rooms
+
+
+def test_available_rooms_for_dates(app):
+    rooms = _seed()
+
+    free = Room.get_available_rooms_for_dates(date(2030, 1, 11), date(2030, 1, 13))
+    assert [r.id for r in free] == [rooms[2].id]
+
+    # Check-out day is free for the next guest
+    free = Room.get_available_rooms_for_dates(date(2030, 1, 14), date(2030, 1, 15))
+    assert [r.id for r in free] == [rooms[0].id, rooms[1].id, rooms[2].id]
+
+    assert not rooms[0].is_available_for_dates(date(2030, 1, 9), date(2030, 1, 11))
+    assert rooms[0].is_available_for_dates(date(2030, 1, 12), date(2030, 1, 13))
+    assert not rooms[3].is_available_for_dates(date(2030, 1, 1), date(2030, 1, 2))
+    assert Reservation.has_overlap(rooms[1].id, date(2030, 1, 13), date(2030, 1, 20))
+
+
+def test_available_rooms_is_a_single_query(app):
+    _seed()
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        Room.get_available_rooms_for_dates(date(2030, 1, 11), date(2030, 1, 13))
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert len(statements) == 1
+    assert 'NOT (EXISTS' in statements[0]
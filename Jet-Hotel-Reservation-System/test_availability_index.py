@@ -0,0 +1,175 @@
+import random
+import pytest
+from datetime import date, timedelta
+from sqlalchemy import insert
+from app import create_app
+from config import TestConfig
+from models import db, User, Room, Reservation
+from availability_index import availability_index, bump_version, current_version
+
+
+def _seed(room_count=20, reservation_count=200):
+    rng = random.Random(7)
+    user = User(full_name="Guest", email="guest@gmail.com", contact_info="123", password="x")
+    db.session.add(user)
+    db.session.add_all([Room(name=f"Room {i}", price=100.0, available=i % 7 != 0) for i in range(room_count)])
+    db.session.commit()
+    start = date.today()
+    booked = {}
+    for _ in range(reservation_count):
+        room_id = rng.randrange(1, room_count + 1)
+        check_in = start + timedelta(days=rng.randrange(120))
+        check_out = check_in + timedelta(days=rng.randrange(1, 6))
+        # Room-night inventory rejects double bookings, so only keep free stays
+        if any(ci < check_out and co > check_in for ci, co in booked.get(room_id, [])):
+            continue
+        booked.setdefault(room_id, []).append((check_in, check_out))
+        db.session.add(Reservation(user_id=user.id, room_id=room_id, check_in=check_in, check_out=check_out))
+    db.session.commit()
+    return rng
+
+
+def _assert_matches_sql(rng, samples=200):
+    start = date.today()
+    for _ in range(samples):
+        check_in = start + timedelta(days=rng.randrange(130))
+        check_out = check_in + timedelta(days=rng.randrange(1, 10))
+        sql = {room.id for room in Room.get_available_rooms_for_dates(check_in, check_out)}
+        assert availability_index.free_room_ids(check_in, check_out, max_age=0) == sql
+        for room_id in (1, 2, 3):
+            assert availability_index.has_overlap(room_id, check_in, check_out) == \
+                Reservation.has_overlap(room_id, check_in, check_out)
+
+
+def test_index_matches_sql_path(app):
+    rng = _seed()
+    availability_index.load()
+    _assert_matches_sql(rng)
+
+
+def test_version_row_is_created_with_the_table(app):
+    assert current_version(db.session) == 0
+    _seed()
+    availability_index.load()
+    version = availability_index.version
+    reservation = Reservation.query.first()
+    reservation.check_out += timedelta(days=1)
+    db.session.commit()
+    # Bumped in the same transaction as the write, and applied without a reload
+    assert current_version(db.session) == availability_index.version == version + 1
+    assert availability_index.loaded
+
+
+def test_failed_version_bump_rolls_the_write_back(app, monkeypatch):
+    _seed()
+    availability_index.load()
+    version = availability_index.version
+    reservation = Reservation.query.first()
+    check_out = reservation.check_out
+
+    def fail(connection):
+        raise RuntimeError("version row unavailable")
+    monkeypatch.setattr('availability_index.bump_version', fail)
+    reservation.check_out += timedelta(days=1)
+    with pytest.raises(RuntimeError):
+        db.session.commit()
+    db.session.rollback()
+    # Neither the write nor the index change survived
+    assert db.session.get(Reservation, reservation.id).check_out == check_out
+    assert current_version(db.session) == availability_index.version == version
+
+
+def test_index_follows_session_writes(app):
+    rng = _seed()
+    availability_index.load()
+
+    # Insert, move and delete through the ORM
+    reservation = Reservation(user_id=1, room_id=2, check_in=date.today() + timedelta(days=200),
+                              check_out=date.today() + timedelta(days=203))
+    db.session.add(reservation)
+    db.session.commit()
+    assert availability_index.has_overlap(2, date.today() + timedelta(days=201), date.today() + timedelta(days=202))
+
+    reservation.room_id = 3
+    db.session.commit()
+    assert not availability_index.has_overlap(2, date.today() + timedelta(days=201), date.today() + timedelta(days=202))
+    assert availability_index.has_overlap(3, date.today() + timedelta(days=201), date.today() + timedelta(days=202))
+
+    db.session.get(Room, 4).available = False
+    db.session.delete(Reservation.query.first())
+    db.session.commit()
+    # Applied incrementally, no reload needed
+    assert availability_index.loaded
+    assert availability_index.version == current_version(db.session)
+    _assert_matches_sql(rng)
+
+
+def test_index_reloads_after_foreign_write(app):
+    rng = _seed()
+    availability_index.load()
+
+    # Another worker writes without going through our session events
+    db.session.execute(insert(Reservation), [{
+        'user_id': 1, 'room_id': 5, 'check_in': date.today() + timedelta(days=300),
+        'check_out': date.today() + timedelta(days=305), 'status': 'Booked',
+    }])
+    bump_version(db.session.connection())
+    db.session.commit()
+
+    assert availability_index.has_overlap(5, date.today() + timedelta(days=301), date.today() + timedelta(days=302), max_age=0)
+    _assert_matches_sql(rng)
+
+
+def _nearest_by_probing(check_in, nights, window, limit):
+    """One overlap probe per room per candidate date, the way guests retry by hand"""
+    length = timedelta(days=nights)
+    found = []
+    for room in Room.query.filter(Room.available.is_(True)):
+        for offset in sorted(range(-window, window + 1), key=lambda offset: (abs(offset), offset)):
+            start = check_in + timedelta(days=offset)
+            if start >= date.today() and not Reservation.has_overlap(room.id, start, start + length):
+                found.append((abs(offset), start, room.id))
+                break
+    return [(room_id, start, start + length) for _, start, room_id in sorted(found)[:limit]]
+
+
+def test_nearest_stays_match_probing(app):
+    rng = _seed(reservation_count=400)
+    for _ in range(60):
+        check_in = date.today() + timedelta(days=rng.randrange(-3, 130))
+        nights = rng.randrange(1, 12)
+        expected = _nearest_by_probing(check_in, nights, 7, 6)
+        assert availability_index.nearest_stays(check_in, check_in + timedelta(days=nights), max_age=0) == expected
+
+        # Same answer from the database when the index cannot serve the window
+        horizon = availability_index.horizon
+        availability_index.horizon = date.max
+        try:
+            assert availability_index.nearest_stays(check_in, check_in + timedelta(days=nights),
+                                                    max_age=float('inf')) == expected
+        finally:
+            availability_index.horizon = horizon
+
+
+def test_home_offers_nearest_stays_when_nothing_is_free():
+    app = create_app(TestConfig)
+    availability_index.clear()
+    with app.app_context():
+        db.create_all()
+        try:
+            db.session.add(User(full_name="Guest", email="guest@gmail.com", contact_info="123", password="x"))
+            db.session.add(Room(name="Suite", price=250.0))
+            db.session.commit()
+            day = lambda n: date.today() + timedelta(days=n)
+            db.session.add(Reservation(user_id=1, room_id=1, check_in=day(10), check_out=day(12)))
+            db.session.commit()
+
+            page = app.test_client().get(f'/?check_in={day(10)}&check_out={day(12)}').get_data(as_text=True)
+            assert 'The nearest available stays' in page
+            assert f'{day(8)} to {day(10)}' in page
+            assert f'{day(12)} to {day(14)}' not in page   # One stay per room, earlier wins the tie
+            page = app.test_client().get(f'/?check_in={day(12)}&check_out={day(14)}').get_data(as_text=True)
+            assert 'The nearest available stays' not in page
+        finally:
+            db.session.remove()
+            db.drop_all()
@@ -0,0 +1,25 @@
+from bench_suite import generate, scenarios, run_scenario
+from models import db, Reservation, RoomNight, Transaction, Notification
+from instrumentation import init_app
+
+
+def test_generated_data_is_consistent(app):
+    counts = generate(db, rooms=5, users=20, reservations=200, seed=7)
+    assert counts['reservations'] == Reservation.query.count() == 200
+    assert counts['transactions'] == Transaction.query.count() == 200
+    assert counts['notifications'] == Notification.query.count() == 400
+    # Every night of every stay made it past the unique (room_id, night) constraint, so no stays overlap
+    expected_nights = sum((r.check_out - r.check_in).days for r in Reservation.query)
+    assert RoomNight.query.count() == expected_nights == counts['room_nights']
+
+
+def test_scenario_reports_percentiles_and_queries(app):
+    init_app(app)
+    app.add_url_rule('/transactions', 'transactions', lambda: 'ok')
+    generate(db, rooms=2, users=5, reservations=10)
+    _, request = scenarios(5, 2)['transactions']
+    stats = run_scenario(app, lambda client, rng: None, request, requests=20, concurrency=2, seed=1)
+    assert stats['requests'] == 20
+    assert stats['errors'] == 0
+    assert stats['p50_ms'] <= stats['p95_ms'] <= stats['p99_ms']
+    assert stats['queries_per_request'] == 0
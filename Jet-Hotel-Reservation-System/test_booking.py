@@ -0,0 +1,124 @@
+import random
+import threading
+import time
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from models import db, User, Room, Reservation, RoomNight, Transaction, Notification, OutboxMessage
+from availability_index import availability_index
+import booking
+from booking import book_room, book_rooms, RoomUnavailable
+
+
+def _seed():
+    db.session.add_all([User(full_name=f"Guest {i}", email=f"guest{i}@gmail.com", contact_info="123", password="x")
+                        for i in range(8)])
+    db.session.add(Room(name="Suite", price=250.0))
+    db.session.commit()
+
+
+def test_book_room_writes_everything_in_one_transaction(app):
+    _seed()
+    user, room = db.session.get(User, 1), db.session.get(Room, 1)
+    reservation, transaction = book_room(user, room, date(2030, 1, 10), date(2030, 1, 13))
+
+    assert transaction.amount == 750.0
+    assert [rn.night for rn in reservation.room_nights] == [date(2030, 1, 10), date(2030, 1, 11), date(2030, 1, 12)]
+    assert Notification.query.count() == 2
+    assert OutboxMessage.query.count() == 1
+
+    with pytest.raises(RoomUnavailable):
+        book_room(db.session.get(User, 2), room, date(2030, 1, 12), date(2030, 1, 14))
+    # Nothing from the rejected attempt survives
+    assert (Reservation.query.count(), Transaction.query.count(), Notification.query.count()) == (1, 1, 2)
+
+
+def test_only_room_night_clashes_read_as_unavailable(app, monkeypatch):
+    _seed()
+    user, room = db.session.get(User, 1), db.session.get(Room, 1)
+    # Some other constraint fails in the same transaction: not a booking conflict
+    monkeypatch.setattr(booking, 'enqueue_email', lambda **kwargs: db.session.add(
+        User(id=1, full_name="Clash", email="clash@gmail.com", contact_info="123", password="x")))
+    with pytest.raises(IntegrityError):
+        book_room(user, room, date(2030, 1, 10), date(2030, 1, 13))
+    assert Reservation.query.count() == 0
+
+
+def test_concurrent_bookings_never_double_book(file_app, monkeypatch):
+    _seed()
+    # Skip the in-memory pre-check so every attempt races at the database
+    monkeypatch.setattr(availability_index, 'has_overlap', lambda *args, **kwargs: False)
+    threads, attempts_per_thread = 8, 15
+    results = {'booked': 0, 'rejected': 0, 'busy': 0}
+    lock = threading.Lock()
+
+    def guest(user_id):
+        rng = random.Random(user_id)
+        with file_app.app_context():
+            user, room = db.session.get(User, user_id), db.session.get(Room, 1)
+            for _ in range(attempts_per_thread):
+                check_in = date(2030, 1, 1) + timedelta(days=rng.randrange(30))
+                outcome = 'booked'
+                try:
+                    book_room(user, room, check_in, check_in + timedelta(days=rng.randrange(1, 4)))
+                except RoomUnavailable:
+                    outcome = 'rejected'
+                except OperationalError:
+                    # SQLite lock timeout; MySQL would queue on the row lock instead
+                    db.session.rollback()
+                    outcome = 'busy'
+                with lock:
+                    results[outcome] += 1
+            db.session.remove()
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=guest, args=(i + 1,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    stays = sorted((r.check_in, r.check_out) for r in Reservation.query.filter_by(room_id=1))
+    assert len(stays) == results['booked'] > 0
+    for (_, previous_check_out), (check_in, _) in zip(stays, stays[1:]):
+        assert previous_check_out <= check_in, "double booking"
+    attempts = threads * attempts_per_thread
+    print(f"\n{attempts} attempts, {results['booked']} booked, {results['rejected']} rejected, "
+          f"{results['busy']} busy, "
+          f"{attempts / elapsed:.0f} attempts/s, {results['booked'] / elapsed:.0f} bookings/s")
+
+
+def test_group_booking_is_all_or_nothing(app):
+    _seed()
+    db.session.add_all([Room(name=f"Room {i}", price=100.0) for i in range(2, 6)])
+    db.session.commit()
+    user = db.session.get(User, 1)
+    book_room(db.session.get(User, 2), db.session.get(Room, 3), date(2030, 2, 2), date(2030, 2, 4))
+
+    items = [(room_id, date(2030, 2, 1), date(2030, 2, 3)) for room_id in (2, 3, 4)]
+    with pytest.raises(RoomUnavailable) as excinfo:
+        book_rooms(user, items)
+    assert excinfo.value.conflicts == [(3, date(2030, 2, 1), date(2030, 2, 3))]
+    assert Reservation.query.count() == 1
+
+    # Overlapping items inside one request are rejected too, adjacent in date order or not
+    with pytest.raises(RoomUnavailable):
+        book_rooms(user, [(4, date(2030, 2, 1), date(2030, 2, 3)), (4, date(2030, 2, 2), date(2030, 2, 5))])
+    with pytest.raises(RoomUnavailable) as excinfo:
+        book_rooms(user, [(4, date(2030, 3, 1), date(2030, 3, 10)), (4, date(2030, 3, 2), date(2030, 3, 3)),
+                          (4, date(2030, 3, 5), date(2030, 3, 6)), (5, date(2030, 3, 5), date(2030, 3, 6))])
+    assert excinfo.value.conflicts == [(4, date(2030, 3, 2), date(2030, 3, 3)), (4, date(2030, 3, 5), date(2030, 3, 6))]
+
+    reservation_ids = book_rooms(user, [(2, date(2030, 2, 1), date(2030, 2, 3)), (4, date(2030, 2, 1), date(2030, 2, 4)),
+                                        (5, date(2030, 2, 1), date(2030, 2, 2))])
+    reservations = [db.session.get(Reservation, reservation_id) for reservation_id in reservation_ids]
+    assert [(r.room_id, r.user_id) for r in reservations] == [(2, 1), (4, 1), (5, 1)]
+    assert [t.amount for r in reservations for t in r.transactions] == [200.0, 300.0, 100.0]
+    assert RoomNight.query.filter(RoomNight.reservation_id.in_(reservation_ids)).count() == 6
+    assert OutboxMessage.query.filter_by(recipients=user.email).count() == 1
+    # The in-memory index saw the bulk insert
+    assert availability_index.has_overlap(4, date(2030, 2, 3), date(2030, 2, 4))
+
@@ -0,0 +1,92 @@
+from datetime import date
+
+from sqlalchemy import event
+
+from app import create_app
+from config import TestConfig
+from models import (db, User, Room, Reservation, RoomNight, Transaction, Notification, OutboxMessage,
+                    DailyRoomStats)
+from availability_index import availability_index
+from projections import projections
+from booking import book_rooms
+import bulk_admin
+
+
+def _seed():
+    db.session.add_all([User(full_name=f"Guest {i}", email=f"guest{i}@gmail.com", contact_info="123", password="x")
+                        for i in range(3)])
+    db.session.add_all([Room(name=f"Room {i}", price=100.0) for i in range(6)])
+    db.session.commit()
+    # Each guest holds two nights in every room, on their own dates
+    for user_id in (1, 2, 3):
+        book_rooms(db.session.get(User, user_id),
+                   [(room_id, date(2030, 3, 2 * user_id), date(2030, 3, 2 * user_id + 2)) for room_id in range(1, 7)])
+    Notification.query.delete()
+    OutboxMessage.query.delete()
+    db.session.commit()
+
+
+def _nights_sold():
+    return db.session.query(db.func.sum(DailyRoomStats.nights_sold)).scalar()
+
+
+def test_bulk_confirm_then_cancel_a_wing(app):
+    _seed()
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        result = bulk_admin.run('confirm', bulk_admin.reservation_filter(room_ids=[1, 2, 3]), batch_size=4)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert result['updated'] == 9
+    assert [batch['reservations'] for batch in result['batches']] == [4, 4, 1]
+    assert all(batch['seconds'] >= 0 for batch in result['batches'])
+    # A fixed set of statements per batch, whatever its size
+    assert len(statements) <= 3 * 12 + 1
+    assert Reservation.query.filter_by(status="Confirmed").count() == 9
+    assert Transaction.query.filter_by(status="Paid").count() == 9
+    assert db.session.query(db.func.sum(DailyRoomStats.revenue)).scalar() == 9 * 200.0
+    assert Notification.query.filter_by(user_id=None).count() == 3
+    # One email per guest per batch: guests (1, 2), (2, 3) and (3)
+    assert OutboxMessage.query.count() == 5
+    assert bulk_admin.run('confirm', bulk_admin.reservation_filter(room_ids=[1, 2, 3]))['updated'] == 0
+
+    # Close the wing from March 4th: the first guest's stays (2nd to 4th) are untouched
+    result = bulk_admin.run('cancel', bulk_admin.reservation_filter(room_ids=[1, 2, 3], start=date(2030, 3, 4)))
+    assert result['updated'] == 6
+    assert {(r.room_id, r.user_id) for r in Reservation.query.filter(Reservation.room_id <= 3)} == \
+        {(1, 1), (2, 1), (3, 1)}
+    assert Transaction.query.filter(Transaction.reservation_id.is_(None), Transaction.status == "Cancelled").count() == 6
+    assert RoomNight.query.count() == 2 * 12
+    assert _nights_sold() == 2 * 12
+    assert db.session.query(db.func.sum(DailyRoomStats.revenue)).scalar() == 3 * 200.0
+    assert availability_index.is_available(2, date(2030, 3, 4), date(2030, 3, 8))
+
+
+def test_bulk_endpoint_and_single_cancel():
+    app = create_app(TestConfig)
+    availability_index.clear()
+    projections.clear()
+    with app.app_context():
+        db.create_all()
+        try:
+            _seed()
+            client = app.test_client()
+            assert client.post('/admin/reservations/bulk', json={'action': 'cancel', 'status': 'Pending'}).status_code == 403
+            with client.session_transaction() as session:
+                session['user_id'], session['is_admin'] = 1, True
+
+            assert client.post('/admin/reservations/bulk', json={'action': 'cancel'}).status_code == 400
+            assert client.post('/admin/reservations/bulk', json={'action': 'drop', 'status': 'Pending'}).status_code == 400
+            response = client.post('/admin/reservations/bulk', json={'action': 'cancel', 'room_ids': [6],
+                                                                     'start': '2030-03-01', 'end': '2030-03-05'})
+            assert response.get_json()['updated'] == 2
+
+            # The single-reservation view can now detach the transaction too
+            assert client.post('/cancel_reservation/1').status_code == 302
+            assert db.session.get(Reservation, 1) is None
+            assert Transaction.query.filter(Transaction.reservation_id.is_(None)).count() == 3
+        finally:
+            db.session.remove()
+            db.drop_all()
@@ -0,0 +1,84 @@
+from datetime import date
+
+from sqlalchemy import event
+
+from models import db, Room, Reservation, User, CatalogVersion
+from catalog import catalog_cache, bump_catalog_version, current_catalog_version
+
+
+def _render_counter():
+    calls = []
+
+    def render():
+        calls.append(1)
+        return f"page {len(calls)}"
+    return render, calls
+
+
+def test_page_is_rendered_once_per_version(app):
+    catalog_cache.clear()
+    db.session.add(Room(name="Deluxe Room", price=150.0, description="Deluxe", image="deluxe.jpg"))
+    db.session.commit()
+    render, calls = _render_counter()
+
+    first = catalog_cache.page(catalog_cache.page_key(db.session), render)
+    again = catalog_cache.page(catalog_cache.page_key(db.session), render)
+    assert again is first
+    assert len(calls) == 1
+
+    # Editing the catalog bumps the version in the same transaction and expires the local check
+    Room.query.one().price = 175.0
+    bump_catalog_version(db.session)
+    db.session.commit()
+    assert current_catalog_version(db.session) == 1
+    edited = catalog_cache.page(catalog_cache.page_key(db.session), render)
+    assert edited.html == "page 2"
+    assert edited.etag != first.etag
+
+
+def test_bookings_change_the_page_key(app):
+    catalog_cache.clear()
+    db.session.add(User(full_name="Guest", email="guest@gmail.com", contact_info="123", password="x"))
+    db.session.add(Room(name="Deluxe Room", price=150.0, description="Deluxe", image="deluxe.jpg"))
+    db.session.commit()
+    before = catalog_cache.page_key(db.session)
+
+    db.session.add(Reservation(user_id=1, room_id=1, check_in=date.today(), check_out=date(2099, 1, 1)))
+    db.session.commit()
+    after = catalog_cache.page_key(db.session)
+    assert after[0] == before[0]
+    assert after[1] != before[1]
+
+
+def test_version_check_is_one_query(app):
+    catalog_cache.clear()
+    db.session.add(Room(name="Deluxe Room", price=150.0, description="Deluxe", image="deluxe.jpg"))
+    db.session.commit()
+    key = catalog_cache.page_key(db.session)
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        assert catalog_cache.page_key(db.session, max_age=0) == key
+        assert catalog_cache.page_key(db.session) == key
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    # Both versions in one SELECT when the check is due, nothing in between
+    assert len(statements) == 1
+
+
+def test_rolled_back_bump_is_not_visible(app):
+    catalog_cache.clear()
+    bump_catalog_version(db.session)
+    db.session.rollback()
+    assert current_catalog_version(db.session) == 0
+
+
+def test_catalog_version_row_is_created_with_the_table(app):
+    # Bumps only UPDATE, so the row has to be there before the first write
+    assert current_catalog_version(db.session) == 0
+    assert db.session.get(CatalogVersion, 1).version == 0
+    bump_catalog_version(db.session)
+    db.session.commit()
+    assert current_catalog_version(db.session) == 1
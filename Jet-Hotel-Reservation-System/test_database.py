@@ -0,0 +1,71 @@
+from flask import g
+
+from conftest import _make_app
+from database import engine_config, read_only, remember_writes, REPLICA
+from models import db, Room
+
+
+def test_engine_config_from_environment():
+    config = engine_config({
+        'DATABASE_URL': 'mysql+pymysql://app@db-primary/hotel_db',
+        'REPLICA_DATABASE_URL': 'mysql+pymysql://app@db-replica/hotel_db',
+        'DB_POOL_SIZE': '4', 'DB_MAX_OVERFLOW': '2', 'DB_POOL_RECYCLE': '600', 'DB_POOL_PRE_PING': 'false',
+    })
+    assert config['SQLALCHEMY_DATABASE_URI'] == 'mysql+pymysql://app@db-primary/hotel_db'
+    assert config['SQLALCHEMY_ENGINE_OPTIONS'] == {'pool_pre_ping': False, 'pool_recycle': 600, 'pool_size': 4,
+                                                   'max_overflow': 2, 'pool_timeout': 30}
+    assert config['SQLALCHEMY_BINDS'][REPLICA]['url'] == 'mysql+pymysql://app@db-replica/hotel_db'
+    # No sizing options for SQLite pools, and no replica unless configured
+    sqlite = engine_config({'DATABASE_URL': 'sqlite://'})
+    assert 'pool_size' not in sqlite['SQLALCHEMY_ENGINE_OPTIONS']
+    assert sqlite['SQLALCHEMY_BINDS'] == {}
+
+
+def test_read_only_views_use_replica_until_client_writes(tmp_path):
+    try:
+        _check_replica_routing(tmp_path)
+    finally:
+        # init_app registers a metadata per bind on the shared db; keep other tests' create_all off it
+        db.metadatas.pop(REPLICA, None)
+
+
+def _check_replica_routing(tmp_path):
+    # Two SQLite files stand in for the primary and a lagging replica
+    config = engine_config({'DATABASE_URL': f"sqlite:///{tmp_path / 'primary.db'}",
+                            'REPLICA_DATABASE_URL': f"sqlite:///{tmp_path / 'replica.db'}"})
+    app = _make_app(config.pop('SQLALCHEMY_DATABASE_URI'), **config)
+    remember_writes(app)
+
+    @app.route('/rooms')
+    @read_only
+    def room_names():
+        return ','.join(room.name for room in Room.query.order_by(Room.id))
+
+    @app.route('/rooms/add', methods=['POST'])
+    def add():
+        db.session.add(Room(name="Primary Suite", price=300.0, description="", image="suite.jpg"))
+        db.session.commit()
+        return 'ok'
+
+    with app.app_context():
+        db.create_all()
+        db.metadata.create_all(db.engines[REPLICA])
+        with db.engines[REPLICA].begin() as connection:
+            connection.execute(Room.__table__.insert().values(name="Replica Room", price=100.0, available=True))
+
+    client = app.test_client()
+    assert client.get('/rooms').get_data(as_text=True) == "Replica Room"
+    client.post('/rooms/add')
+    # Read-your-writes: this client now reads from the primary
+    assert client.get('/rooms').get_data(as_text=True) == "Primary Suite"
+    # Other clients still use the replica
+    assert app.test_client().get('/rooms').get_data(as_text=True) == "Replica Room"
+
+    with app.test_request_context():
+        g.db_read_only = True
+        # Writes go to the primary even inside a read-only view
+        db.session.add(Room(name="Second Suite", price=300.0, description="", image="suite.jpg"))
+        db.session.commit()
+        assert g.db_wrote
+    with app.app_context():
+        assert [r.name for r in Room.query.order_by(Room.id)] == ["Primary Suite", "Second Suite"]
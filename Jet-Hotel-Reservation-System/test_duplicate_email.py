@@ -2,6 +2,11 @@ from app import app
 from models import db, User
 from werkzeug.security import generate_password_hash
 
+def setup_module():
+    # The schema is created by `flask init-db`, not on import
+    with app.app_context():
+        db.create_all()
+
 def test_duplicate_email_validation():
     with app.test_client() as client:
         with app.app_context():
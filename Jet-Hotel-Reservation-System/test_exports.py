@@ -0,0 +1,84 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+
+from sqlalchemy import event, insert
+
+import exports
+from app import create_app
+from config import TestConfig
+from models import db, User, Room, Reservation, Transaction, Notification
+
+
+def _seed(count):
+    db.session.add(User(full_name="Guest", email="guest@gmail.com", contact_info="123", password="x"))
+    db.session.add(Room(name="Suite", price=250.0))
+    db.session.execute(insert(Reservation), [
+        {'id': i, 'user_id': 1, 'room_id': 1, 'check_in': date(2030, 1, 1), 'check_out': date(2030, 1, 2),
+         'status': "Confirmed" if i % 2 else "Pending", 'created_at': datetime(2026, 1 + i % 3, 15, 12, 0)}
+        for i in range(1, count + 1)])
+    db.session.execute(insert(Transaction), [
+        {'reservation_id': i, 'amount': 250.0, 'status': "Paid", 'created_at': datetime(2026, 1, 15)}
+        for i in range(1, count + 1)])
+    db.session.add(Notification(user_id=1, message='Said "hi", twice', is_read=True))
+    db.session.commit()
+
+
+def test_csv_streams_in_batches_after_the_header(app, monkeypatch):
+    _seed(2500)
+    monkeypatch.setattr(exports, 'BATCH_SIZE', 1000)
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        chunks = exports.stream('reservations', 'csv')
+        header = next(chunks)
+        assert statements == []   # First bytes go out before the query runs
+        rest = list(chunks)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+    assert header.strip() == ','.join(exports.EXPORTS['reservations'].headers)
+    assert len(rest) == 3
+    rows = list(csv.DictReader(io.StringIO(header + ''.join(rest))))
+    assert len(rows) == 2500
+    assert rows[0]['email'] == "guest@gmail.com" and rows[0]['room'] == "Suite"
+
+
+def test_filters_and_ndjson(app):
+    _seed(30)
+    march = list(exports.stream('reservations', 'csv', start=date(2026, 3, 1), end=date(2026, 3, 31),
+                                status="Confirmed"))
+    rows = list(csv.DictReader(io.StringIO(''.join(march))))
+    assert len(rows) == 5
+    assert all(row['status'] == "Confirmed" and row['created_at'].startswith('2026-03') for row in rows)
+
+    lines = ''.join(exports.stream('notifications', 'ndjson', status='read')).splitlines()
+    assert [json.loads(line)['message'] for line in lines] == ['Said "hi", twice']
+    assert list(exports.stream('notifications', 'ndjson', status='unread')) == []
+
+
+def test_export_endpoint():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        try:
+            _seed(3)
+            client = app.test_client()
+            assert client.get('/admin/export/transactions').status_code == 403
+            with client.session_transaction() as session:
+                session['user_id'], session['is_admin'] = 1, True
+
+            response = client.get('/admin/export/transactions?format=ndjson&start=2026-01-01')
+            assert response.status_code == 200
+            assert response.is_streamed
+            assert response.mimetype == 'application/x-ndjson'
+            assert 'attachment; filename="transactions-' in response.headers['Content-Disposition']
+            assert [json.loads(line)['amount'] for line in response.get_data(as_text=True).splitlines()] == [250.0] * 3
+
+            assert client.get('/admin/export/users').status_code == 404
+            assert client.get('/admin/export/reservations?start=January').status_code == 400
+        finally:
+            db.session.remove()
+            db.drop_all()
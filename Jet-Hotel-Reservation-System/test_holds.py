@@ -0,0 +1,76 @@
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event, update
+
+from models import db, User, Room, Reservation, RoomNight, Transaction, Notification, DailyRoomStats
+from availability_index import availability_index
+from booking import book_room, book_rooms
+import holds
+
+
+def _seed(rooms=1):
+    db.session.add_all([User(full_name=f"Guest {i}", email=f"guest{i}@gmail.com", contact_info="123", password="x")
+                        for i in range(2)])
+    db.session.add_all([Room(name=f"Room {i}", price=100.0) for i in range(rooms)])
+    db.session.commit()
+
+
+def _lapse(*reservation_ids):
+    db.session.execute(update(Reservation).where(Reservation.id.in_(reservation_ids))
+                       .values(expires_at=datetime.utcnow() - timedelta(minutes=1)))
+    db.session.commit()
+    availability_index.clear()
+
+
+def test_lapsed_hold_frees_the_room_for_the_next_guest(app):
+    _seed()
+    room = db.session.get(Room, 1)
+    first, _ = book_room(db.session.get(User, 1), room, date(2030, 1, 10), date(2030, 1, 12))
+    assert first.expires_at > datetime.utcnow()
+    assert not room.is_available_for_dates(date(2030, 1, 11), date(2030, 1, 12))
+
+    _lapse(first.id)
+    # Both availability paths ignore the lapsed hold before any sweep
+    assert room.is_available_for_dates(date(2030, 1, 11), date(2030, 1, 12))
+    assert not Reservation.has_overlap(1, date(2030, 1, 11), date(2030, 1, 12))
+
+    second, _ = book_room(db.session.get(User, 2), room, date(2030, 1, 11), date(2030, 1, 13))
+    db.session.expire_all()
+    assert first.status == "Expired" and first.room_nights == []
+    assert first.transactions[0].status == "Cancelled"
+    assert [rn.night for rn in second.room_nights] == [date(2030, 1, 11), date(2030, 1, 12)]
+    assert db.session.get(DailyRoomStats, (date(2030, 1, 10), 1)).nights_sold == 0
+
+
+def test_sweep_expires_lapsed_holds_in_bulk(app):
+    _seed(rooms=40)
+    guest = db.session.get(User, 1)
+    ids = book_rooms(guest, [(room_id, date(2030, 2, 1), date(2030, 2, 3)) for room_id in range(1, 41)])
+    _lapse(*ids[:30])
+    paid = db.session.get(Reservation, ids[0])
+    paid.expires_at = None   # Payment confirmed before the deadline
+    db.session.commit()
+    Notification.query.delete()
+    db.session.commit()
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        assert holds.sweep(batch_size=10) == 29
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    # A fixed handful of statements per batch of 10 (journal included), not a round trip per hold
+    assert len(statements) < 3 * 14
+
+    expired = [r.id for r in Reservation.query.filter_by(status="Expired").order_by(Reservation.id)]
+    assert expired == ids[1:30]
+    assert RoomNight.query.filter(RoomNight.reservation_id.in_(expired)).count() == 0
+    assert RoomNight.query.count() == 2 * 11
+    assert Transaction.query.filter_by(status="Cancelled").count() == 29
+    assert Notification.query.filter_by(user_id=guest.id).count() == 29
+    assert Notification.query.filter_by(user_id=None).count() == 3
+    assert db.session.query(db.func.sum(DailyRoomStats.nights_sold)).scalar() == 2 * 11
+    assert availability_index.is_available(30, date(2030, 2, 1), date(2030, 2, 3))
+    assert not availability_index.is_available(31, date(2030, 2, 1), date(2030, 2, 3))
+    assert holds.sweep() == 0
@@ -0,0 +1,71 @@
+import io
+import os
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+import images
+
+pytest.importorskip('PIL')
+
+
+@pytest.fixture
+def image_app(app, tmp_path):
+    app.config['IMAGE_CACHE_DIR'] = str(tmp_path)
+    app.add_url_rule('/images/<digest>/<int:width>/<fmt>/<filename>', 'hotel.room_image', lambda **kwargs: '')
+    return app
+
+
+def test_derivatives_are_resized_hashed_and_never_upscaled(image_app, tmp_path):
+    from PIL import Image
+
+    source = images.source_path('standard.jpg')   # 800px wide
+    assert images.widths_for(source) == [320, 480, 640, 800]
+    assert images.generate_all('standard.jpg') == 8
+
+    digest = images.source_digest(source)
+    webp = tmp_path / images.derivative_name('standard.jpg', digest, 320, 'webp')
+    with Image.open(webp) as thumbnail:
+        assert thumbnail.format == 'WEBP'
+        assert thumbnail.width == 320
+    assert os.path.getsize(webp) < os.path.getsize(source) / 4
+
+    # Only the advertised widths are generated
+    assert images.generate('standard.jpg', 1200, 'jpg') is None
+    assert images.generate('standard.jpg', 333, 'jpg') is None
+    assert images.generate('missing.jpg', 320, 'jpg') is None
+
+
+def test_srcset_points_at_content_hashed_urls(image_app):
+    with image_app.test_request_context():
+        srcset = images.image_srcset('deluxe.jpg', 'webp')
+        digest = images.source_digest(images.source_path('deluxe.jpg'))
+        assert srcset.split(', ') == [f"/images/{digest}/{width}/webp/deluxe.jpg {width}w" for width in images.WIDTHS]
+        # Unknown photos fall back to the plain static URL
+        assert images.image_srcset('missing.jpg') == ''
+        assert images.image_url('missing.jpg', 320) == '/static/css/uploads/missing.jpg'
+
+
+def test_narrow_photos_and_uploads_get_their_own_names(image_app, tmp_path, monkeypatch):
+    from PIL import Image
+
+    uploads = tmp_path / 'uploads'
+    uploads.mkdir()
+    monkeypatch.setattr(images, 'upload_dir', lambda: str(uploads))
+
+    def upload(width):
+        data = io.BytesIO()
+        Image.new('RGB', (width, 300)).save(data, 'JPEG')
+        data.seek(0)
+        return images.save_upload(FileStorage(data, filename='room.jpg'))
+
+    narrow = upload(500)
+    wide = upload(900)
+    # Same uploaded name, different photos: both kept
+    assert narrow != wide and {narrow, wide} == set(os.listdir(uploads))
+
+    with image_app.test_request_context():
+        digest = images.source_digest(images.source_path(narrow))
+        # No 640px derivative exists for a 500px photo; the URL points at the nearest one
+        assert images.image_url(narrow, 640) == f"/images/{digest}/500/jpg/{narrow}"
+    assert images.generate(narrow, 500, 'jpg') is not None
@@ -0,0 +1,94 @@
+import io
+from datetime import date, datetime
+
+from models import db, User, Room, Reservation, RoomNight, Transaction, DailyRoomStats
+from availability_index import availability_index
+from booking import book_room
+import holds
+import imports
+
+
+def _csv(*lines):
+    return io.StringIO('\n'.join(lines) + '\n')
+
+
+def test_import_rooms_reports_bad_rows(app):
+    result = imports.import_rooms(_csv(
+        "name,price,description,available",
+        "Suite,250,Big,true",
+        ",100,No name,true",
+        "Standard,cheap,,true",
+        "Loft,180,,no",
+    ), batch_size=2)
+    assert result.imported == 2
+    assert result.rejected == [(3, "name is required"), (4, "price must be a number")]
+    assert [(r.name, r.available) for r in Room.query.order_by(Room.id)] == [("Suite", True), ("Loft", False)]
+
+
+def test_import_reservations_checks_overlaps_set_based(app):
+    db.session.add(User(full_name="Guest", email="guest@gmail.com", contact_info="123", password="x"))
+    db.session.add_all([Room(name="Suite", price=250.0), Room(name="Standard", price=100.0)])
+    db.session.commit()
+    book_room(db.session.get(User, 1), db.session.get(Room, 1), date(2030, 1, 10), date(2030, 1, 12))
+    assert availability_index.loaded
+
+    result = imports.import_reservations(_csv(
+        "email,room_id,check_in,check_out,status,amount",
+        "guest@gmail.com,1,2030-01-01,2030-01-05,Confirmed,1000",   # 2: fine
+        "guest@gmail.com,1,2030-01-11,2030-01-13,Confirmed,500",    # 3: overlaps the booking
+        "guest@gmail.com,1,2030-01-04,2030-01-06,Confirmed,",       # 4: overlaps line 2, same batch
+        "guest@gmail.com,2,2030-01-04,2030-01-06,Cancelled,",       # 5: cancelled stays hold no nights
+        "nobody@gmail.com,2,2030-01-04,2030-01-06,,",               # 6: unknown guest
+        "guest@gmail.com,2,2030-01-05,2030-01-04,,",                # 7: bad dates
+        "guest@gmail.com,2,2030-01-02,2030-01-05,,",                # 8: overlaps nothing (line 5 cancelled)
+        "guest@gmail.com,1,2030-01-05,2030-01-07,,",                # 9: starts as line 2 checks out
+    ), batch_size=4)
+
+    assert result.imported == 4
+    assert [line for line, _ in result.rejected] == [3, 4, 6, 7]
+    assert result.rejected[0][1] == "overlaps an existing reservation"
+    assert Reservation.query.count() == 5
+    assert RoomNight.query.count() == 2 + 4 + 3 + 2
+    assert [t.amount for t in Transaction.query.filter_by(status="Paid")] == [1000.0]
+
+    # The index, the rollups and the inventory all saw the import
+    assert availability_index.has_overlap(1, date(2030, 1, 6), date(2030, 1, 7))
+    assert not availability_index.has_overlap(2, date(2030, 1, 5), date(2030, 1, 6))
+    assert db.session.get(DailyRoomStats, (date(2030, 1, 2), 1)).revenue == 250.0
+    assert db.session.query(db.func.sum(DailyRoomStats.nights_sold)).scalar() == RoomNight.query.count()
+
+
+def test_import_reservations_rejects_unknown_statuses(app):
+    db.session.add(User(full_name="Guest", email="guest@gmail.com", contact_info="123", password="x"))
+    db.session.add(Room(name="Suite", price=250.0))
+    db.session.commit()
+
+    result = imports.import_reservations(_csv(
+        "email,room_id,check_in,check_out,status,amount,payment_status",
+        "guest@gmail.com,1,2030-01-01,2030-01-03,Checked Out,500,Paid",
+        "guest@gmail.com,1,2030-01-03,2030-01-05,Confirmed,500,Refunded",
+        "guest@gmail.com,1,2030-01-05,2030-01-07,Pending,500,Payment Confirmed",
+    ))
+    assert result.imported == 1
+    assert [line for line, _ in result.rejected] == [2, 3]
+    assert result.rejected[0][1].startswith("status must be one of Booked, Cancelled")
+    assert result.rejected[1][1].startswith("payment_status must be one of")
+
+
+def test_imported_pending_rows_are_holds_that_lapse(app):
+    db.session.add(User(full_name="Guest", email="guest@gmail.com", contact_info="123", password="x"))
+    db.session.add(Room(name="Suite", price=250.0))
+    db.session.commit()
+
+    result = imports.import_reservations(_csv(
+        "email,room_id,check_in,check_out,status,amount,payment_status,created_at",
+        "guest@gmail.com,1,2030-01-01,2030-01-03,Pending,500,Pending,2024-05-01T10:00:00",
+        "guest@gmail.com,1,2030-01-03,2030-01-05,Confirmed,500,Paid,2024-05-01T10:00:00",
+    ))
+    assert result.imported == 2
+    pending, confirmed = Reservation.query.order_by(Reservation.id)
+    assert pending.expires_at == datetime(2024, 5, 1, 10, 30) and confirmed.expires_at is None
+    assert not availability_index.has_overlap(1, date(2030, 1, 1), date(2030, 1, 2))
+    assert holds.sweep() == 1
+    assert db.session.get(Reservation, pending.id).status == "Expired"
+    assert RoomNight.query.count() == 2
@@ -0,0 +1,89 @@
+import logging
+import time
+from datetime import date
+
+from flask import Response, render_template_string
+from sqlalchemy.orm import joinedload
+
+import instrumentation
+from models import db, User, Room, Reservation
+
+
+def _seed():
+    db.session.add(User(full_name="Guest", email="guest@gmail.com", contact_info="123", password="x"))
+    db.session.add_all([Room(name=f"Room {i}", price=100.0, description="", image="") for i in range(6)])
+    db.session.flush()
+    db.session.add_all([Reservation(user_id=1, room_id=i + 1, check_in=date(2030, 1, 1), check_out=date(2030, 1, 3))
+                        for i in range(6)])
+    db.session.commit()
+
+
+def _routes(app):
+    template = "{% for r in reservations %}{{ r.room.name }} {% endfor %}"
+
+    @app.route('/lazy')
+    def lazy():
+        return render_template_string(template, reservations=Reservation.query.all())
+
+    @app.route('/eager')
+    def eager():
+        return render_template_string(template,
+                                      reservations=Reservation.query.options(joinedload(Reservation.room)).all())
+
+
+def test_lazy_loads_in_templates_are_flagged_as_n_plus_one(app, caplog):
+    instrumentation.metrics.clear()
+    instrumentation.init_app(app)
+    _routes(app)
+    _seed()
+    client = app.test_client()
+
+    with caplog.at_level(logging.WARNING):
+        eager = client.get('/eager')
+        assert not caplog.records
+        lazy = client.get('/lazy')
+    assert "Possible N+1 in lazy: 6 x SELECT room" in caplog.text
+    assert 'desc="1 queries"' in eager.headers['Server-Timing']
+    assert 'desc="7 queries"' in lazy.headers['Server-Timing']
+
+    with client.session_transaction() as session:
+        session['is_admin'] = True
+    text = client.get('/metrics').get_data(as_text=True)
+    assert 'n_plus_one_suspects_total{endpoint="lazy"} 1' in text
+    assert 'n_plus_one_suspects_total{endpoint="eager"}' not in text
+    assert 'http_requests_total{endpoint="lazy",method="GET",status="200"} 1' in text
+    assert 'db_statements_per_request_bucket{endpoint="lazy",le="5"} 0' in text
+    assert 'db_statements_per_request_bucket{endpoint="lazy",le="10"} 1' in text
+    assert 'http_request_duration_seconds_count{endpoint="eager",method="GET"} 1' in text
+    assert 'template_render_seconds_count{endpoint="lazy"} 1' in text
+
+
+def test_metrics_are_denied_by_default(app):
+    instrumentation.init_app(app)
+    client = app.test_client()
+    assert client.get('/metrics').status_code == 403
+    app.config['METRICS_TOKEN'] = 'scrape-me'
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 403
+    assert client.get('/metrics', headers={'Authorization': 'Bearer scrape-me'}).status_code == 200
+
+
+def test_streamed_responses_are_timed_to_the_last_chunk(app):
+    instrumentation.metrics.clear()
+    instrumentation.init_app(app)
+
+    @app.route('/slow-stream')
+    def slow_stream():
+        def chunks():
+            yield "a"
+            time.sleep(0.3)
+            yield "b"
+        return Response(chunks())
+
+    client = app.test_client()
+    response = client.get('/slow-stream')
+    assert response.get_data(as_text=True) == "ab"
+    # WSGI servers close the body once it is sent
+    response.close()
+    text = instrumentation.metrics.render()
+    assert 'http_request_duration_seconds_bucket{endpoint="slow_stream",method="GET",le="0.25"} 0' in text
+    assert 'http_request_duration_seconds_count{endpoint="slow_stream",method="GET"} 1' in text
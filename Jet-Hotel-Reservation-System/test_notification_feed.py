@@ -0,0 +1,56 @@
+import json
+import threading
+import time
+
+from models import db, User, Notification
+from notification_feed import broker, latest_id, unread_count, mark_read, stream_events
+
+
+def _seed():
+    db.session.add(User(full_name="Guest", email="guest@gmail.com", contact_info="123", password="x"))
+    db.session.add_all([Notification(user_id=1, message=f"Guest {i}") for i in range(3)])
+    db.session.add_all([Notification(user_id=None, message=f"Admin {i}") for i in range(2)])
+    db.session.commit()
+
+
+def test_unread_counts_and_bulk_mark_read(app):
+    _seed()
+    assert unread_count(1, False) == 3
+    assert unread_count(1, True) == 2
+
+    first_two = [n.id for n in Notification.query.filter_by(user_id=1).order_by(Notification.id).limit(2)]
+    assert mark_read(1, False, ids=first_two) == 2
+    assert unread_count(1, False) == 1
+    # Admin notifications are untouched by the guest's update
+    assert mark_read(1, True, up_to_id=latest_id(1, True)) == 2
+    assert unread_count(1, True) == 0
+    assert mark_read(1, False) == 1
+    assert unread_count(1, False) == 0
+
+
+def test_stream_yields_only_newer_notifications_for_the_recipient(app):
+    _seed()
+    app.config.update(NOTIFICATION_STREAM_SECONDS=0.3, NOTIFICATION_POLL_SECONDS=0.05)
+    after = Notification.query.filter_by(user_id=1).order_by(Notification.id).first().id
+
+    frames = list(stream_events(1, False, after))
+    events = [frame for frame in frames if frame.startswith('id: ')]
+    messages = [json.loads(frame.split('data: ', 1)[1])['message'] for frame in events]
+    assert messages == ["Guest 1", "Guest 2"]
+    # Browsers wait NOTIFICATION_RETRY_SECONDS before reconnecting, freeing the worker meanwhile
+    assert frames[0] == "retry: 10000\n\n"
+
+
+def test_commit_with_notification_wakes_waiting_streams(app):
+    generation = broker.generation
+    woken = []
+    waiter = threading.Thread(target=lambda: woken.append(broker.wait(generation, 5)))
+    waiter.start()
+    time.sleep(0.05)
+
+    started = time.monotonic()
+    db.session.add(Notification(user_id=None, message="Payment confirmed"))
+    db.session.commit()
+    waiter.join()
+    assert woken == [generation + 1]
+    assert time.monotonic() - started < 1
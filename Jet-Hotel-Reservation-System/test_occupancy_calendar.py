@@ -0,0 +1,49 @@
+import base64
+import random
+from datetime import date, timedelta
+
+import numpy as np
+
+from models import db, User, Room, Reservation
+from occupancy_calendar import month_grid, occupancy_matrix
+
+
+def test_matrix_matches_a_night_by_night_scan():
+    rng = random.Random(3)
+    first = date(2030, 2, 1)
+    stays = []
+    for room_id in range(1, 41):
+        day = first - timedelta(days=5)
+        while day < first + timedelta(days=35):
+            nights = rng.randint(1, 6)
+            stays.append((room_id, day, day + timedelta(days=nights)))
+            day += timedelta(days=nights + rng.randint(0, 4))
+    stays.append((99, first, first + timedelta(days=3)))   # room no longer exists
+
+    matrix = occupancy_matrix(list(range(1, 41)), stays, first, 28)
+    expected = [[any(room == room_id and check_in <= first + timedelta(days=i) < check_out
+                     for room, check_in, check_out in stays) for i in range(28)] for room_id in range(1, 41)]
+    assert matrix.tolist() == expected
+
+
+def test_month_grid_encodings(app):
+    db.session.add(User(full_name="Guest", email="guest@gmail.com", contact_info="123", password="x"))
+    db.session.add_all([Room(name="Suite", price=250.0), Room(name="Standard", price=100.0, available=False)])
+    db.session.flush()
+    db.session.add_all([
+        Reservation(user_id=1, room_id=1, check_in=date(2030, 1, 30), check_out=date(2030, 2, 3)),
+        Reservation(user_id=1, room_id=2, check_in=date(2030, 2, 27), check_out=date(2030, 3, 2)),
+        Reservation(user_id=1, room_id=2, check_in=date(2030, 2, 10), check_out=date(2030, 2, 12), status="Cancelled"),
+    ])
+    db.session.commit()
+
+    data = month_grid(2030, 2).to_json()
+    assert data['days'] == 28
+    assert data['rows'] == ['11' + '0' * 26, '0' * 26 + '11']
+    assert data['rooms'][1] == {'id': 2, 'name': "Standard", 'price': 100.0, 'available': False}
+    assert data['booked_per_night'][:3] == [1, 1, 0]
+
+    packed = month_grid(2030, 2).to_json('bitset')
+    bits = np.unpackbits(np.frombuffer(base64.b64decode(packed['bitset']), dtype=np.uint8).reshape(2, packed['row_bytes']),
+                         axis=1)[:, :28]
+    assert [''.join(map(str, row)) for row in bits.tolist()] == data['rows']
@@ -0,0 +1,118 @@
+import socket
+import socketserver
+import threading
+from datetime import datetime
+
+import pytest
+from flask_mail import Mail
+
+from models import db, OutboxMessage
+from outbox import enqueue_email, deliver_pending
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP to stand in for a real server; refuses recipients containing 'reject'"""
+
+    def reply(self, line):
+        self.wfile.write((line + '\r\n').encode())
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply('220 localhost SMTP stand-in')
+        recipients, lines, in_data = [], [], False
+        for raw in self.rfile:
+            line = raw.decode().rstrip('\r\n')
+            if in_data:
+                if line == '.':
+                    self.server.messages.append((recipients, '\n'.join(lines)))
+                    recipients, lines, in_data = [], [], False
+                    self.reply('250 OK')
+                else:
+                    lines.append(line)
+                continue
+            command = line[:4].upper()
+            if command in ('EHLO', 'HELO'):
+                self.reply('250 localhost')
+            elif command == 'RCPT':
+                if 'reject' in line:
+                    self.reply('550 No such user')
+                else:
+                    recipients.append(line.split(':', 1)[1].strip('<> '))
+                    self.reply('250 OK')
+            elif command == 'DATA':
+                in_data = True
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+            elif command == 'RSET':
+                recipients = []
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+class _SMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _SMTPHandler)
+        self.messages = []
+        self.connections = 0
+
+
+@pytest.fixture
+def smtp_server():
+    server = _SMTPServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _mail(app, port):
+    app.config.update(MAIL_SERVER='127.0.0.1', MAIL_PORT=port, MAIL_USE_TLS=False, MAIL_SUPPRESS_SEND=False,
+                      MAIL_DEFAULT_SENDER='Jet Hotel <hotel@example.com>')
+    return Mail(app)
+
+
+def test_outbox_delivers_batch_over_one_connection(app, smtp_server):
+    mail = _mail(app, smtp_server.server_address[1])
+    enqueue_email("Welcome", ["guest1@gmail.com"], "Hello 1")
+    enqueue_email("Welcome", ["reject@gmail.com"], "Hello 2")
+    enqueue_email("Welcome", ["guest3@gmail.com"], "Hello 3")
+    db.session.commit()
+
+    assert deliver_pending(mail, batch_size=2) == (2, 1)
+    assert smtp_server.connections == 1
+    assert [recipients for recipients, _ in smtp_server.messages] == [['guest1@gmail.com'], ['guest3@gmail.com']]
+
+    statuses = {m.recipients: m.status for m in OutboxMessage.query}
+    assert statuses == {'guest1@gmail.com': 'Sent', 'reject@gmail.com': 'Failed', 'guest3@gmail.com': 'Sent'}
+    # Dead letters are not retried
+    assert deliver_pending(mail) == (0, 0)
+
+
+def test_outbox_retries_with_backoff_when_server_is_down(app):
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        closed_port = probe.getsockname()[1]
+    mail = _mail(app, closed_port)
+    enqueue_email("Welcome", ["guest@gmail.com"], "Hello")
+    db.session.commit()
+
+    assert deliver_pending(mail) == (0, 1)
+    message = OutboxMessage.query.one()
+    assert message.status == 'Pending'
+    assert message.attempts == 1
+    assert message.next_attempt_at > datetime.utcnow()
+    # Not due yet, so nothing is claimed
+    assert deliver_pending(mail) == (0, 0)
+
+
+def test_outbox_rows_share_the_callers_transaction(app):
+    enqueue_email("Welcome", ["guest@gmail.com"], "Hello")
+    db.session.rollback()
+    assert OutboxMessage.query.count() == 0
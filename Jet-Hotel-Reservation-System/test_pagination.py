@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+from models import db, User, Notification
+from pagination import keyset_page, encode_cursor, decode_cursor
+
+
+def _seed(count):
+    db.session.add(User(full_name="Guest", email="guest@gmail.com", contact_info="123", password="x"))
+    base = datetime(2030, 1, 1)
+    # Pairs of rows share a timestamp so the id tie-breaker matters
+    db.session.add_all([Notification(user_id=1, message=f"Note {i}", created_at=base + timedelta(minutes=i // 2))
+                        for i in range(count)])
+    db.session.commit()
+
+
+def test_keyset_pages_cover_every_row_once(app):
+    _seed(45)
+    query = Notification.query.filter_by(user_id=1)
+    seen = []
+    cursor = None
+    while True:
+        page = keyset_page(query, Notification, cursor, per_page=10)
+        seen.extend(n.id for n in page.items)
+        if not page.has_more:
+            break
+        cursor = page.next_cursor
+    expected = [n.id for n in query.order_by(Notification.created_at.desc(), Notification.id.desc())]
+    assert seen == expected
+    assert len(seen) == 45
+
+
+def test_cursor_round_trip_and_garbage(app):
+    created_at = datetime(2030, 1, 2, 3, 4, 5, 678)
+    assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+    assert decode_cursor('not-a-cursor') is None
+    assert decode_cursor(None) is None
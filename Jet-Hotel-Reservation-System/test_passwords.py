@@ -0,0 +1,76 @@
+import threading
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app import create_app
+from config import TestConfig
+from models import db, User
+import passwords
+from passwords import hash_slots, hash_password, verify_password, needs_rehash, HashingBusy
+
+
+@pytest.fixture
+def client():
+    hash_slots.reset()
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(full_name="Guest", email="guest@gmail.com", contact_info="123",
+                            password=generate_password_hash("Secret123", 'pbkdf2:sha256:1000')))
+        db.session.commit()
+        yield app.test_client()
+        db.session.remove()
+        db.drop_all()
+    hash_slots.reset()
+
+
+def test_reference_hash_is_made_on_first_login_not_at_startup(client):
+    passwords._reference_hashes.clear()
+    create_app(TestConfig)
+    assert passwords._reference_hashes == {}
+    assert client.post('/login', data={'email': "nobody@gmail.com", 'password': "x"}).status_code == 200
+    assert list(passwords._reference_hashes) == ['pbkdf2:sha256:1000']
+
+
+def test_login_rehashes_when_the_cost_changes(client):
+    client.application.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:2000'
+    assert client.post('/login', data={'email': "guest@gmail.com", 'password': "wrong"}).status_code == 200
+    assert User.query.one().password.startswith('pbkdf2:sha256:1000$')
+
+    assert client.post('/login', data={'email': "guest@gmail.com", 'password': "Secret123"}).status_code == 302
+    stored = User.query.one().password
+    assert stored.startswith('pbkdf2:sha256:2000$')
+    assert not needs_rehash(stored)
+    assert verify_password(stored, "Secret123")
+    assert not verify_password(None, "Secret123")
+    assert needs_rehash(hash_password("Secret123")) is False
+
+
+def test_busy_hashing_sheds_logins_with_429(client):
+    app = client.application
+    app.config.update(PASSWORD_HASH_MAX_CONCURRENT=1)
+    release = threading.Event()
+    started = threading.Event()
+
+    def hold():
+        started.set()
+        release.wait(5)
+
+    def occupy():
+        with app.app_context():
+            hash_slots.run(hold)
+
+    holder = threading.Thread(target=occupy)
+    holder.start()
+    started.wait(5)
+    try:
+        with pytest.raises(HashingBusy):
+            hash_password("Secret123")
+        response = client.post('/login', data={'email': "guest@gmail.com", 'password': "Secret123"})
+        assert response.status_code == 429
+        assert response.headers['Retry-After'] == '1'
+    finally:
+        release.set()
+        holder.join()
+    assert client.post('/login', data={'email': "guest@gmail.com", 'password': "Secret123"}).status_code == 302
@@ -0,0 +1,56 @@
+from datetime import date
+from sqlalchemy import insert
+from models import db, User, Room, Reservation, RoomNight
+
+
+def _seed():
+    db.session.add(User(full_name="Guest", email="guest@gmail.com", contact_info="123", password="x"))
+    db.session.add_all([Room(name=f"Room {i}", price=100.0) for i in range(3)])
+    db.session.commit()
+
+
+def _nights(room_id):
+    return [rn.night for rn in RoomNight.query.filter_by(room_id=room_id).order_by(RoomNight.night)]
+
+
+def test_room_nights_follow_reservation_writes(app):
+    _seed()
+    reservation = Reservation(user_id=1, room_id=1, check_in=date(2030, 1, 10), check_out=date(2030, 1, 13))
+    db.session.add(reservation)
+    db.session.commit()
+    assert _nights(1) == [date(2030, 1, 10), date(2030, 1, 11), date(2030, 1, 12)]
+    assert RoomNight.booked_room_ids(date(2030, 1, 12)) == {1}
+    assert RoomNight.booked_room_ids(date(2030, 1, 13)) == set()
+
+    # Shifting the stay keeps overlapping nights and moves the rest
+    reservation.check_in = date(2030, 1, 11)
+    reservation.check_out = date(2030, 1, 15)
+    db.session.commit()
+    assert _nights(1) == [date(2030, 1, 11), date(2030, 1, 12), date(2030, 1, 13), date(2030, 1, 14)]
+
+    reservation.room_id = 2
+    db.session.commit()
+    assert _nights(1) == []
+    assert RoomNight.booked_room_ids(date(2030, 1, 1), date(2030, 1, 31)) == {2}
+
+    db.session.delete(reservation)
+    db.session.commit()
+    assert RoomNight.query.count() == 0
+
+
+def test_backfill_rebuilds_inventory(app):
+    _seed()
+    # Rows written with Core statements bypass the ORM hooks
+    db.session.execute(insert(Reservation), [
+        {'user_id': 1, 'room_id': 1, 'check_in': date(2030, 1, 10), 'check_out': date(2030, 1, 12), 'status': 'Confirmed'},
+        {'user_id': 1, 'room_id': 1, 'check_in': date(2030, 1, 11), 'check_out': date(2030, 1, 12), 'status': 'Confirmed'},
+        {'user_id': 1, 'room_id': 2, 'check_in': date(2030, 1, 10), 'check_out': date(2030, 1, 11), 'status': 'Cancelled'},
+        {'user_id': 1, 'room_id': 3, 'check_in': date(2030, 1, 1), 'check_out': date(2030, 1, 2), 'status': 'Pending'},
+    ])
+    db.session.commit()
+
+    reservation_count, night_count, conflicts = RoomNight.backfill(batch_size=2)
+    assert (reservation_count, night_count, conflicts) == (2, 3, [2])
+    assert _nights(1) == [date(2030, 1, 10), date(2030, 1, 11)]
+    assert _nights(2) == []
+    assert _nights(3) == [date(2030, 1, 1)]